@@ -1,22 +1,82 @@
 #!/usr/bin/env python3
 
 import sys
+import time
+
+from collector_client import query
+from proc_reader import cpu_usage, read_cpu_times
+from state_store import load_state, save_state
+
+MAX_SNAPSHOT_AGE = 15 * 60  # seconds; an older snapshot says little about the current load
+MIN_SNAPSHOT_AGE = 0.5  # seconds; a shorter interval is too noisy to use
+SAMPLE_WINDOW = 0.25  # seconds of sampling when there is no usable snapshot
+
+
+def measure_cpu():
+    """
+    Returns CPU usage since the previous run, from the /proc/stat counters it saved.
+
+    On the first run, after a reboot, or when the previous snapshot is stale,
+    the counters are sampled over a short window instead.
+    """
+    boot_time, times = read_cpu_times()
+    now = time.time()
+    previous = load_state("cpu-stat")
+    save_state("cpu-stat", {"time": now, "boot_time": boot_time, "cpus": times})
+
+    if (
+        previous
+        and previous.get("boot_time") == boot_time
+        and MIN_SNAPSHOT_AGE <= now - previous["time"] <= MAX_SNAPSHOT_AGE
+    ):
+        usage = cpu_usage(previous["cpus"], times)
+        if usage is not None:
+            return usage
+
+    time.sleep(SAMPLE_WINDOW)
+    boot_time, later = read_cpu_times()
+    save_state("cpu-stat", {"time": time.time(), "boot_time": boot_time, "cpus": later})
+    return cpu_usage(times, later)
 
 
 def main():
     try:
-        import psutil
-    except ImportError:
-        sys.exit(3)
-    try:
-        cpu_percent = psutil.cpu_percent(interval=1)
-        print(int(cpu_percent))
-        if cpu_percent > 90:
-            sys.exit(1)  # Alarm
-        elif cpu_percent > 75:
-            sys.exit(2)  # Warning
+        # Optional: only raise when the threshold is exceeded for this many seconds
+        sustain = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+        from metric_ring import open_ring, sustained_severity
+
+        ring = open_ring()
+        sample = query()
+        if sample is not None and sample.get("cpu"):
+            usage = sample["cpu"]  # the collector records its samples itself
         else:
-            sys.exit(0)  # OK
+            usage = measure_cpu()
+            if ring:
+                for name in ("cpu_percent", "iowait_percent", "steal_percent"):
+                    ring.add(name, usage[name])
+        cpu_percent = usage["cpu_percent"]
+        steal_percent = usage["steal_percent"]
+        print(int(cpu_percent))
+        print(f"Busiest core: {int(usage['max_core_percent'])}%")
+        print(f"iowait: {usage['iowait_percent']:.1f}%")
+        print(f"steal: {steal_percent:.1f}%")
+        p95 = ring.percentile("cpu_percent", 95, 15 * 60) if ring else None
+        if p95 is not None:
+            print(f"p95 (15 min): {p95:.0f}%")
+
+        severity = sustained_severity(ring, "cpu_percent", 75, 90, sustain) if sustain else None
+        if severity is None:
+            severity = 1 if cpu_percent > 90 else 2 if cpu_percent > 75 else 0
+        # High steal means the hypervisor is starving this VM of CPU time
+        if severity == 1 or steal_percent > 20:
+            severity = 1
+        elif severity == 2 or steal_percent > 10:
+            severity = 2
+        if severity:
+            from process_top import report_top_processes
+
+            report_top_processes(cpu=True, memory=False)
+        sys.exit(severity)  # 0 OK, 1 Alarm, 2 Warning
     except Exception:
         sys.exit(3)
 
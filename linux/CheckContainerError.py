@@ -1,23 +1,19 @@
 #!/usr/bin/env python3
 
-import subprocess
 import sys
 
+from docker_client import describe, load_containers
+
 
 def main():
     try:
-        result = subprocess.run(
-            ["docker", "ps", "-a", "-f", "status=exited", "-q"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-        if result.returncode != 0:
-            sys.exit(3)
-        container_ids = result.stdout.strip().split("\n")
-        num_failed = len([cid for cid in container_ids if cid])
-        print(num_failed)
-        if num_failed > 0:
+        containers = load_containers()
+        # Same containers as `docker ps -a -f status=exited`, then one line each
+        failed = [container for container in containers if container["state"] == "exited"]
+        print(len(failed))
+        for container in sorted(failed, key=lambda c: c["name"]):
+            print(describe(container))
+        if failed:
             sys.exit(1)  # Alarm if any containers have failed
         else:
             sys.exit(0)
@@ -1,22 +1,19 @@
 #!/usr/bin/env python3
 
-import subprocess
 import sys
 
+from docker_client import count_states, load_containers
+
 
 def main():
     try:
-        result = subprocess.run(
-            ["docker", "ps", "-q"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-        if result.returncode != 0:
-            sys.exit(3)
-        container_ids = result.stdout.strip().split("\n")
-        num_containers = len([cid for cid in container_ids if cid])
+        counts = count_states(load_containers())
+        num_containers = counts["running"]
         print(num_containers)
+        print(
+            f"{counts['running']} running, {counts['exited']} exited, "
+            f"{counts['restarting']} restarting, {counts['unhealthy']} unhealthy"
+        )
         if num_containers == 0:
             sys.exit(1)  # Alarm if no containers are running
         else:
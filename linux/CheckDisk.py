@@ -2,18 +2,20 @@
 
 import sys
 
+from collector_client import query
+from proc_reader import disk_usage
+
 
 def main():
+    disk_path = "/"
+    if len(sys.argv) > 1:
+        disk_path = sys.argv[1]
     try:
-        import psutil
-    except ImportError:
-        sys.exit(3)
-    try:
-        disk_path = "/"
-        if len(sys.argv) > 1:
-            disk_path = sys.argv[1]
-        disk = psutil.disk_usage(disk_path)
-        disk_percent = disk.percent
+        sample = query({"disk": disk_path})
+        if sample is not None and sample.get("disk_percent") is not None:
+            disk_percent = sample["disk_percent"]
+        else:
+            disk_percent = disk_usage(disk_path)[0]
         print(int(disk_percent))
         if disk_percent > 90:
             sys.exit(1)  # Alarm
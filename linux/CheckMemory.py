@@ -2,22 +2,43 @@
 
 import sys
 
+from collector_client import query
+from proc_reader import memory_usage, read_meminfo
+
 
 def main():
     try:
-        import psutil
-    except ImportError:
-        sys.exit(3)
-    try:
-        mem = psutil.virtual_memory()
-        ram_percent = mem.percent
-        print(int(ram_percent))
-        if ram_percent > 90:
-            sys.exit(1)  # Alarm
-        elif ram_percent > 75:
-            sys.exit(2)  # Warning
+        # Optional: only raise when the threshold is exceeded for this many seconds
+        sustain = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+        from metric_ring import open_ring, sustained_severity
+
+        ring = open_ring()
+        sample = query()
+        if sample is not None:
+            ram_percent = sample["memory_percent"]  # the collector records its samples itself
         else:
-            sys.exit(0)  # OK
+            try:
+                ram_percent = memory_usage(read_meminfo())[0]
+            except OSError:
+                # No /proc (e.g. a restricted container): psutil may still know
+                import psutil
+
+                ram_percent = psutil.virtual_memory().percent
+            if ring:
+                ring.add("memory_percent", ram_percent)
+        print(int(ram_percent))
+        p95 = ring.percentile("memory_percent", 95, 15 * 60) if ring else None
+        if p95 is not None:
+            print(f"p95 (15 min): {p95:.0f}%")
+
+        severity = sustained_severity(ring, "memory_percent", 75, 90, sustain) if sustain else None
+        if severity is None:
+            severity = 1 if ram_percent > 90 else 2 if ram_percent > 75 else 0
+        if severity:
+            from process_top import report_top_processes
+
+            report_top_processes(cpu=False, memory=True)
+        sys.exit(severity)  # 0 OK, 1 Alarm, 2 Warning
     except Exception:
         sys.exit(3)
 
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Checks space and inode usage of every real filesystem in one run.
+
+Mounts are read from /proc/self/mountinfo. Pseudo and in-memory
+filesystems (tmpfs, overlay, squashfs...) and bind mounts of a filesystem
+already checked are skipped, and statvfs() is called on each remaining
+mount in its own thread, so a hung NFS server only makes its own mount
+report a timeout.
+
+Usage: python3 CheckMounts.py [WARNING_PERCENT] [ALARM_PERCENT] [OVERRIDES]
+  OVERRIDES  per-mount thresholds, e.g. "/var=80:95,/srv/backup=90:98";
+             "off" instead of the thresholds skips a mount
+"""
+
+import os
+import sys
+import threading
+import time
+
+from proc_reader import read_mountinfo, statvfs_usage
+
+DEFAULT_WARNING = 75
+DEFAULT_ALARM = 90
+
+# Seconds to wait for statvfs() on a mount; a hung network mount never answers
+MOUNT_TIMEOUT = 2
+
+SKIPPED_FSTYPES = {
+    "autofs", "binfmt_misc", "bpf", "cgroup", "cgroup2", "configfs", "debugfs", "devpts", "devtmpfs",
+    "efivarfs", "fusectl", "fuse.lxcfs", "fuse.portal", "hugetlbfs", "mqueue", "nsfs", "overlay", "proc",
+    "pstore", "ramfs", "rpc_pipefs", "securityfs", "selinuxfs", "squashfs", "sysfs", "tmpfs", "tracefs",
+}
+
+
+def format_size(size):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024.0:
+            return f"{size:.1f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} TB"
+
+
+def parse_overrides(text):
+    """
+    Parses "/var=80:95,/srv=off" into {mount point: (warning, alarm) or None}.
+    """
+    overrides = {}
+    for item in filter(None, text.split(",")):
+        mount_point, thresholds = item.rsplit("=", 1)
+        if thresholds == "off":
+            overrides[mount_point] = None
+        else:
+            warning, alarm = thresholds.split(":")
+            overrides[mount_point] = (float(warning), float(alarm))
+    return overrides
+
+
+def real_mounts():
+    """
+    Returns the mounts worth checking: one per filesystem, without pseudo filesystems.
+    """
+    mounts = {}
+    for mount in read_mountinfo():
+        if mount["fstype"] in SKIPPED_FSTYPES:
+            continue
+        kept = mounts.get(mount["device"])
+        # Of several mounts of one filesystem, keep the one of its top
+        # directory (not a bind mount of a subdirectory), then the shortest
+        if kept is None or (mount["root"], len(mount["mount_point"])) < (kept["root"], len(kept["mount_point"])):
+            mounts[mount["device"]] = mount
+    return sorted(mounts.values(), key=lambda mount: mount["mount_point"])
+
+
+def statvfs_all(mount_points, timeout=MOUNT_TIMEOUT):
+    """
+    Returns {mount point: statvfs result, OSError, or None if it did not answer in time}.
+
+    Each call runs in a daemon thread: one blocked on a hung mount is
+    abandoned instead of holding up the check or its exit.
+    """
+    results = dict.fromkeys(mount_points)
+
+    def worker(mount_point):
+        try:
+            results[mount_point] = os.statvfs(mount_point)
+        except OSError as e:
+            results[mount_point] = e
+
+    threads = [threading.Thread(target=worker, args=(mount_point,), daemon=True) for mount_point in mount_points]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0, deadline - time.monotonic()))
+    return dict(results)
+
+
+def main():
+    try:
+        warning = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_WARNING
+        alarm = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_ALARM
+        overrides = parse_overrides(sys.argv[3] if len(sys.argv) > 3 else "")
+
+        mounts = [mount for mount in real_mounts() if overrides.get(mount["mount_point"], ()) is not None]
+        results = statvfs_all([mount["mount_point"] for mount in mounts])
+
+        alarm_raised = warning_raised = unknown = False
+        lines = []
+        max_usage = 0.0
+        for mount in mounts:
+            mount_point = mount["mount_point"]
+            mount_warning, mount_alarm = overrides.get(mount_point, (warning, alarm))
+            stat = results[mount_point]
+            if stat is None:
+                lines.append(f"{mount_point}: no answer after {MOUNT_TIMEOUT}s ({mount['fstype']} {mount['source']})")
+                unknown = True
+                continue
+            if isinstance(stat, OSError):
+                lines.append(f"{mount_point}: {stat.strerror}")
+                unknown = True
+                continue
+            space_percent, inodes_percent, free = statvfs_usage(stat)
+            line = f"{mount_point}: {space_percent:.0f}% used, {format_size(free)} free"
+            usage = space_percent
+            if inodes_percent is not None:
+                line += f", inodes {inodes_percent:.0f}%"
+                usage = max(usage, inodes_percent)
+            max_usage = max(max_usage, usage)
+            if usage > mount_alarm:
+                alarm_raised = True
+                line += " [ALARM]"
+            elif usage > mount_warning:
+                warning_raised = True
+                line += " [WARNING]"
+            lines.append(line)
+
+        # Highest space or inode usage first, then one line per mount
+        print(int(max_usage))
+        for line in lines:
+            print(line)
+
+        if alarm_raised:
+            sys.exit(1)  # Alarm
+        elif warning_raised:
+            sys.exit(2)  # Warning
+        elif unknown:
+            sys.exit(3)
+        else:
+            sys.exit(0)  # OK
+    except Exception:
+        sys.exit(3)
+
+
+if __name__ == "__main__":
+    main()
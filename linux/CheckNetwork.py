@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import fnmatch
+import sys
+import time
+
+from proc_reader import net_rates, read_link_speed, read_net_dev
+from state_store import load_state, save_state
+
+# Loopback, container and VM plumbing whose traffic is already counted on a
+# physical interface; override with a comma-separated list of patterns
+DEFAULT_EXCLUDE = "lo,docker*,veth*,br-*,virbr*,vnet*,tap*,cali*,flannel*,cni*,ifb*"
+
+# Thresholds in percent of the link speed
+DEFAULT_WARNING = 75
+DEFAULT_ALARM = 90
+
+MAX_SNAPSHOT_AGE = 15 * 60  # seconds; an older snapshot says little about the current traffic
+MIN_SNAPSHOT_AGE = 0.5  # seconds; a shorter interval is too noisy to use
+SAMPLE_WINDOW = 0.25  # seconds of sampling when there is no usable snapshot
+
+
+def format_rate(bytes_per_second):
+    for unit in ["B/s", "KB/s", "MB/s"]:
+        if bytes_per_second < 1000.0:
+            return f"{bytes_per_second:.2f} {unit}"
+        bytes_per_second /= 1000.0
+    return f"{bytes_per_second:.2f} GB/s"
+
+
+def read_counters(exclude):
+    interfaces = read_net_dev()
+    return {
+        name: counters
+        for name, counters in interfaces.items()
+        if not any(fnmatch.fnmatch(name, pattern) for pattern in exclude)
+    }
+
+
+def measure_rates(exclude, state="net-dev"):
+    """
+    Returns per-interface rates since the previous run, from the /proc/net/dev counters it saved.
+
+    On the first run, or when the previous snapshot is stale, the counters
+    are sampled over a short window instead. Interfaces whose counters went
+    backwards (reset or re-created) are left out. Checks that exclude
+    different interfaces keep their snapshot under different `state` names.
+    """
+    current = read_counters(exclude)
+    now = time.time()
+    previous = load_state(state)
+    save_state(state, {"time": now, "interfaces": current})
+
+    if previous and MIN_SNAPSHOT_AGE <= now - previous["time"] <= MAX_SNAPSHOT_AGE:
+        seconds = now - previous["time"]
+        previous = previous["interfaces"]
+    else:
+        time.sleep(SAMPLE_WINDOW)
+        previous, current = current, read_counters(exclude)
+        seconds = time.time() - now
+        save_state(state, {"time": time.time(), "interfaces": current})
+
+    return net_rates(previous, current, seconds)
+
+
+def main():
+    try:
+        warning = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_WARNING
+        alarm = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_ALARM
+        exclude = (sys.argv[3] if len(sys.argv) > 3 else DEFAULT_EXCLUDE).split(",")
+
+        rates = measure_rates(exclude)
+        alarm_raised = warning_raised = False
+        lines = []
+        max_usage = 0.0
+        for name in sorted(rates):
+            rate = rates[name]
+            speed = read_link_speed(name)
+            line = f"{name}: RX {format_rate(rate['rx'])}, TX {format_rate(rate['tx'])}"
+            if speed:
+                # Full duplex: each direction can use the whole link speed
+                usage = max(rate["rx"], rate["tx"]) * 8 / (speed * 1_000_000) * 100
+                max_usage = max(max_usage, usage)
+                line += f", {usage:.1f}% of {speed} Mbit/s"
+                if usage > alarm:
+                    alarm_raised = True
+                elif usage > warning:
+                    warning_raised = True
+            line += f", {rate['errors']} errors, {rate['drops']} drops"
+            if rate["errors"]:
+                warning_raised = True
+            lines.append(line)
+
+        # Highest link utilisation first, then one line per interface
+        print(int(max_usage))
+        for line in lines:
+            print(line)
+
+        if alarm_raised:
+            sys.exit(1)  # Alarm
+        elif warning_raised:
+            sys.exit(2)  # Warning
+        else:
+            sys.exit(0)  # OK
+    except Exception:
+        sys.exit(3)
+
+
+if __name__ == "__main__":
+    main()
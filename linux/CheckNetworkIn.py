@@ -3,17 +3,28 @@
 import sys
 import time
 
+from CheckNetwork import measure_rates
+from collector_client import query
+
 
 def main():
     try:
-        import psutil
-    except ImportError:
-        sys.exit(3)
-    try:
-        net1 = psutil.net_io_counters()
-        time.sleep(1)
-        net2 = psutil.net_io_counters()
-        bytes_recv = net2.bytes_recv - net1.bytes_recv
+        sample = query()
+        if sample is not None:
+            bytes_recv = sample["net_bytes_recv"]
+        else:
+            try:
+                # Bytes per second on all interfaces since the previous run
+                rates = measure_rates([], "net-in")
+                bytes_recv = int(sum(rate["rx"] for rate in rates.values()))
+            except OSError:
+                # No /proc/net/dev: measure over one second with psutil if it is installed
+                import psutil
+
+                net1 = psutil.net_io_counters()
+                time.sleep(1)
+                net2 = psutil.net_io_counters()
+                bytes_recv = net2.bytes_recv - net1.bytes_recv
         print(bytes_recv)
         if bytes_recv > 100000000:  # Alarm if incoming > 100MB/s
             sys.exit(1)
@@ -3,17 +3,28 @@
 import sys
 import time
 
+from CheckNetwork import measure_rates
+from collector_client import query
+
 
 def main():
     try:
-        import psutil
-    except ImportError:
-        sys.exit(3)
-    try:
-        net1 = psutil.net_io_counters()
-        time.sleep(1)
-        net2 = psutil.net_io_counters()
-        bytes_sent = net2.bytes_sent - net1.bytes_sent
+        sample = query()
+        if sample is not None:
+            bytes_sent = sample["net_bytes_sent"]
+        else:
+            try:
+                # Bytes per second on all interfaces since the previous run
+                rates = measure_rates([], "net-out")
+                bytes_sent = int(sum(rate["tx"] for rate in rates.values()))
+            except OSError:
+                # No /proc/net/dev: measure over one second with psutil if it is installed
+                import psutil
+
+                net1 = psutil.net_io_counters()
+                time.sleep(1)
+                net2 = psutil.net_io_counters()
+                bytes_sent = net2.bytes_sent - net1.bytes_sent
         print(bytes_sent)
         if bytes_sent > 100000000:  # Alarm if outgoing > 100MB/s
             sys.exit(1)
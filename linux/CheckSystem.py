@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Checks CPU, memory, swap, load, disks and network in a single run.
+
+Everything is read from /proc, /sys and statvfs() in one pass, with one
+shared snapshot for the CPU and network rates, so the RMM can schedule this
+script instead of CheckCPU, CheckMemory, CheckDisk and CheckNetwork
+separately. Prints one line per metric and exits with the worst status:
+0 OK, 1 Alarm, 2 Warning, 3 unknown (a metric could not be read).
+
+Usage: python3 CheckSystem.py [DISK_PATHS] [EXCLUDE_PATTERNS]
+  DISK_PATHS        comma-separated mount points to check (default: /)
+  EXCLUDE_PATTERNS  interfaces to skip, as for CheckNetwork.py
+"""
+
+import os
+import sys
+import time
+
+from CheckNetwork import DEFAULT_EXCLUDE, format_rate, read_counters
+from proc_reader import (
+    cpu_usage,
+    disk_usage,
+    memory_usage,
+    net_rates,
+    read_cpu_times,
+    read_link_speed,
+    read_loadavg,
+    read_meminfo,
+)
+from state_store import load_state, save_state
+
+OK, ALARM, WARNING, UNKNOWN = 0, 1, 2, 3
+
+# Exit codes from best to worst: an unknown metric must not hide a warning
+SEVERITY_ORDER = (OK, UNKNOWN, WARNING, ALARM)
+
+# (warning, alarm) thresholds
+CPU_THRESHOLDS = (75, 90)
+STEAL_THRESHOLDS = (10, 20)
+MEMORY_THRESHOLDS = (75, 90)
+SWAP_THRESHOLDS = (50, 80)
+LOAD_THRESHOLDS = (2.0, 4.0)  # 5 minute load average per CPU
+DISK_THRESHOLDS = (75, 90)
+INODE_THRESHOLDS = (75, 90)
+NETWORK_THRESHOLDS = (75, 90)  # percent of the link speed
+
+MAX_SNAPSHOT_AGE = 15 * 60  # seconds; an older snapshot says little about the current load
+MIN_SNAPSHOT_AGE = 0.5  # seconds; a shorter interval is too noisy to use
+SAMPLE_WINDOW = 0.25  # seconds of sampling when there is no usable snapshot
+
+
+def worst(*severities):
+    return max(severities, key=SEVERITY_ORDER.index)
+
+
+def rate(value, thresholds):
+    warning, alarm = thresholds
+    if value > alarm:
+        return ALARM
+    if value > warning:
+        return WARNING
+    return OK
+
+
+def measure_rates(exclude):
+    """
+    Returns (CPU usage, network rates) since the previous run, from the counters it saved.
+
+    Both come from one snapshot, so at most one short sampling window is
+    spent: on the first run, after a reboot, or when the snapshot is stale.
+    """
+    boot_time, cpus = read_cpu_times()
+    interfaces = read_counters(exclude)
+    now = time.time()
+    previous = load_state("system-snapshot")
+    save_state("system-snapshot", {"time": now, "boot_time": boot_time, "cpus": cpus, "interfaces": interfaces})
+
+    if (
+        previous
+        and previous.get("boot_time") == boot_time
+        and MIN_SNAPSHOT_AGE <= now - previous["time"] <= MAX_SNAPSHOT_AGE
+    ):
+        usage = cpu_usage(previous["cpus"], cpus)
+        if usage is not None:
+            return usage, net_rates(previous["interfaces"], interfaces, now - previous["time"])
+
+    time.sleep(SAMPLE_WINDOW)
+    boot_time, later_cpus = read_cpu_times()
+    later_interfaces = read_counters(exclude)
+    later = time.time()
+    save_state(
+        "system-snapshot", {"time": later, "boot_time": boot_time, "cpus": later_cpus, "interfaces": later_interfaces}
+    )
+    return cpu_usage(cpus, later_cpus), net_rates(interfaces, later_interfaces, later - now)
+
+
+def check_cpu(usage):
+    if usage is None:
+        return UNKNOWN, "CPU: no data"
+    severity = worst(rate(usage["cpu_percent"], CPU_THRESHOLDS), rate(usage["steal_percent"], STEAL_THRESHOLDS))
+    return severity, (
+        f"CPU: {int(usage['cpu_percent'])}% (busiest core {int(usage['max_core_percent'])}%, "
+        f"iowait {usage['iowait_percent']:.1f}%, steal {usage['steal_percent']:.1f}%)"
+    )
+
+
+def check_memory():
+    memory_percent, swap_percent = memory_usage(read_meminfo())
+    results = [(rate(memory_percent, MEMORY_THRESHOLDS), f"Memory: {int(memory_percent)}%")]
+    if swap_percent is None:
+        results.append((OK, "Swap: none"))
+    else:
+        results.append((rate(swap_percent, SWAP_THRESHOLDS), f"Swap: {int(swap_percent)}%"))
+    return results
+
+
+def check_load(cpu_count):
+    load1, load5, load15 = read_loadavg()
+    severity = rate(load5 / cpu_count, LOAD_THRESHOLDS)
+    return severity, f"Load: {load1:.2f} {load5:.2f} {load15:.2f} ({cpu_count} CPUs)"
+
+
+def check_disk(path):
+    space_percent, inodes_percent = disk_usage(path)
+    severity = rate(space_percent, DISK_THRESHOLDS)
+    line = f"Disk {path}: {int(space_percent)}%"
+    if inodes_percent is not None:
+        severity = worst(severity, rate(inodes_percent, INODE_THRESHOLDS))
+        line += f", inodes {int(inodes_percent)}%"
+    return severity, line
+
+
+def check_network(name, interface_rate):
+    severity = WARNING if interface_rate["errors"] else OK
+    line = f"Network {name}: RX {format_rate(interface_rate['rx'])}, TX {format_rate(interface_rate['tx'])}"
+    speed = read_link_speed(name)
+    if speed:
+        # Full duplex: each direction can use the whole link speed
+        usage = max(interface_rate["rx"], interface_rate["tx"]) * 8 / (speed * 1_000_000) * 100
+        severity = worst(severity, rate(usage, NETWORK_THRESHOLDS))
+        line += f", {usage:.1f}% of {speed} Mbit/s"
+    line += f", {interface_rate['errors']} errors, {interface_rate['drops']} drops"
+    return severity, line
+
+
+def main():
+    disk_paths = (sys.argv[1] if len(sys.argv) > 1 else "/").split(",")
+    exclude = (sys.argv[2] if len(sys.argv) > 2 else DEFAULT_EXCLUDE).split(",")
+
+    results = []
+    rates = {}
+    try:
+        usage, rates = measure_rates(exclude)
+        results.append(check_cpu(usage))
+    except Exception:
+        results.append((UNKNOWN, "CPU and network: unable to read /proc"))
+    try:
+        results.extend(check_memory())
+    except Exception:
+        results.append((UNKNOWN, "Memory: unable to read /proc/meminfo"))
+    try:
+        results.append(check_load(os.cpu_count() or 1))
+    except Exception:
+        results.append((UNKNOWN, "Load: unable to read /proc/loadavg"))
+    for path in disk_paths:
+        try:
+            results.append(check_disk(path))
+        except Exception:
+            results.append((UNKNOWN, f"Disk {path}: unable to read"))
+    for name in sorted(rates):
+        results.append(check_network(name, rates[name]))
+
+    severity = OK
+    for line_severity, line in results:
+        severity = worst(severity, line_severity)
+        if line_severity == ALARM:
+            line += " [ALARM]"
+        elif line_severity == WARNING:
+            line += " [WARNING]"
+        print(line)
+    sys.exit(severity)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,107 @@
 #!/usr/bin/env python3
+"""
+Reports the pending APT updates and how many come from security suites.
 
+Alarm above 10 pending updates, Warning for any. With "security", any
+pending security update also raises an Alarm.
+
+Usage: python3 CheckUpdateDebian.py [security]
+"""
+
+import hashlib
+import os
 import re
 import subprocess
 import sys
 
+from apt_index import APT_LISTS_DIR, DPKG_STATUS, count_by_source, find_upgrades
+from state_store import load_state, save_state
+
+# Simulated install line, e.g.
+# Inst libssl3 [3.0.2-0ubuntu1.10] (3.0.2-0ubuntu1.12 Ubuntu:22.04/jammy-security [amd64])
+INST_LINE = re.compile(r"^Inst (\S+) (?:\[(\S+)\] )?\((\S+) (.*?)(?: \[[^\]]*\])?\)", re.MULTILINE)
+
+# Bump when the layout of the cached packages changes
+CACHE_VERSION = 4
+
+
+def apt_fingerprint():
+    """
+    Returns a digest of the name, size and mtime of the APT indexes and the dpkg status file.
+
+    The pending updates can only change when one of these does (apt update,
+    or a package installed or removed), so it keys the cached result.
+    """
+    digest = hashlib.sha1()
+    entries = [DPKG_STATUS]
+    with os.scandir(APT_LISTS_DIR) as it:
+        entries.extend(sorted(entry.path for entry in it if entry.is_file()))
+    for path in entries:
+        stat = os.stat(path)
+        digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def simulate_upgrade():
+    """
+    Returns the upgradable packages as reported by `apt-get -s upgrade`.
+    """
+    result = subprocess.run(
+        ["apt-get", "-s", "upgrade"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return [
+        {
+            "name": name,
+            "installed": installed,
+            "candidate": candidate,
+            "sources": [source.replace(":", " ", 1) for source in origin.split(", ")],
+            "security": "-security" in origin,
+        }
+        for name, installed, candidate, origin in INST_LINE.findall(result.stdout)
+    ]
+
+
+def list_upgrades():
+    """
+    Returns the upgradable packages, read from the APT indexes or, if they cannot be read, from apt-get.
+    """
+    try:
+        return find_upgrades(APT_LISTS_DIR, DPKG_STATUS)
+    except (OSError, ValueError):
+        # No plain, gzip or xz index (e.g. Acquire::GzipIndexes with lz4)
+        return simulate_upgrade()
+
 
 def main():
     try:
-        result = subprocess.run(
-            ["apt-get", "-s", "upgrade"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-        if result.returncode != 0:
-            sys.exit(3)
-        # Parse output
-        # Looking for line like:
-        # N upgraded, M newly installed, O to remove and P not upgraded.
-        match = re.search(r"(\d+)\supgraded", result.stdout)
-        if match:
-            num_upgrades = int(match.group(1))
-            print(num_upgrades)
-            if num_upgrades > 10:
-                sys.exit(1)  # Alarm if more than 10 updates pending
-            elif num_upgrades > 0:
-                sys.exit(2)  # Warning if updates are pending
-            else:
-                sys.exit(0)  # OK
+        alarm_on_security = len(sys.argv) > 1 and sys.argv[1] == "security"
+        fingerprint = apt_fingerprint()
+        cached = load_state("apt-upgrades")
+        if cached and cached.get("version") == CACHE_VERSION and cached.get("fingerprint") == fingerprint:
+            upgradable = cached["upgradable"]
+        else:
+            upgradable = list_upgrades()
+            save_state("apt-upgrades", {"version": CACHE_VERSION, "fingerprint": fingerprint, "upgradable": upgradable})
+
+        num_upgrades = len(upgradable)
+        num_security = sum(1 for package in upgradable if package["security"])
+        print(num_upgrades)
+        print(f"Security: {num_security}")
+        for source, count in sorted(count_by_source(upgradable).items()):
+            print(f"{source}: {count}")
+        for package in upgradable:
+            print(f"{package['name']}: {package['installed'] or 'new'} -> {package['candidate']}")
+        if num_upgrades > 10 or (alarm_on_security and num_security > 0):
+            sys.exit(1)  # Alarm if more than 10 updates, or any security update when asked
+        elif num_upgrades > 0:
+            sys.exit(2)  # Warning if updates are pending
         else:
-            print(0)
-            sys.exit(0)
+            sys.exit(0)  # OK
     except Exception:
         sys.exit(3)
 
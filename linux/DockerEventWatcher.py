@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Keeps a live state file of the Docker containers for the container checks.
+
+Lists and inspects every container once, then follows the daemon's /events
+stream and re-inspects a container whenever an event concerns it. The
+state file (docker-containers in the state store) is rewritten after each
+change and at least every WATCHER_HEARTBEAT seconds, and the checks read it
+instead of querying the daemon. Running the watcher is optional: when it
+stops, the checks notice the stale file and query the socket themselves.
+
+Usage: python3 DockerEventWatcher.py
+"""
+
+import json
+import socket
+import sys
+import time
+
+from docker_client import WATCHER_HEARTBEAT, DockerClient, container_from_inspect, query_containers
+from state_store import save_state
+
+# Container events that cannot change its state
+IGNORED_ACTIONS = ("attach", "resize", "top", "export", "commit", "copy", "archive-path", "extract-to-dir")
+
+RETRY_DELAY = 5  # seconds before reconnecting after the daemon went away
+
+
+def save(containers):
+    save_state("docker-containers", {"time": time.time(), "containers": containers})
+
+
+def apply_event(containers, event):
+    """
+    Re-inspects the container an event is about and updates `containers`.
+    """
+    action = event.get("Action", event.get("status", ""))
+    if action.startswith("exec_") or action in IGNORED_ACTIONS:
+        return False
+    container_id = event.get("id") or event.get("Actor", {}).get("ID")
+    client = DockerClient()
+    try:
+        info = client.get(f"/containers/{container_id}/json")
+    finally:
+        client.close()
+    if info is None:
+        containers.pop(container_id, None)  # removed
+    else:
+        containers[container_id] = container_from_inspect(info)
+    return True
+
+
+def follow(containers):
+    """
+    Applies the container events to `containers` until the daemon goes away.
+
+    The state file is rewritten at least every WATCHER_HEARTBEAT seconds,
+    also when only ignored events (exec_create, exec_start...) arrive and
+    keep the read timeout from firing. On a quiet host the read timeout
+    reopens the stream from the last event seen, which the daemon replays
+    if it was missed.
+    """
+    since = time.time()
+    last_save = time.monotonic()
+    while True:
+        client = DockerClient(timeout=WATCHER_HEARTBEAT)
+        try:
+            params = {"since": f"{since:.9f}", "filters": json.dumps({"type": ["container"]})}
+            for event in client.stream("/events", params):
+                since = event.get("timeNano", since * 1e9) / 1e9
+                if apply_event(containers, event) or time.monotonic() - last_save > WATCHER_HEARTBEAT:
+                    save(containers)
+                    last_save = time.monotonic()
+            return  # the daemon closed the stream
+        except socket.timeout:
+            save(containers)
+            last_save = time.monotonic()
+        finally:
+            client.close()
+
+
+def main():
+    while True:
+        try:
+            containers = {container["id"]: container for container in query_containers(inspect="all")}
+            save(containers)
+            print(f"Watching {len(containers)} containers")
+            follow(containers)
+        except KeyboardInterrupt:
+            sys.exit(0)
+        except (OSError, ValueError) as e:
+            print(f"Docker daemon unavailable: {e}")
+        time.sleep(RETRY_DELAY)
+
+
+if __name__ == "__main__":
+    main()
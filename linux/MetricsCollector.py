@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Resident metrics collector for the linux/ checks.
+
+Samples CPU, memory and network counters every second, records them in
+the metric ring (metric_ring.py) and serves the latest values as JSON over
+a Unix socket (see collector_client.py). The checks then answer from the
+collector's one-second samples instead of their own snapshots; without
+the collector they read /proc directly, so running it is optional. Every
+PROCESS_SNAPSHOT_INTERVAL it also saves the per-process CPU times, which
+the CPU alarm's top processes are measured from (see process_top.py).
+
+Run as root, it serves every user's checks on /run/rmm-collector.sock;
+run as another user, only that user's checks, on a socket in the temp
+directory.
+
+Usage: python3 MetricsCollector.py [SOCKET_PATH]
+"""
+
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+
+from collector_client import socket_paths
+from metric_ring import open_ring
+from process_top import refresh_snapshot
+from proc_reader import (
+    cpu_usage,
+    disk_usage,
+    memory_usage,
+    read_cpu_times,
+    read_loadavg,
+    read_meminfo,
+    read_net_dev,
+)
+
+INTERVAL = 1  # seconds between two samples
+PROCESS_SNAPSHOT_INTERVAL = 60  # seconds between two process scans
+
+
+def read_net_totals():
+    """
+    Returns the bytes received and sent on all interfaces since boot.
+    """
+    interfaces = read_net_dev().values()
+    return sum(i["rx_bytes"] for i in interfaces), sum(i["tx_bytes"] for i in interfaces)
+
+
+class Collector:
+    """
+    Keeps the latest sample, refreshed by a background thread.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sample = None
+
+    def run(self):
+        ring = open_ring()
+        previous_cpus = read_cpu_times()[1]
+        previous_net = read_net_totals()
+        previous_time = time.monotonic()
+        last_snapshot = None
+        while True:
+            time.sleep(INTERVAL)
+            now = time.monotonic()
+            cpus = read_cpu_times()[1]
+            net = read_net_totals()
+            elapsed = now - previous_time
+            cpu = cpu_usage(previous_cpus, cpus)
+            memory_percent, swap_percent = memory_usage(read_meminfo())
+            sample = {
+                "time": time.time(),
+                "cpu": cpu,
+                "cpu_percent": cpu["cpu_percent"] if cpu else None,
+                "memory_percent": memory_percent,
+                # Bytes per second over the last interval (counters can reset)
+                "net_bytes_recv": max(0, int((net[0] - previous_net[0]) / elapsed)),
+                "net_bytes_sent": max(0, int((net[1] - previous_net[1]) / elapsed)),
+            }
+            previous_cpus, previous_net, previous_time = cpus, net, now
+            if ring:
+                self.record(ring, sample, swap_percent)
+            with self.lock:
+                self.sample = sample
+            if last_snapshot is None or now - last_snapshot >= PROCESS_SNAPSHOT_INTERVAL:
+                refresh_snapshot()
+                last_snapshot = now
+
+    @staticmethod
+    def record(ring, sample, swap_percent):
+        """
+        Adds a sample to the host's metric ring, for the sustained-threshold rules of the checks.
+        """
+        if sample["cpu"]:
+            for name in ("cpu_percent", "iowait_percent", "steal_percent"):
+                ring.add(name, sample["cpu"][name], sample["time"])
+        ring.add("memory_percent", sample["memory_percent"], sample["time"])
+        if swap_percent is not None:
+            ring.add("swap_percent", swap_percent, sample["time"])
+        ring.add("load_per_cpu", read_loadavg()[0] / (os.cpu_count() or 1), sample["time"])
+
+    def answer(self, request):
+        with self.lock:
+            sample = dict(self.sample) if self.sample else {}
+        if sample and request.get("disk"):
+            try:
+                sample["disk_percent"] = disk_usage(request["disk"])[0]
+            except OSError:
+                sample["disk_percent"] = None
+        return sample
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline() or b"{}")
+        except ValueError:
+            request = {}
+        self.wfile.write(json.dumps(self.server.collector.answer(request)).encode())
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else socket_paths()[0]
+    if not os.access(os.path.dirname(path) or ".", os.W_OK):
+        path = socket_paths()[-1]
+    if os.path.lexists(path):
+        os.remove(path)
+
+    collector = Collector()
+    threading.Thread(target=collector.run, daemon=True).start()
+
+    # Created private, then opened to every user only by a root collector:
+    # the checks only trust a socket owned by root or by their own user
+    umask = os.umask(0o177)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(path, RequestHandler)
+    finally:
+        os.umask(umask)
+    server.daemon_threads = True
+    server.collector = collector
+    if os.getuid() == 0:
+        os.chmod(path, 0o666)  # checks may run as another user than the collector
+    print(f"Serving metrics on {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
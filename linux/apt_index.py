@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Reads the dpkg status and APT package indexes without running apt.
+
+find_upgrades() compares the installed version of every package with the
+highest version in the downloaded *_Packages indexes, and tells which
+origin and suite (e.g. "Debian bookworm-security") each candidate comes
+from. Index files are memory-mapped and scanned for "Package:" lines, and
+only the stanzas of installed packages are decoded, so multi-hundred-MB
+list directories are read without being loaded whole. Gzip and xz
+compressed indexes are streamed line by line instead; lz4 ones are not
+supported.
+
+This is the candidate `apt-get upgrade` would pick when no pinning is
+configured: held packages are left out, APT preferences are ignored, and
+suites get APT's default priorities from their Release file. A
+NotAutomatic suite (e.g. experimental) is never a candidate, and one that
+also says ButAutomaticUpgrades (e.g. bookworm-backports) only upgrades
+packages whose installed version is not shipped by a regular suite.
+Like `apt-get upgrade`, upgrades whose new version depends on a package
+that is not installed, or conflicts with or breaks an installed one, are
+kept back, and so are phased updates (Phased-Update-Percentage below 100)
+unless a security suite ships them.
+Point the functions at a copy of the directories to run them on fixtures:
+
+    python3 apt_index.py [LISTS_DIR] [DPKG_STATUS]
+"""
+
+import gzip
+import lzma
+import mmap
+import os
+import re
+
+APT_LISTS_DIR = "/var/lib/apt/lists"
+DPKG_STATUS = "/var/lib/dpkg/status"
+
+PACKAGE_LINE = re.compile(rb"^Package: *(\S+)", re.MULTILINE)
+
+# One alternative of a Depends-like field, e.g. "libc6:any (>= 2.34)"
+RELATION = re.compile(r"^\s*([^\s:(]+)(?::\S+)?\s*(?:\(\s*(<<|<=|=|>=|>>|<|>)\s*([^)\s]+)\s*\))?")
+
+# Fields of a candidate kept to decide whether apt-get upgrade would keep it back
+UPGRADE_FIELDS = ("Pre-Depends", "Depends", "Conflicts", "Breaks", "Phased-Update-Percentage")
+
+# APT's default pin priorities
+PRIORITY_DEFAULT = 500
+PRIORITY_INSTALLED = 100  # also NotAutomatic suites with ButAutomaticUpgrades
+PRIORITY_NOT_AUTOMATIC = 1
+
+OPENERS = {".gz": gzip.open, ".xz": lzma.open}
+
+
+def _order(char):
+    # dpkg ordering of the non-digit parts: "~" sorts before everything,
+    # even the end of the string, and letters sort before other characters
+    if char == "~":
+        return -1
+    if char.isalpha():
+        return ord(char)
+    return ord(char) + 256
+
+
+def _compare_part(a, b):
+    i = j = 0
+    while i < len(a) or j < len(b):
+        while (i < len(a) and not a[i].isdigit()) or (j < len(b) and not b[j].isdigit()):
+            ac = _order(a[i]) if i < len(a) and not a[i].isdigit() else 0
+            bc = _order(b[j]) if j < len(b) and not b[j].isdigit() else 0
+            if ac != bc:
+                return -1 if ac < bc else 1
+            i += 1
+            j += 1
+        start = i
+        while i < len(a) and a[i].isdigit():
+            i += 1
+        a_number = int(a[start:i] or 0)
+        start = j
+        while j < len(b) and b[j].isdigit():
+            j += 1
+        b_number = int(b[start:j] or 0)
+        if a_number != b_number:
+            return -1 if a_number < b_number else 1
+    return 0
+
+
+def split_version(version):
+    """
+    Returns (epoch, upstream version, Debian revision) of a version string.
+    """
+    epoch, _, rest = version.partition(":") if ":" in version else ("0", "", version)
+    upstream, _, revision = rest.rpartition("-") if "-" in rest else (rest, "", "")
+    return int(epoch or 0), upstream, revision
+
+
+def compare_versions(a, b):
+    """
+    Compares two Debian versions like dpkg --compare-versions: returns -1, 0 or 1.
+    """
+    a_epoch, a_upstream, a_revision = split_version(a)
+    b_epoch, b_upstream, b_revision = split_version(b)
+    if a_epoch != b_epoch:
+        return -1 if a_epoch < b_epoch else 1
+    return _compare_part(a_upstream, b_upstream) or _compare_part(a_revision, b_revision)
+
+
+def version_satisfies(version, operator, reference):
+    """
+    Tells whether a version meets a relation such as (">=", "2.34"); no operator means any version.
+    """
+    if operator is None:
+        return True
+    result = compare_versions(version, reference)
+    if operator == "<<":
+        return result < 0
+    if operator in ("<=", "<"):  # "<" and ">" are obsolete spellings of "<=" and ">="
+        return result <= 0
+    if operator == "=":
+        return result == 0
+    if operator in (">=", ">"):
+        return result >= 0
+    return result > 0
+
+
+def parse_relations(value):
+    """
+    Returns the groups of alternatives of a Depends-like field as [[(name, operator, version), ...], ...].
+    """
+    groups = []
+    for group in value.split(","):
+        alternatives = [match.groups() for match in map(RELATION.match, group.split("|")) if match]
+        if alternatives:
+            groups.append(alternatives)
+    return groups
+
+
+def parse_stanza(stanza):
+    """
+    Returns the single-line fields of a control stanza as a dict of strings.
+    """
+    fields = {}
+    for line in stanza.decode("utf-8", "replace").splitlines():
+        if line and not line[0].isspace() and ":" in line:
+            name, value = line.split(":", 1)
+            fields[name] = value.strip()
+    return fields
+
+
+def iter_stanzas(data, wanted=None):
+    """
+    Yields the fields of each stanza of a memory-mapped index.
+
+    With `wanted`, a set of package names, other stanzas are skipped without
+    being decoded.
+    """
+    for match in PACKAGE_LINE.finditer(data):
+        if wanted is not None and match.group(1).decode() not in wanted:
+            continue
+        end = data.find(b"\n\n", match.start())
+        yield parse_stanza(data[match.start():end if end >= 0 else len(data)])
+
+
+def stream_stanzas(handle, wanted=None):
+    """
+    Yields the fields of each stanza of a file object, reading it line by line.
+    """
+    stanza = []
+    keep = True
+    for line in handle:
+        if not line.strip():
+            if stanza:
+                yield parse_stanza(b"".join(stanza))
+            stanza = []
+            keep = True
+        elif keep:
+            if wanted is not None and line.startswith(b"Package:") and line[8:].strip().decode() not in wanted:
+                keep = False
+                stanza = []
+            else:
+                stanza.append(line)
+    if stanza:
+        yield parse_stanza(b"".join(stanza))
+
+
+def read_index(path, wanted=None):
+    """
+    Yields the stanzas of a control file (dpkg status or Packages index).
+    """
+    opener = OPENERS.get(os.path.splitext(path)[1])
+    if opener:
+        with opener(path, "rb") as handle:
+            yield from stream_stanzas(handle, wanted)
+        return
+    with open(path, "rb") as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from iter_stanzas(data, wanted)
+
+
+def read_status(status_path=DPKG_STATUS):
+    """
+    Returns the installed packages as {(package, architecture): version}, and their versions by name.
+
+    The second dict, {package: [versions]}, includes held packages and the
+    virtual packages the installed ones provide (with an empty version
+    list): it is what the dependencies of an upgrade can rely on.
+    """
+    installed = {}
+    present = {}
+    for fields in read_index(status_path):
+        status = fields.get("Status", "")
+        if not status.endswith(" installed"):
+            continue
+        present.setdefault(fields["Package"], []).append(fields["Version"])
+        for name, _, _ in (group[0] for group in parse_relations(fields.get("Provides", ""))):
+            present.setdefault(name, [])
+        # "hold ok installed" packages are kept back by apt-get upgrade
+        if status.startswith("install "):
+            installed[(fields["Package"], fields.get("Architecture", ""))] = fields["Version"]
+    return installed, present
+
+
+def release_priority(fields):
+    """
+    Returns APT's default priority for the suite of a Release file.
+    """
+    if fields.get("NotAutomatic", "").lower() != "yes":
+        return PRIORITY_DEFAULT
+    if fields.get("ButAutomaticUpgrades", "").lower() == "yes":
+        return PRIORITY_INSTALLED
+    return PRIORITY_NOT_AUTOMATIC
+
+
+def read_release(lists_dir, index_name):
+    """
+    Returns (origin, suite, label, priority) of an index from the Release file of its distribution.
+
+    A suite name can contain "/" (buster/updates), stored as "_" like the
+    other separators, so the longest prefix of the index name that has a
+    Release file wins: buster_updates_main_... is not read as buster's.
+    """
+    prefix = index_name.split("_dists_", 1)
+    if len(prefix) == 2:
+        parts = prefix[1].split("_")
+        for end in range(len(parts) - 1, 0, -1):
+            distribution = f"{prefix[0]}_dists_{'_'.join(parts[:end])}_"
+            for name in ("InRelease", "Release"):
+                try:
+                    with open(os.path.join(lists_dir, distribution + name), "rb") as handle:
+                        header = handle.read(4096)
+                except OSError:
+                    continue
+                # The fields come first, after the PGP header of an InRelease file
+                fields = parse_stanza(header)
+                return (
+                    fields.get("Origin", "unknown"),
+                    fields.get("Suite") or fields.get("Codename", "unknown"),
+                    fields.get("Label", ""),
+                    release_priority(fields),
+                )
+    # Flat repositories have no dists/ directory
+    return "unknown", prefix[0], "", PRIORITY_DEFAULT
+
+
+def package_indexes(lists_dir=APT_LISTS_DIR):
+    """
+    Returns the paths of the Packages indexes in an APT lists directory.
+    """
+    return sorted(
+        os.path.join(lists_dir, name)
+        for name in os.listdir(lists_dir)
+        if name.endswith("_Packages") or any(name.endswith("_Packages" + ext) for ext in OPENERS)
+    )
+
+
+def is_security(release):
+    # Ubuntu and current Debian use <codename>-security; older Debian
+    # security archives use suites like oldstable, labelled Debian-Security
+    origin, suite, label, priority = release
+    return suite.endswith("-security") or suite.endswith("/updates") or "security" in label.lower()
+
+
+def is_present(present, name, operator, reference):
+    # A virtual package has no version of its own and meets any relation
+    versions = present.get(name)
+    if versions is None:
+        return False
+    return not versions or any(version_satisfies(version, operator, reference) for version in versions)
+
+
+def is_kept_back(name, fields, present):
+    """
+    Tells whether apt-get upgrade would keep back the candidate described by `fields`.
+
+    `present` maps the package names to their versions once the other
+    upgrades are applied. A dependency on a package that is not installed
+    would need a new install, and a conflict with an installed package a
+    removal, which apt-get upgrade never does.
+    """
+    for group in parse_relations(fields.get("Pre-Depends", "")) + parse_relations(fields.get("Depends", "")):
+        if not any(is_present(present, *alternative) for alternative in group):
+            return True
+    for field in ("Conflicts", "Breaks"):
+        for group in parse_relations(fields.get(field, "")):
+            for other, operator, reference in group:
+                # Conflicts on the package itself, or on a virtual package, come with Provides and Replaces
+                if other != name and any(version_satisfies(version, operator, reference) for version in present.get(other, [])):
+                    return True
+    return False
+
+
+def find_upgrades(lists_dir=APT_LISTS_DIR, status_path=DPKG_STATUS):
+    """
+    Returns the upgradable packages as a list of dicts.
+
+    Each has name, architecture, installed, candidate, the "Origin suite"
+    sources that ship the candidate, and whether one of them is a security
+    suite. Raises FileNotFoundError when there is no readable index at all.
+
+    As in APT, the candidate is the version with the highest priority, the
+    highest version among equals, and versions older than the installed
+    one are ignored; the installed version has at least PRIORITY_INSTALLED.
+    Upgrades apt-get upgrade would keep back are left out: the check is done
+    once, against all the other upgrades, without following the chain of
+    packages kept back because another one is.
+    """
+    installed, present = read_status(status_path)
+    wanted = {name for name, _ in installed}
+    indexes = package_indexes(lists_dir)
+    if not indexes:
+        raise FileNotFoundError(f"No Packages index in {lists_dir}")
+
+    versions = {}  # (name, arch) -> {version: [(origin, suite, label, priority), ...]}
+    controls = {}  # (name, arch, version) -> UPGRADE_FIELDS of the first stanza seen
+    for path in indexes:
+        release = read_release(lists_dir, os.path.basename(path))
+        for fields in read_index(path, wanted):
+            key = (fields["Package"], fields.get("Architecture", ""))
+            if key not in installed or "Version" not in fields:
+                continue
+            if compare_versions(fields["Version"], installed[key]) < 0:
+                continue  # never a candidate
+            releases = versions.setdefault(key, {}).setdefault(fields["Version"], [])
+            if release not in releases:
+                releases.append(release)
+            controls.setdefault(key + (fields["Version"],), {field: fields[field] for field in UPGRADE_FIELDS if field in fields})
+
+    candidates = []
+    for (name, arch), releases_by_version in sorted(versions.items()):
+        current = installed[(name, arch)]
+        candidate = current
+        best = max([PRIORITY_INSTALLED] + [release[3] for release in releases_by_version.get(current, [])])
+        for version, releases in releases_by_version.items():
+            priority = max(release[3] for release in releases)
+            if priority > best or (priority == best and compare_versions(version, candidate) > 0):
+                candidate, best = version, priority
+        if candidate == current:
+            continue
+        releases = releases_by_version[candidate]
+        candidates.append({
+            "name": name,
+            "architecture": arch,
+            "installed": current,
+            "candidate": candidate,
+            "sources": [f"{origin} {suite}" for origin, suite, label, priority in releases],
+            "security": any(is_security(release) for release in releases),
+        })
+
+    for upgrade in candidates:
+        versions_by_name = present[upgrade["name"]]
+        versions_by_name[versions_by_name.index(upgrade["installed"])] = upgrade["candidate"]
+    upgrades = []
+    for upgrade in candidates:
+        fields = controls[(upgrade["name"], upgrade["architecture"], upgrade["candidate"])]
+        phased = int(fields.get("Phased-Update-Percentage", 100)) < 100
+        if (phased and not upgrade["security"]) or is_kept_back(upgrade["name"], fields, present):
+            continue
+        upgrades.append(upgrade)
+    return upgrades
+
+
+def count_by_source(upgrades):
+    """
+    Returns {"Origin suite": number of upgrades}; a package shipped by several suites counts in each.
+    """
+    counts = {}
+    for upgrade in upgrades:
+        for source in upgrade["sources"]:
+            counts[source] = counts.get(source, 0) + 1
+    return counts
+
+
+if __name__ == "__main__":
+    import sys
+
+    upgrades = find_upgrades(*sys.argv[1:3])
+    print(f"{len(upgrades)} upgradable, {sum(u['security'] for u in upgrades)} from security suites")
+    for source, count in sorted(count_by_source(upgrades).items()):
+        print(f"{source}: {count}")
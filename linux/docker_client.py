@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Minimal Docker Engine API client for the linux/ container checks.
+
+Talks HTTP over the daemon's Unix socket ($DOCKER_HOST when it is a
+unix:// URL, else /var/run/docker.sock) with the standard library only, so
+a check costs one request instead of starting the docker CLI. Point
+DOCKER_HOST at docker_simulator.py to run the checks against fixtures.
+
+When DockerEventWatcher.py is running, load_containers() reads the live
+state file it maintains and does not query the daemon at all.
+"""
+
+import http.client
+import json
+import os
+import re
+import socket
+import time
+import urllib.parse
+
+from state_store import load_state
+
+DOCKER_SOCKET = "/var/run/docker.sock"
+TIMEOUT = 5  # seconds
+
+# The watcher rewrites its state file at least this often while it runs
+WATCHER_HEARTBEAT = 30  # seconds
+WATCHER_MAX_AGE = 3 * WATCHER_HEARTBEAT
+
+# Containers inspected individually (for restart counts) per one-shot query
+MAX_INSPECT = 20
+
+# States a check reports as failed
+FAILED_STATES = ("exited", "dead", "restarting")
+
+
+def socket_path():
+    host = os.environ.get("DOCKER_HOST", "")
+    if host.startswith("unix://"):
+        return host[len("unix://"):]
+    return DOCKER_SOCKET
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=TIMEOUT):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class DockerClient:
+    """
+    Keeps one connection to the daemon for a series of requests.
+    """
+
+    def __init__(self, path=None, timeout=TIMEOUT):
+        self.connection = UnixHTTPConnection(path or socket_path(), timeout)
+
+    def close(self):
+        self.connection.close()
+
+    def get(self, path, params=None):
+        """
+        Returns the decoded JSON answer to a GET request, or None if the object does not exist.
+        """
+        if params:
+            path += "?" + urllib.parse.urlencode(params)
+        self.connection.request("GET", path)
+        response = self.connection.getresponse()
+        body = response.read()
+        if response.status == 404:
+            return None
+        if response.status != 200:
+            raise OSError(f"Docker API {path}: HTTP {response.status}")
+        return json.loads(body)
+
+    def stream(self, path, params=None):
+        """
+        Yields the JSON objects of a streamed answer, such as /events, one per line.
+        """
+        if params:
+            path += "?" + urllib.parse.urlencode(params)
+        self.connection.request("GET", path)
+        response = self.connection.getresponse()
+        if response.status != 200:
+            raise OSError(f"Docker API {path}: HTTP {response.status}")
+        while True:
+            line = response.readline()
+            if not line:
+                return
+            if line.strip():
+                yield json.loads(line)
+
+
+def container_from_list(entry):
+    """
+    Summarises an entry of /containers/json; the restart count is not part of it.
+    """
+    status = entry.get("Status", "")
+    health = re.search(r"\((healthy|unhealthy|health: starting)\)", status)
+    exit_code = re.match(r"(?:Exited|Restarting) \((-?\d+)\)", status)
+    names = entry.get("Names") or [entry["Id"][:12]]
+    return {
+        "id": entry["Id"],
+        "name": names[0].lstrip("/"),
+        "state": entry.get("State", ""),
+        "health": health.group(1).replace("health: ", "") if health else None,
+        "exit_code": int(exit_code.group(1)) if exit_code else None,
+        "restart_count": None,
+    }
+
+
+def container_from_inspect(info):
+    """
+    Summarises the answer of /containers/<id>/json.
+    """
+    state = info.get("State", {})
+    return {
+        "id": info["Id"],
+        "name": info.get("Name", info["Id"][:12]).lstrip("/"),
+        "state": state.get("Status", ""),
+        "health": (state.get("Health") or {}).get("Status"),
+        "exit_code": state.get("ExitCode") if state.get("Status") in FAILED_STATES else None,
+        "restart_count": info.get("RestartCount", 0),
+    }
+
+
+def is_failed(container):
+    return container["state"] in FAILED_STATES or container["health"] == "unhealthy"
+
+
+def query_containers(inspect="failed"):
+    """
+    Returns the summaries of all containers, from one /containers/json request.
+
+    Containers are then inspected to get their restart count: the failed
+    ones (at most MAX_INSPECT) with inspect="failed", all with "all", none
+    with "none".
+    """
+    client = DockerClient()
+    try:
+        containers = [container_from_list(entry) for entry in client.get("/containers/json", {"all": 1})]
+        if inspect == "all":
+            targets = containers
+        elif inspect == "failed":
+            targets = [container for container in containers if is_failed(container)][:MAX_INSPECT]
+        else:
+            targets = []
+        for container in targets:
+            info = client.get(f"/containers/{container['id']}/json")
+            if info is not None:
+                container.update(container_from_inspect(info))
+        return containers
+    finally:
+        client.close()
+
+
+def load_containers():
+    """
+    Returns the container summaries, from the watcher's state file when it is fresh.
+    """
+    state = load_state("docker-containers")
+    if state and time.time() - state.get("time", 0) <= WATCHER_MAX_AGE:
+        return list(state["containers"].values())
+    return query_containers()
+
+
+def count_states(containers):
+    """
+    Returns the running, exited, restarting and unhealthy counts.
+    """
+    return {
+        "running": sum(1 for c in containers if c["state"] == "running"),
+        "exited": sum(1 for c in containers if c["state"] in ("exited", "dead")),
+        "restarting": sum(1 for c in containers if c["state"] == "restarting"),
+        "unhealthy": sum(1 for c in containers if c["health"] == "unhealthy"),
+    }
+
+
+def describe(container):
+    """
+    Returns a one-line description such as "web: exited (code 137), 3 restarts".
+    """
+    line = f"{container['name']}: {container['state']}"
+    if container["exit_code"] is not None:
+        line += f" (code {container['exit_code']})"
+    if container["health"]:
+        line += f", {container['health']}"
+    if container["restart_count"]:
+        line += f", {container['restart_count']} restarts"
+    return line
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Fake Docker daemon on a Unix socket, to run the container checks against fixtures.
+
+The fixture is a JSON file with:
+- "containers": /containers/<id>/json answers (Id, Name, State, RestartCount);
+  /containers/json is derived from them;
+- "events" (optional): [{"delay": seconds, "id": container id, "Action":
+  "die", "container": new inspect answer or null once removed}], played
+  once on the first /events request.
+
+Usage: python3 docker_simulator.py <SOCKET_PATH> <FIXTURE_JSON>
+then e.g. DOCKER_HOST=unix://<SOCKET_PATH> python3 CheckContainerError.py
+"""
+
+import http.server
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+import urllib.parse
+
+
+def list_entry(info):
+    state = info["State"]
+    if state["Status"] == "running":
+        status = "Up 5 minutes"
+        if state.get("Health"):
+            status += f" ({state['Health']['Status']})".replace("(starting)", "(health: starting)")
+    elif state["Status"] == "restarting":
+        status = f"Restarting ({state.get('ExitCode', 0)}) 2 seconds ago"
+    elif state["Status"] in ("exited", "dead"):
+        status = f"Exited ({state.get('ExitCode', 0)}) 5 minutes ago"
+    else:
+        status = state["Status"].capitalize()
+    return {"Id": info["Id"], "Names": [info["Name"]], "State": state["Status"], "Status": status}
+
+
+class DockerSimulator:
+    def __init__(self, fixture):
+        self.lock = threading.Lock()
+        self.containers = {info["Id"]: info for info in fixture.get("containers", [])}
+        self.events = list(fixture.get("events", []))
+        self.requests = 0
+
+    def count(self):
+        with self.lock:
+            self.requests += 1
+
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        simulator = self.server.simulator
+        simulator.count()
+        path = urllib.parse.urlparse(self.path).path
+        parts = path.strip("/").split("/")
+        if path == "/containers/json":
+            with simulator.lock:
+                self.send_json(200, [list_entry(info) for info in simulator.containers.values()])
+        elif len(parts) == 3 and parts[0] == "containers" and parts[2] == "json":
+            with simulator.lock:
+                info = simulator.containers.get(parts[1])
+            if info is None:
+                self.send_json(404, {"message": f"No such container: {parts[1]}"})
+            else:
+                self.send_json(200, info)
+        elif path == "/events":
+            self.stream_events()
+        else:
+            self.send_json(404, {"message": "page not found"})
+
+    def stream_events(self):
+        simulator = self.server.simulator
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        with simulator.lock:
+            events, simulator.events = simulator.events, []
+        try:
+            for event in events:
+                time.sleep(event.get("delay", 0))
+                with simulator.lock:
+                    if event.get("container"):
+                        simulator.containers[event["id"]] = event["container"]
+                    else:
+                        simulator.containers.pop(event["id"], None)
+                line = json.dumps(
+                    {"Type": "container", "Action": event["Action"], "id": event["id"], "timeNano": time.time_ns()}
+                ).encode() + b"\n"
+                self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+            while True:
+                time.sleep(1)  # the daemon keeps the stream open until the client leaves
+        except OSError:
+            pass
+
+
+def main():
+    if len(sys.argv) != 3:
+        print("Usage: python3 docker_simulator.py <SOCKET_PATH> <FIXTURE_JSON>")
+        sys.exit(1)
+    path = sys.argv[1]
+    with open(sys.argv[2]) as handle:
+        fixture = json.load(handle)
+    if os.path.exists(path):
+        os.remove(path)
+
+    server = socketserver.ThreadingUnixStreamServer(path, RequestHandler)
+    server.daemon_threads = True
+    server.simulator = DockerSimulator(fixture)
+    print(f"Simulating the Docker daemon on {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Fixed-size, memory-mapped ring buffer of recent metric samples.
+
+Each metric of METRICS keeps three tiers in one file of the state
+directory (metrics.ring, about 260 KB):
+
+- the last 15 minutes of samples at 1 s resolution;
+- 1 minute buckets for the last hour;
+- 5 minute buckets for the last 12 hours.
+
+A bucket holds the count, sum, min, max and a histogram of its samples, so
+rules over a window only read the handful of buckets that cover it, never
+the samples: sustained_above("cpu_percent", 90, 300) answers "above 90 for
+5 minutes" and percentile("cpu_percent", 95, 900) the p95 over 15 minutes.
+Windows are rounded out to whole buckets, which makes sustained rules
+slightly stricter, and percentiles are accurate to one histogram bin (2%
+of the metric's range).
+
+MetricsCollector.py adds a sample every second; without it, the checks add
+the value of each run, and the buckets are then as dense as the schedule.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import time
+
+from state_store import STATE_DIR, ensure_state_dir
+
+# Metric name -> (low, high) range of its histogram; values outside are clamped
+METRICS = {
+    "cpu_percent": (0, 100),
+    "iowait_percent": (0, 100),
+    "steal_percent": (0, 100),
+    "memory_percent": (0, 100),
+    "swap_percent": (0, 100),
+    "load_per_cpu": (0, 8),
+}
+MAX_METRICS = 8
+
+RAW_SLOTS = 15 * 60  # 1 s samples
+TIERS = ((60, 60), (300, 144))  # (bucket seconds, buckets)
+HISTOGRAM_BINS = 50
+
+MAGIC = b"RMMRING1"
+HEADER = struct.Struct("<8sI")  # magic, number of metrics
+METRIC_ENTRY = struct.Struct("<32sff")  # name, histogram low, high
+RAW_SAMPLE = struct.Struct("<If")  # time, value
+BUCKET = struct.Struct(f"<IIdff{HISTOGRAM_BINS}H")  # start, count, sum, min, max, histogram
+
+TABLE_SIZE = HEADER.size + MAX_METRICS * METRIC_ENTRY.size
+METRIC_SIZE = RAW_SLOTS * RAW_SAMPLE.size + sum(count for _, count in TIERS) * BUCKET.size
+FILE_SIZE = TABLE_SIZE + MAX_METRICS * METRIC_SIZE
+
+
+class MetricRing:
+    """
+    Opens (or creates) the ring file; use add() to record and the rule methods to query.
+    """
+
+    def __init__(self, path=None, metrics=METRICS):
+        if path is None:
+            if not ensure_state_dir():
+                raise PermissionError(f"{STATE_DIR} belongs to another user or is writable by others")
+            path = os.path.join(STATE_DIR, "metrics.ring")
+        self.path = path
+        self.names = list(metrics)[:MAX_METRICS]
+        self.ranges = metrics
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.fd = self._open()
+        try:
+            self.map = mmap.mmap(self.fd, FILE_SIZE)
+        except OSError:
+            os.close(self.fd)
+            raise
+        if self.map[:TABLE_SIZE] != self._table():
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                if self.map[:TABLE_SIZE] != self._table():
+                    # New file, or another list of metrics: start over
+                    self.map[:] = bytes(FILE_SIZE)
+                    self.map[:TABLE_SIZE] = self._table()
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def _open(self):
+        """
+        Returns a descriptor of the ring file, replacing a missing or wrongly sized one.
+
+        A file of the wrong size (another layout) is never truncated in
+        place: a process that has it mapped would get SIGBUS. A new file is
+        written aside and renamed over it, under the old file's lock, so
+        that two processes do not both replace it.
+        """
+        while True:
+            try:
+                fd = os.open(self.path, os.O_RDWR)
+            except FileNotFoundError:
+                fd = None
+            if fd is not None and os.fstat(fd).st_size == FILE_SIZE:
+                return fd
+            try:
+                if fd is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                    if os.stat(self.path).st_ino != os.fstat(fd).st_ino:
+                        continue  # replaced while we waited for the lock
+                temp_path = f"{self.path}.{os.getpid()}.tmp"
+                temp_fd = os.open(temp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+                try:
+                    os.ftruncate(temp_fd, FILE_SIZE)
+                finally:
+                    os.close(temp_fd)
+                if fd is None:
+                    try:
+                        os.link(temp_path, self.path)  # fails if another process created it first
+                    except FileExistsError:
+                        pass
+                    os.unlink(temp_path)
+                else:
+                    os.replace(temp_path, self.path)
+            finally:
+                if fd is not None:
+                    os.close(fd)
+
+    def _table(self):
+        table = HEADER.pack(MAGIC, len(self.names))
+        for name in self.names:
+            table += METRIC_ENTRY.pack(name.encode(), *self.ranges[name])
+        return table.ljust(TABLE_SIZE, b"\0")
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+    def _offsets(self, name):
+        """
+        Returns the offsets of the raw samples and of each tier of a metric.
+        """
+        offset = TABLE_SIZE + self.names.index(name) * METRIC_SIZE
+        offsets = [offset]
+        offset += RAW_SLOTS * RAW_SAMPLE.size
+        for _, count in TIERS:
+            offsets.append(offset)
+            offset += count * BUCKET.size
+        return offsets
+
+    def _bin(self, name, value):
+        low, high = self.ranges[name]
+        position = int((value - low) / (high - low) * HISTOGRAM_BINS)
+        return min(max(position, 0), HISTOGRAM_BINS - 1)
+
+    def add(self, name, value, timestamp=None):
+        """
+        Records a sample of a metric.
+
+        The buckets are updated under an exclusive lock of the file, so a
+        check and the collector adding at the same time lose no sample.
+        """
+        second = int(timestamp if timestamp is not None else time.time())
+        raw_offset, *tier_offsets = self._offsets(name)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            RAW_SAMPLE.pack_into(self.map, raw_offset + (second % RAW_SLOTS) * RAW_SAMPLE.size, second, value)
+            for (width, count), tier_offset in zip(TIERS, tier_offsets):
+                start = second - second % width
+                offset = tier_offset + (start // width % count) * BUCKET.size
+                bucket = list(BUCKET.unpack_from(self.map, offset))
+                if bucket[0] != start:
+                    bucket = [start, 0, 0.0, value, value] + [0] * HISTOGRAM_BINS
+                bucket[1] += 1
+                bucket[2] += value
+                bucket[3] = min(bucket[3], value)
+                bucket[4] = max(bucket[4], value)
+                position = 5 + self._bin(name, value)
+                bucket[position] = min(bucket[position] + 1, 0xFFFF)
+                BUCKET.pack_into(self.map, offset, *bucket)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def latest(self, name, max_age=5, now=None):
+        """
+        Returns the 1 s sample of the last few seconds, or None.
+        """
+        now = int(now if now is not None else time.time())
+        raw_offset = self._offsets(name)[0]
+        for second in range(now, now - max_age - 1, -1):
+            sample_time, value = RAW_SAMPLE.unpack_from(self.map, raw_offset + (second % RAW_SLOTS) * RAW_SAMPLE.size)
+            if sample_time == second:
+                return value
+        return None
+
+    def buckets(self, name, seconds, now=None):
+        """
+        Returns the buckets covering the last `seconds`, from the finest tier without gaps.
+
+        Returns None if no tier has a sample in every bucket of the window,
+        e.g. when the window is longer than the tier keeps or a check runs
+        less often than the buckets are wide.
+        """
+        now = int(now if now is not None else time.time())
+        offsets = self._offsets(name)[1:]
+        for (width, count), tier_offset in zip(TIERS, offsets):
+            first = (now - seconds) - (now - seconds) % width
+            starts = range(first, now + 1, width)
+            if len(starts) > count:
+                continue
+            buckets = []
+            for start in starts:
+                bucket = BUCKET.unpack_from(self.map, tier_offset + (start // width % count) * BUCKET.size)
+                if bucket[0] == start and bucket[1]:
+                    buckets.append(bucket)
+                elif start != starts[-1] or not buckets:
+                    break  # a gap; the current bucket may just not have its first sample yet
+            else:
+                return buckets
+        return None
+
+    def sustained_above(self, name, threshold, seconds, now=None):
+        """
+        Returns whether every sample of the last `seconds` was above threshold, or None without enough data.
+        """
+        buckets = self.buckets(name, seconds, now)
+        if buckets is None:
+            return None
+        return min(bucket[3] for bucket in buckets) > threshold
+
+    def percentile(self, name, percent, seconds, now=None):
+        """
+        Returns the given percentile of the last `seconds` (upper edge of its bin), or None.
+        """
+        buckets = self.buckets(name, seconds, now)
+        if buckets is None:
+            return None
+        histogram = [sum(counts) for counts in zip(*(bucket[5:] for bucket in buckets))]
+        rank = sum(histogram) * percent / 100
+        low, high = self.ranges[name]
+        cumulated = 0
+        for position, count in enumerate(histogram):
+            cumulated += count
+            if cumulated >= rank:
+                edge = low + (position + 1) * (high - low) / HISTOGRAM_BINS
+                # The top bin also holds clamped values; the max is then exact
+                return min(edge, max(bucket[4] for bucket in buckets))
+        return None
+
+
+def open_ring():
+    """
+    Returns the host's ring, or None if it cannot be opened (e.g. read-only state directory).
+    """
+    try:
+        return MetricRing()
+    except (OSError, ValueError):
+        return None
+
+
+def sustained_severity(ring, name, warning, alarm, seconds):
+    """
+    Returns 1 (Alarm) or 2 (Warning) if the metric stayed above a threshold for `seconds`, else 0.
+
+    Returns None when the ring does not cover the window, so that the
+    check can fall back to its instantaneous value.
+    """
+    if ring is None:
+        return None
+    above_alarm = ring.sustained_above(name, alarm, seconds)
+    if above_alarm is None:
+        return None
+    if above_alarm:
+        return 1
+    return 2 if ring.sustained_above(name, warning, seconds) else 0
+
+
+if __name__ == "__main__":
+    # Print what the ring holds, e.g. to tune a sustained-threshold rule
+    ring = MetricRing()
+    for metric in ring.names:
+        print(
+            f"{metric}: now {ring.latest(metric)}, "
+            f"p95 15 min {ring.percentile(metric, 95, 900)}, "
+            f"p95 1 h {ring.percentile(metric, 95, 3600)}"
+        )
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Reads system counters straight from /proc for the linux/ checks.
+
+Only the standard library is used, so a check that relies on this module
+starts fast and works on minimal images without psutil. Set RMM_PROC_ROOT
+and RMM_SYS_ROOT to read copies of /proc and /sys instead of the live ones;
+the functions read PROC_ROOT and SYS_ROOT when called, so tests can also
+change them after import.
+"""
+
+import os
+import time
+
+PROC_ROOT = os.environ.get("RMM_PROC_ROOT", "/proc")
+SYS_ROOT = os.environ.get("RMM_SYS_ROOT", "/sys")
+
+# Columns of the cpu lines of /proc/stat that add up to the elapsed time
+# (guest time is already included in user and nice)
+CPU_FIELDS = ("user", "nice", "system", "idle", "iowait", "irq", "softirq", "steal")
+
+
+def read_cpu_times(proc_root=None):
+    """
+    Returns (boot_time, {"cpu": [ticks...], "cpu0": [...], ...}) from /proc/stat.
+
+    Each list holds the CPU_FIELDS columns, in clock ticks since boot.
+    """
+    boot_time = None
+    cpus = {}
+    with open(os.path.join(proc_root or PROC_ROOT, "stat")) as handle:
+        for line in handle:
+            if line.startswith("cpu"):
+                fields = line.split()
+                cpus[fields[0]] = [int(x) for x in fields[1:len(CPU_FIELDS) + 1]]
+            elif line.startswith("btime"):
+                boot_time = int(line.split()[1])
+    return boot_time, cpus
+
+
+def _busy_share(previous, current):
+    """
+    Returns (busy %, iowait %, steal %) between two rows of CPU_FIELDS ticks, or None.
+    """
+    deltas = [max(0, now - before) for before, now in zip(previous, current)]
+    total = sum(deltas)
+    if total <= 0:
+        return None
+    idle = deltas[CPU_FIELDS.index("idle")] + deltas[CPU_FIELDS.index("iowait")]
+    return (
+        (total - idle) / total * 100,
+        deltas[CPU_FIELDS.index("iowait")] / total * 100,
+        deltas[CPU_FIELDS.index("steal")] / total * 100,
+    )
+
+
+def cpu_usage(previous, current):
+    """
+    Computes CPU usage between two read_cpu_times() samples.
+
+    Returns a dict with the overall busy percentage, the busiest core,
+    iowait and steal, or None if no CPU time elapsed in between.
+    """
+    overall = _busy_share(previous["cpu"], current["cpu"])
+    if overall is None:
+        return None
+    cores = [
+        _busy_share(previous[name], times)
+        for name, times in current.items()
+        if name != "cpu" and name in previous
+    ]
+    return {
+        "cpu_percent": overall[0],
+        "max_core_percent": max((core[0] for core in cores if core), default=overall[0]),
+        "iowait_percent": overall[1],
+        "steal_percent": overall[2],
+    }
+
+
+# Columns of /proc/net/dev, receive side then transmit side
+NET_FIELDS = (
+    "rx_bytes", "rx_packets", "rx_errors", "rx_drops", "rx_fifo", "rx_frame", "rx_compressed", "rx_multicast",
+    "tx_bytes", "tx_packets", "tx_errors", "tx_drops", "tx_fifo", "tx_colls", "tx_carrier", "tx_compressed",
+)
+
+
+def read_net_dev(proc_root=None):
+    """
+    Returns {interface: {field: counter}} from /proc/net/dev.
+    """
+    interfaces = {}
+    with open(os.path.join(proc_root or PROC_ROOT, "net", "dev")) as handle:
+        for line in handle:
+            if ":" not in line:
+                continue  # header lines
+            name, counters = line.split(":", 1)
+            interfaces[name.strip()] = dict(zip(NET_FIELDS, (int(x) for x in counters.split())))
+    return interfaces
+
+
+def read_link_speed(interface, sys_root=None):
+    """
+    Returns the negotiated link speed of an interface in Mbit/s, or None if unknown.
+
+    Virtual interfaces and links that are down have no speed (the kernel
+    reports -1 or refuses the read).
+    """
+    try:
+        with open(os.path.join(sys_root or SYS_ROOT, "class", "net", interface, "speed")) as handle:
+            speed = int(handle.read())
+    except (OSError, ValueError):
+        return None
+    return speed if speed > 0 else None
+
+
+def net_rates(previous, current, seconds):
+    """
+    Computes per-interface rates between two read_net_dev() samples taken `seconds` apart.
+
+    Returns {interface: {"rx", "tx" (bytes/s), "errors", "drops" (new since
+    the previous sample)}}. Interfaces missing from the previous sample or
+    whose counters went backwards (reset or re-created) are left out.
+    """
+    rates = {}
+    for name, counters in current.items():
+        old = previous.get(name)
+        if old is None:
+            continue
+        deltas = {field: counters[field] - old.get(field, 0) for field in counters}
+        if any(delta < 0 for delta in deltas.values()):
+            continue
+        rates[name] = {
+            "rx": deltas["rx_bytes"] / seconds,
+            "tx": deltas["tx_bytes"] / seconds,
+            "errors": deltas["rx_errors"] + deltas["tx_errors"],
+            "drops": deltas["rx_drops"] + deltas["tx_drops"],
+        }
+    return rates
+
+
+def read_meminfo(proc_root=None):
+    """
+    Returns {field: bytes} from /proc/meminfo (counts without a unit are kept as is).
+    """
+    meminfo = {}
+    with open(os.path.join(proc_root or PROC_ROOT, "meminfo")) as handle:
+        for line in handle:
+            name, value = line.split(":", 1)
+            fields = value.split()
+            meminfo[name] = int(fields[0]) * 1024 if fields[1:] == ["kB"] else int(fields[0])
+    return meminfo
+
+
+def memory_usage(meminfo):
+    """
+    Returns (memory %, swap %) from read_meminfo(), counting memory the kernel can reclaim as free.
+
+    The swap percentage is None when there is no swap.
+    """
+    total = meminfo["MemTotal"]
+    # MemAvailable appeared in Linux 3.14; approximate it on older kernels
+    available = meminfo.get("MemAvailable", meminfo["MemFree"] + meminfo.get("Buffers", 0) + meminfo.get("Cached", 0))
+    memory_percent = (total - available) / total * 100
+    swap_total = meminfo.get("SwapTotal", 0)
+    swap_percent = (swap_total - meminfo.get("SwapFree", 0)) / swap_total * 100 if swap_total else None
+    return memory_percent, swap_percent
+
+
+def read_loadavg(proc_root=None):
+    """
+    Returns the 1, 5 and 15 minute load averages from /proc/loadavg.
+    """
+    with open(os.path.join(proc_root or PROC_ROOT, "loadavg")) as handle:
+        return tuple(float(x) for x in handle.read().split()[:3])
+
+
+def statvfs_usage(stat):
+    """
+    Returns (space %, inodes %, free bytes) from an os.statvfs() result, as df computes them.
+
+    Space reserved for root counts as unavailable; the inode percentage is
+    None on filesystems without a fixed inode count (btrfs, some FUSE).
+    """
+    used = stat.f_blocks - stat.f_bfree
+    space_percent = used / (used + stat.f_bavail) * 100 if used + stat.f_bavail else 0.0
+    inodes_percent = (stat.f_files - stat.f_ffree) / stat.f_files * 100 if stat.f_files else None
+    return space_percent, inodes_percent, stat.f_bavail * stat.f_frsize
+
+
+def disk_usage(path):
+    """
+    Returns (space %, inodes %) of the filesystem holding `path`; see statvfs_usage().
+    """
+    return statvfs_usage(os.statvfs(path))[:2]
+
+
+def _unescape_mount_field(field):
+    # Spaces, tabs, newlines and backslashes are written as octal escapes
+    if "\\" not in field:
+        return field
+    import re
+
+    return re.sub(r"\\([0-7]{3})", lambda match: chr(int(match.group(1), 8)), field)
+
+
+def read_mountinfo(proc_root=None):
+    """
+    Returns the mounts of /proc/self/mountinfo as dicts, in mount order.
+
+    Each has device ("major:minor"), root (the directory of the filesystem
+    mounted there, "/" unless it is a bind mount), mount_point, fstype and
+    source.
+    """
+    mounts = []
+    with open(os.path.join(proc_root or PROC_ROOT, "self", "mountinfo")) as handle:
+        for line in handle:
+            fields = line.split()
+            # Optional fields end with "-", followed by type, source and options
+            separator = fields.index("-", 6)
+            mounts.append({
+                "device": fields[2],
+                "root": _unescape_mount_field(fields[3]),
+                "mount_point": _unescape_mount_field(fields[4]),
+                "fstype": fields[separator + 1],
+                "source": _unescape_mount_field(fields[separator + 2]),
+            })
+    return mounts
+
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def read_uptime(proc_root=None):
+    """
+    Returns the seconds since boot from /proc/uptime.
+    """
+    with open(os.path.join(proc_root or PROC_ROOT, "uptime")) as handle:
+        return float(handle.read().split()[0])
+
+
+def read_processes(proc_root=None, deadline=None):
+    """
+    Returns ({pid: (name, cpu ticks, start ticks, rss bytes)}, complete) from /proc/<pid>/stat.
+
+    One file is read per process. With `deadline` (a time.monotonic()
+    value), the scan stops when it is reached and `complete` is False.
+    Processes that exit during the scan are skipped.
+    """
+    processes = {}
+    pids = [name for name in os.listdir(proc_root or PROC_ROOT) if name.isdigit()]
+    for count, pid in enumerate(pids):
+        if deadline is not None and count % 256 == 0 and time.monotonic() > deadline:
+            return processes, False
+        try:
+            with open(os.path.join(proc_root or PROC_ROOT, pid, "stat"), "rb") as handle:
+                data = handle.read()
+        except OSError:
+            continue
+        # The name is in parentheses and may itself contain spaces or ")"
+        name_end = data.rfind(b")")
+        fields = data[name_end + 2:].split()
+        processes[int(pid)] = (
+            data[data.find(b"(") + 1:name_end].decode("utf-8", "replace"),
+            int(fields[11]) + int(fields[12]),  # utime + stime
+            int(fields[19]),  # starttime
+            int(fields[21]) * PAGE_SIZE,  # rss
+        )
+    return processes, True
+
+
+def read_pss(pid, proc_root=None):
+    """
+    Returns the proportional set size of a process in bytes, or None if it cannot be read.
+
+    PSS splits shared pages between the processes that map them, so it adds
+    up to the real memory use where RSS counts shared libraries many times.
+    """
+    try:
+        with open(os.path.join(proc_root or PROC_ROOT, str(pid), "smaps_rollup"), "rb") as handle:
+            for line in handle:
+                if line.startswith(b"Pss:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def read_cmdline(pid, proc_root=None):
+    """
+    Returns the command line of a process as one string ("" for kernel threads or on error).
+    """
+    try:
+        with open(os.path.join(proc_root or PROC_ROOT, str(pid), "cmdline"), "rb") as handle:
+            return handle.read().rstrip(b"\0").replace(b"\0", b" ").decode("utf-8", "replace")
+    except OSError:
+        return ""
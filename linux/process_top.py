@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Finds the processes behind a CPU or memory alarm.
+
+One pass over /proc/<pid>/stat gives the CPU time and RSS of every
+process. CPU usage is the CPU time used since the previous scan, whose
+per-process counters are kept in the state store, so no sampling sleep is
+needed; a process started since then is measured over its own lifetime.
+MetricsCollector.py calls refresh_snapshot() every minute, so an alarm
+reports the usage of the last minute; without the collector, it is the
+usage since the previous alarm, or over the process lifetimes.
+Only the top processes by RSS get their PSS and command line read. The scan
+stops at a time budget, so a host with tens of thousands of processes
+reports what it could read instead of delaying the check.
+"""
+
+import os
+import time
+
+from proc_reader import CLOCK_TICKS, read_cmdline, read_processes, read_pss, read_uptime
+from state_store import load_state, save_state
+
+TOP_N = 5
+TIME_BUDGET = 0.5  # seconds for the whole scan
+
+MAX_SNAPSHOT_AGE = 60 * 60  # seconds; CPU usage over a longer interval says little
+
+
+def save_snapshot(processes, now):
+    save_state("process-snapshot", {"time": now, "processes": {pid: [p[2], p[1]] for pid, p in processes.items()}})
+
+
+def refresh_snapshot(budget=TIME_BUDGET):
+    """
+    Saves the CPU time of every process without reporting; never raises.
+    """
+    try:
+        now = time.time()
+        save_snapshot(read_processes(deadline=time.monotonic() + budget)[0], now)
+    except Exception:
+        pass
+
+
+def scan(budget=TIME_BUDGET):
+    """
+    Returns (processes, cpu percentages {pid: %}, interval in seconds or None, complete).
+
+    Percentages are per core, as in top. Without a usable previous scan,
+    each process is measured over its lifetime and the interval is None.
+    """
+    now = time.time()
+    processes, complete = read_processes(deadline=time.monotonic() + budget)
+    uptime = read_uptime()
+    previous = load_state("process-snapshot")
+    save_snapshot(processes, now)
+
+    interval = None
+    before = {}
+    if previous and 0 < now - previous["time"] <= MAX_SNAPSHOT_AGE:
+        interval = now - previous["time"]
+        before = previous["processes"]
+
+    processes.pop(os.getpid(), None)  # the check itself
+    cpu = {}
+    for pid, (name, ticks, start, rss) in processes.items():
+        known = before.get(str(pid))
+        if known and known[0] == start:
+            seconds = interval
+            used = ticks - known[1]
+        else:
+            # Not in the previous scan (new, or a reused pid): its whole lifetime
+            seconds = uptime - start / CLOCK_TICKS
+            used = ticks
+        if seconds > 0:
+            cpu[pid] = used / CLOCK_TICKS / seconds * 100
+    return processes, cpu, interval, complete
+
+
+def top_cpu_lines(processes, cpu, interval, n=TOP_N):
+    lines = []
+    for pid in sorted(cpu, key=cpu.get, reverse=True)[:n]:
+        command = read_cmdline(pid) or f"[{processes[pid][0]}]"
+        lines.append(f"  {cpu[pid]:5.1f}%  {pid:>7}  {command[:100]}")
+    period = f"last {interval:.0f}s" if interval else "since process start"
+    return [f"Top CPU ({period}):"] + lines
+
+
+def top_memory_lines(processes, n=TOP_N):
+    # PSS is only read for a few more than the top RSS, which bounds the cost
+    candidates = sorted(processes, key=lambda pid: processes[pid][3], reverse=True)[:n * 2]
+    memory = {pid: (read_pss(pid), processes[pid][3]) for pid in candidates}
+    lines = []
+    for pid in sorted(memory, key=lambda pid: memory[pid][0] or memory[pid][1], reverse=True)[:n]:
+        pss, rss = memory[pid]
+        command = read_cmdline(pid) or f"[{processes[pid][0]}]"
+        pss_text = f"{pss / 1048576:8.1f}" if pss is not None else "       ?"
+        lines.append(f"  {pss_text} {rss / 1048576:8.1f}  {pid:>7}  {command[:100]}")
+    return ["Top memory (PSS MB, RSS MB):"] + lines
+
+
+def top_processes(cpu=True, memory=True, n=TOP_N, budget=TIME_BUDGET):
+    """
+    Returns the lines describing the top processes, to print after a check's result.
+    """
+    processes, cpu_usage, interval, complete = scan(budget)
+    lines = []
+    if cpu:
+        lines += top_cpu_lines(processes, cpu_usage, interval, n)
+    if memory:
+        lines += top_memory_lines(processes, n)
+    if not complete:
+        lines.append(f"(time budget reached after {len(processes)} processes)")
+    return lines
+
+
+def report_top_processes(cpu=True, memory=True):
+    """
+    Prints the top processes after a check's result; never raises, so it cannot change that result.
+    """
+    try:
+        lines = top_processes(cpu=cpu, memory=memory)
+    except Exception:
+        return
+    for line in lines:
+        print(line)
+
+
+if __name__ == "__main__":
+    for line in top_processes():
+        print(line)
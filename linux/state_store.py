@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Keeps small JSON values between runs of the linux/ checks, such as the
+previous /proc/stat counters, so a check can compute rates without sleeping.
+
+Entries live in RMM_STATE_DIR (default: /run/rmm-scripts for root, else
+`rmm-scripts-<uid>` in the system temp directory) and are replaced
+atomically. A missing or unreadable entry reads as the default and a failed
+write is ignored: the check then behaves as on its first run. So does a
+state directory that another user owns or can write to, which could hold
+values planted to fool the checks.
+
+Importing this module only loads os and stat; json is imported on the
+first load or save, so modules that only need STATE_DIR (metric_ring) do
+not slow down the start-up of every check.
+"""
+
+import os
+import stat
+
+# The system temp directory as tempfile.gettempdir() finds it on Linux;
+# tempfile itself is not imported, it would double the start-up time of a check
+TEMP_DIR = os.environ.get("TMPDIR") or os.environ.get("TEMP") or os.environ.get("TMP") or "/tmp"
+
+
+def default_state_dir():
+    if os.getuid() == 0 and os.path.isdir("/run"):
+        return "/run/rmm-scripts"
+    # One directory per user: in a shared temp directory, another user could create ours first
+    return os.path.join(TEMP_DIR, f"rmm-scripts-{os.getuid()}")
+
+
+STATE_DIR = os.environ.get("RMM_STATE_DIR") or default_state_dir()
+
+_trusted = None
+
+
+def ensure_state_dir():
+    """
+    Creates STATE_DIR (mode 0700) if needed and returns whether it can be trusted.
+
+    An existing directory is only used if it is a real directory, belongs to
+    the current user and nobody else can write to it.
+    """
+    global _trusted
+    if _trusted is None:
+        try:
+            os.makedirs(STATE_DIR, 0o700, exist_ok=True)
+            st = os.lstat(STATE_DIR)
+            _trusted = stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and not st.st_mode & 0o022
+        except OSError:
+            _trusted = False
+    return _trusted
+
+
+def state_path(name):
+    safe = "".join(c if c.isascii() and (c.isalnum() or c in "_.-") else "_" for c in name)
+    return os.path.join(STATE_DIR, safe + ".json")
+
+
+def load_state(name, default=None):
+    if not ensure_state_dir():
+        return default
+    import json
+
+    try:
+        with open(state_path(name)) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return default
+
+
+def save_state(name, data):
+    if not ensure_state_dir():
+        return False
+    import json
+
+    try:
+        path = state_path(name)
+        temp_path = os.path.join(STATE_DIR, f".tmp-{os.getpid()}-{os.path.basename(path)}")
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as handle:
+            json.dump(data, handle, separators=(",", ":"))
+        os.replace(temp_path, path)
+        return True
+    except OSError:
+        return False
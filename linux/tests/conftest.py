@@ -0,0 +1,26 @@
+"""
+Fixtures shared by the tests of the linux/ scripts.
+
+The scripts import their siblings as top-level modules, as when they run
+from the linux/ directory, so that directory goes on sys.path first.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import state_store  # noqa: E402
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    """
+    Points the state store at an empty directory for one test.
+    """
+    path = tmp_path / "state"
+    monkeypatch.setattr(state_store, "STATE_DIR", str(path))
+    monkeypatch.setattr(state_store, "_trusted", None)
+    return path
@@ -0,0 +1,148 @@
+import os
+import shutil
+
+import pytest
+
+import CheckUpdateDebian
+import apt_index
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "apt")
+LISTS_DIR = os.path.join(FIXTURES, "lists")
+STATUS = os.path.join(FIXTURES, "status")
+
+
+@pytest.fixture
+def upgrades():
+    return {upgrade["name"]: upgrade for upgrade in apt_index.find_upgrades(LISTS_DIR, STATUS)}
+
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("1.0", "1.0", 0),
+    ("1.0-1", "1.0-2", -1),
+    ("1.0~rc1", "1.0", -1),
+    ("1.0", "1.0+deb12u1", -1),
+    ("1:1.0", "2.0", 1),
+    ("1.10", "1.9", 1),
+    ("1.0a", "1.0+", -1),
+    ("7.88.1-10+deb12u5", "7.88.1-10+deb12u4", 1),
+    ("3.0.11-1~deb12u2", "3.0.11-1", -1),
+    ("1:1.2.13.dfsg-1~rc1", "1:1.2.13.dfsg-1", -1),
+])
+def test_compare_versions(a, b, expected):
+    assert apt_index.compare_versions(a, b) == expected
+    assert apt_index.compare_versions(b, a) == -expected
+
+
+def test_find_upgrades(upgrades):
+    assert sorted(upgrades) == ["curl", "libcurl4", "libssl3", "logwatch", "podman"]
+    assert upgrades["curl"]["candidate"] == "7.88.1-10+deb12u5"
+    assert upgrades["curl"]["sources"] == ["Debian stable"]
+
+
+def test_held_and_older_versions_are_not_upgrades(upgrades):
+    assert "linux-image-amd64" not in upgrades
+    assert "zlib1g" not in upgrades
+
+
+def test_not_automatic_suites(upgrades):
+    # Experimental never upgrades; backports only what it already installed
+    assert "vim" not in upgrades
+    assert "nginx" not in upgrades
+    assert upgrades["podman"]["candidate"] == "4.9.4+ds1-1~bpo12+1"
+    assert upgrades["podman"]["sources"] == ["Debian Backports bookworm-backports"]
+
+
+def test_kept_back_upgrades(upgrades):
+    # systemd needs a new package, libfoo1 breaks the installed foo-tools
+    assert "systemd" not in upgrades
+    assert "libfoo1" not in upgrades
+    # A virtual package provided by an installed one satisfies a dependency
+    assert "logwatch" in upgrades
+
+
+def test_phased_updates(upgrades):
+    assert "bash" not in upgrades
+    # Security updates are never phased
+    assert upgrades["libssl3"]["security"]
+
+
+def test_security_counting(upgrades):
+    assert [name for name, upgrade in upgrades.items() if upgrade["security"]] == ["libssl3"]
+    assert apt_index.count_by_source(upgrades.values()) == {
+        "Debian Backports bookworm-backports": 1,
+        "Debian stable": 3,
+        "Debian stable-security": 1,
+    }
+
+
+def test_read_release_with_slash_in_suite(tmp_path):
+    prefix = "security.debian.org_debian-security_dists_"
+    (tmp_path / (prefix + "buster_Release")).write_text("Origin: Debian\nLabel: Debian\nSuite: oldoldstable\n")
+    (tmp_path / (prefix + "buster_updates_Release")).write_text(
+        "Origin: Debian\nLabel: Debian-Security\nSuite: oldoldstable\nCodename: buster\n"
+    )
+
+    release = apt_index.read_release(str(tmp_path), prefix + "buster_updates_main_binary-amd64_Packages")
+    assert release == ("Debian", "oldoldstable", "Debian-Security", apt_index.PRIORITY_DEFAULT)
+    assert apt_index.is_security(release)
+    release = apt_index.read_release(str(tmp_path), prefix + "buster_main_binary-amd64_Packages")
+    assert not apt_index.is_security(release)
+
+
+@pytest.fixture
+def apt_copy(tmp_path, monkeypatch, state_dir):
+    """
+    Points CheckUpdateDebian at a copy of the fixtures and counts the index scans.
+    """
+    lists_dir = tmp_path / "lists"
+    shutil.copytree(LISTS_DIR, lists_dir)
+    shutil.copy(STATUS, tmp_path / "status")
+    monkeypatch.setattr(CheckUpdateDebian, "APT_LISTS_DIR", str(lists_dir))
+    monkeypatch.setattr(CheckUpdateDebian, "DPKG_STATUS", str(tmp_path / "status"))
+    scans = []
+
+    def find_upgrades(*args):
+        scans.append(args)
+        return apt_index.find_upgrades(*args)
+
+    monkeypatch.setattr(CheckUpdateDebian, "find_upgrades", find_upgrades)
+    return lists_dir, scans
+
+
+def run_check(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        CheckUpdateDebian.main()
+    return exit_info.value.code, capsys.readouterr().out.splitlines()
+
+
+def test_check_update_output(apt_copy, capsys, monkeypatch):
+    monkeypatch.setattr("sys.argv", ["CheckUpdateDebian.py"])
+    code, lines = run_check(capsys)
+
+    assert code == 2
+    assert lines[:2] == ["5", "Security: 1"]
+    assert "libssl3: 3.0.11-1~deb12u1 -> 3.0.11-1~deb12u2" in lines
+
+    monkeypatch.setattr("sys.argv", ["CheckUpdateDebian.py", "security"])
+    code, _ = run_check(capsys)
+    assert code == 1
+
+
+def test_check_update_cache_follows_index_mtime(apt_copy, capsys, monkeypatch):
+    lists_dir, scans = apt_copy
+    monkeypatch.setattr("sys.argv", ["CheckUpdateDebian.py"])
+
+    first = run_check(capsys)
+    assert run_check(capsys) == first
+    assert len(scans) == 1
+
+    # apt update brings a foo-tools that libfoo1 no longer breaks
+    index = lists_dir / "deb.debian.org_debian_dists_bookworm_main_binary-amd64_Packages"
+    index.write_text(index.read_text().replace("Package: foo-tools\nVersion: 1.0-1", "Package: foo-tools\nVersion: 1.1-1"))
+    stat = os.stat(index)
+    os.utime(index, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    code, lines = run_check(capsys)
+    assert len(scans) == 2
+    assert "foo-tools: 1.0-1 -> 1.1-1" in lines
+    assert int(lines[0]) > int(first[1][0])
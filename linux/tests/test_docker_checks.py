@@ -0,0 +1,204 @@
+import socketserver
+import threading
+import time
+
+import pytest
+
+import CheckContainerError
+import CheckContainerRuning
+import DockerEventWatcher
+import docker_client
+from docker_simulator import DockerSimulator, RequestHandler
+from state_store import save_state
+
+
+def inspect_answer(container_id, name, status, exit_code=0, health=None, restarts=0):
+    state = {"Status": status, "ExitCode": exit_code}
+    if health:
+        state["Health"] = {"Status": health}
+    return {"Id": container_id, "Name": "/" + name, "State": state, "RestartCount": restarts}
+
+
+FIXTURE = {
+    "containers": [
+        inspect_answer("web-id", "web", "running", health="healthy"),
+        inspect_answer("db-id", "db", "running", health="unhealthy", restarts=1),
+        inspect_answer("job-id", "job", "exited", exit_code=137, restarts=3),
+        inspect_answer("worker-id", "worker", "restarting", exit_code=1, restarts=12),
+    ],
+}
+
+
+@pytest.fixture
+def docker(tmp_path, monkeypatch, state_dir):
+    """
+    Starts docker_simulator.py on a Unix socket and points DOCKER_HOST at it.
+
+    Returns a function taking the fixture and returning the simulator.
+    """
+    servers = []
+
+    def start(fixture):
+        path = str(tmp_path / "docker.sock")
+        server = socketserver.ThreadingUnixStreamServer(path, RequestHandler)
+        server.daemon_threads = True
+        server.simulator = DockerSimulator(fixture)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setenv("DOCKER_HOST", f"unix://{path}")
+        return server.simulator
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def run_check(module, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        module.main()
+    return exit_info.value.code, capsys.readouterr().out.splitlines()
+
+
+def test_query_containers_inspects_failed_only(docker):
+    simulator = docker(FIXTURE)
+    containers = {c["name"]: c for c in docker_client.query_containers()}
+
+    # One list request, then the exited, restarting and unhealthy containers
+    assert simulator.requests == 4
+    assert containers["web"]["restart_count"] is None
+    assert containers["job"]["restart_count"] == 3
+    assert docker_client.describe(containers["job"]) == "job: exited (code 137), 3 restarts"
+    assert docker_client.describe(containers["db"]) == "db: running, unhealthy, 1 restarts"
+    assert docker_client.describe(containers["worker"]) == "worker: restarting (code 1), 12 restarts"
+
+
+def test_query_containers_inspects_all(docker):
+    simulator = docker(FIXTURE)
+    containers = docker_client.query_containers(inspect="all")
+
+    assert simulator.requests == 5
+    assert [c["restart_count"] for c in containers] == [0, 1, 3, 12]
+
+
+def test_load_containers_reads_fresh_watcher_state(docker):
+    simulator = docker(FIXTURE)
+    watched = {"web-id": docker_client.container_from_inspect(FIXTURE["containers"][0])}
+    save_state("docker-containers", {"time": time.time(), "containers": watched})
+
+    assert [c["name"] for c in docker_client.load_containers()] == ["web"]
+    assert simulator.requests == 0
+
+
+def test_load_containers_queries_when_watcher_state_is_stale(docker):
+    simulator = docker(FIXTURE)
+    watched = {"web-id": docker_client.container_from_inspect(FIXTURE["containers"][0])}
+    stale = time.time() - docker_client.WATCHER_MAX_AGE - 1
+    save_state("docker-containers", {"time": stale, "containers": watched})
+
+    assert len(docker_client.load_containers()) == 4
+    assert simulator.requests > 0
+
+
+def test_container_error_alarms_on_exited_containers(docker, capsys):
+    docker(FIXTURE)
+    code, lines = run_check(CheckContainerError, capsys)
+
+    # Restarting and unhealthy containers are not counted, as with `docker ps -f status=exited`
+    assert code == 1
+    assert lines == ["1", "job: exited (code 137), 3 restarts"]
+
+
+def test_container_error_ok_without_exited_containers(docker, capsys):
+    docker({"containers": FIXTURE["containers"][:2]})
+    code, lines = run_check(CheckContainerError, capsys)
+
+    assert code == 0
+    assert lines == ["0"]
+
+
+def test_container_error_unknown_without_daemon(tmp_path, monkeypatch, state_dir, capsys):
+    monkeypatch.setenv("DOCKER_HOST", f"unix://{tmp_path / 'missing.sock'}")
+    code, _ = run_check(CheckContainerError, capsys)
+
+    assert code == 3
+
+
+def test_container_running_counts(docker, capsys):
+    docker(FIXTURE)
+    code, lines = run_check(CheckContainerRuning, capsys)
+
+    assert code == 0
+    assert lines == ["2", "2 running, 1 exited, 1 restarting, 1 unhealthy"]
+
+
+def test_container_running_alarms_when_none_run(docker, capsys):
+    docker({"containers": FIXTURE["containers"][2:]})
+    code, lines = run_check(CheckContainerRuning, capsys)
+
+    assert code == 1
+    assert lines[0] == "0"
+
+
+def test_apply_event_skips_ignored_actions(docker):
+    simulator = docker(FIXTURE)
+    containers = {}
+
+    assert not DockerEventWatcher.apply_event(containers, {"Action": "exec_start: sh", "id": "web-id"})
+    assert not DockerEventWatcher.apply_event(containers, {"Action": "resize", "id": "web-id"})
+    assert simulator.requests == 0
+
+
+def test_apply_event_drops_removed_container(docker):
+    docker(FIXTURE)
+    containers = {"gone-id": {"id": "gone-id"}}
+
+    assert DockerEventWatcher.apply_event(containers, {"Action": "destroy", "Actor": {"ID": "gone-id"}})
+    assert containers == {}
+
+
+class StopFollowing(Exception):
+    pass
+
+
+def test_follow_applies_events(docker, monkeypatch):
+    died = inspect_answer("web-id", "web", "exited", exit_code=1, restarts=1)
+    docker({
+        "containers": FIXTURE["containers"],
+        "events": [
+            {"delay": 0.1, "id": "web-id", "Action": "die", "container": died},
+            {"delay": 0.1, "id": "job-id", "Action": "destroy", "container": None},
+        ],
+    })
+    containers = {c["id"]: c for c in docker_client.query_containers(inspect="all")}
+    saved = []
+
+    def save(state):
+        saved.append({name: dict(c) for name, c in state.items()})
+        if len(saved) == 2:
+            raise StopFollowing
+
+    monkeypatch.setattr(DockerEventWatcher, "save", save)
+    with pytest.raises(StopFollowing):
+        DockerEventWatcher.follow(containers)
+
+    assert saved[0]["web-id"]["state"] == "exited"
+    assert "job-id" in saved[0]
+    assert "job-id" not in saved[1]
+    assert sorted(containers) == ["db-id", "web-id", "worker-id"]
+
+
+def test_follow_saves_on_quiet_stream(docker, monkeypatch):
+    docker(FIXTURE)
+    saved = []
+
+    def save(state):
+        saved.append(state)
+        raise StopFollowing
+
+    monkeypatch.setattr(DockerEventWatcher, "WATCHER_HEARTBEAT", 0.2)
+    monkeypatch.setattr(DockerEventWatcher, "save", save)
+    with pytest.raises(StopFollowing):
+        DockerEventWatcher.follow({})
+
+    assert saved == [{}]
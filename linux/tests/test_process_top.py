@@ -0,0 +1,131 @@
+import os
+import time
+
+import pytest
+
+import CheckCPU
+import metric_ring
+import proc_reader
+import process_top
+from proc_reader import CLOCK_TICKS, PAGE_SIZE
+from state_store import load_state, save_state
+
+UPTIME = 1000.0  # seconds
+
+# pid -> (name, command line, CPU seconds, start second, RSS MB, PSS MB)
+PROCESSES = {
+    101: ("nginx", "nginx: worker process", 50, 900, 40, 12),
+    202: ("python3", "python3\0app.py", 100, 500, 120, 100),
+    303: ("kworker/0:1)", None, 10, 0, 0, None),  # kernel thread, ")" in its name
+}
+
+
+def write_process(proc, pid, name, command, cpu, start, rss, pss):
+    # Fields after the name: 11 and 12 are utime and stime, 19 starttime, 21 rss pages
+    fields = ["S"] + ["0"] * 22
+    fields[11] = str(cpu * CLOCK_TICKS - 1)
+    fields[12] = "1"
+    fields[19] = str(start * CLOCK_TICKS)
+    fields[21] = str(rss * 1048576 // PAGE_SIZE)
+    directory = proc / str(pid)
+    directory.mkdir()
+    (directory / "stat").write_text(f"{pid} ({name}) " + " ".join(fields) + "\n")
+    (directory / "cmdline").write_text(command + "\0" if command else "")
+    if pss is not None:
+        (directory / "smaps_rollup").write_text(f"Rss: {rss * 1024} kB\nPss: {pss * 1024} kB\n")
+
+
+@pytest.fixture
+def proc(tmp_path, monkeypatch, state_dir):
+    """
+    Builds a fake /proc under tmp_path and points proc_reader at it.
+    """
+    root = tmp_path / "proc"
+    root.mkdir()
+    (root / "uptime").write_text(f"{UPTIME:.2f} 3000.00\n")
+    for pid, process in PROCESSES.items():
+        write_process(root, pid, *process)
+    (root / "404").mkdir()  # exited between the listing and the read of its stat
+    (root / "self").mkdir()
+    monkeypatch.setattr(proc_reader, "PROC_ROOT", str(root))
+    return root
+
+
+def test_read_processes(proc):
+    processes, complete = proc_reader.read_processes()
+
+    assert complete
+    assert sorted(processes) == [101, 202, 303]
+    assert processes[303][0] == "kworker/0:1)"
+    assert processes[101][1:] == (50 * CLOCK_TICKS, 900 * CLOCK_TICKS, 40 * 1048576)
+
+
+def test_top_cpu_over_lifetimes(proc):
+    processes, cpu, interval, complete = process_top.scan()
+
+    assert interval is None
+    assert process_top.top_cpu_lines(processes, cpu, interval) == [
+        "Top CPU (since process start):",
+        "   50.0%      101  nginx: worker process",
+        "   20.0%      202  python3 app.py",
+        "    1.0%      303  [kworker/0:1)]",
+    ]
+
+
+def test_top_cpu_since_previous_scan(proc):
+    # 101 used 3 s of CPU in the last 10 s; pid 202 was reused by another process
+    save_state("process-snapshot", {
+        "time": time.time() - 10,
+        "processes": {"101": [900 * CLOCK_TICKS, 47 * CLOCK_TICKS], "202": [1, 0]},
+    })
+    processes, cpu, interval, complete = process_top.scan()
+
+    lines = process_top.top_cpu_lines(processes, cpu, interval, n=2)
+    assert lines[0] == "Top CPU (last 10s):"
+    assert lines[1:] == ["   30.0%      101  nginx: worker process", "   20.0%      202  python3 app.py"]
+
+
+def test_top_memory(proc):
+    processes, _ = proc_reader.read_processes()
+    # 202 exits before its PSS is read
+    os.remove(proc / "202" / "smaps_rollup")
+
+    assert process_top.top_memory_lines(processes) == [
+        "Top memory (PSS MB, RSS MB):",
+        "         ?    120.0      202  python3 app.py",
+        "      12.0     40.0      101  nginx: worker process",
+        "         ?      0.0      303  [kworker/0:1)]",
+    ]
+
+
+def test_scan_saves_snapshot(proc):
+    process_top.scan()
+    snapshot = load_state("process-snapshot")
+
+    assert snapshot["processes"]["101"] == [900 * CLOCK_TICKS, 50 * CLOCK_TICKS]
+    assert "404" not in snapshot["processes"]
+
+
+def run_cpu_check(monkeypatch, capsys, cpu_percent):
+    usage = {"cpu_percent": cpu_percent, "max_core_percent": cpu_percent, "iowait_percent": 0.0, "steal_percent": 0.0}
+    monkeypatch.setattr(CheckCPU, "query", lambda: {"cpu": usage})
+    monkeypatch.setattr(metric_ring, "open_ring", lambda: None)
+    monkeypatch.setattr("sys.argv", ["CheckCPU.py"])
+    with pytest.raises(SystemExit) as exit_info:
+        CheckCPU.main()
+    return exit_info.value.code, capsys.readouterr().out.splitlines()
+
+
+def test_cpu_check_does_not_scan_when_ok(proc, monkeypatch, capsys):
+    code, lines = run_cpu_check(monkeypatch, capsys, 30.0)
+
+    assert code == 0
+    assert len(lines) == 4
+    assert load_state("process-snapshot") is None
+
+
+def test_cpu_alarm_reports_top_processes(proc, monkeypatch, capsys):
+    code, lines = run_cpu_check(monkeypatch, capsys, 95.0)
+
+    assert code == 1
+    assert lines[4:6] == ["Top CPU (since process start):", "   50.0%      101  nginx: worker process"]
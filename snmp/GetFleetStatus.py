@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Polls a fleet of SNMP devices concurrently with the existing checks.
+
+Every check is a coroutine (poll_printer_status...), and all devices are
+polled from one event loop: snmp_client sends their requests through one
+engine and socket, at most MAX_OUTSTANDING requests at a time, and each
+check's output goes to its own buffer through its `out` argument. A run
+therefore takes about as long as the slowest device, until it becomes
+bound by CPU: encoding and decoding the PDUs of one device's check costs
+about 0.1 s with pysnmp, on one core, so a few hundred devices take tens of
+seconds whatever their latency. MAX_IN_FLIGHT bounds the devices polled at
+the same time, PER_DEVICE_IN_FLIGHT the checks against one IP.
+"""
+
+import asyncio
+import functools
+import io
+import json
+import sys
+import time
+
+import snmp_client
+from GetNetworkEquipmentStatus import poll_device_status
+from GetPrinterStatus import poll_printer_status
+from GetSynoStatus import poll_nas_status
+from GetWifiStatus import poll_wifi_ap_status
+
+# Device types accepted in the inventory file, mapped to the existing checks
+CHECKS = {
+    "printer": poll_printer_status,
+    "switch": poll_device_status,
+    "wifi": poll_wifi_ap_status,
+    "nas": poll_nas_status,
+}
+
+DEFAULT_PER_DEVICE = 1  # checks running at the same time against one IP
+
+
+def load_inventory(path):
+    """
+    Reads an inventory file: one `<type> <ip> [community]` entry per line.
+    """
+    devices = []
+    with open(path) as handle:
+        for line_number, line in enumerate(handle, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            fields = line.split()
+            if len(fields) not in (2, 3) or fields[0] not in CHECKS:
+                raise ValueError(f"{path}:{line_number}: expected '<{'|'.join(CHECKS)}> <IP> [COMMUNITY]'")
+            devices.append(
+                {
+                    "type": fields[0],
+                    "ip": fields[1],
+                    "community": fields[2] if len(fields) == 3 else "public",
+                }
+            )
+    return devices
+
+
+async def run_check(device):
+    """
+    Runs one check and captures its output and severity.
+    """
+    output = io.StringIO()
+    start_time = time.monotonic()
+    try:
+        severity = await CHECKS[device["type"]](device["ip"], device["community"], out=functools.partial(print, file=output))
+    except Exception as e:
+        # Same exit code as the standalone script dying on an uncaught exception
+        output.write(f"Error: {e}\n")
+        severity = 1
+    return {
+        "type": device["type"],
+        "ip": device["ip"],
+        "severity": severity,
+        "elapsed": round(time.monotonic() - start_time, 3),
+        "output": output.getvalue(),
+    }
+
+
+async def poll_fleet(devices, max_in_flight=None, per_device=DEFAULT_PER_DEVICE):
+    """
+    Polls every device concurrently and yields one result record per device as it completes.
+
+    Without `max_in_flight`, every device is polled at once; the number of
+    requests in flight is still bounded by snmp_client.MAX_OUTSTANDING.
+    """
+    in_flight = asyncio.Semaphore(max_in_flight or max(1, len(devices)))
+    device_limits = {device["ip"]: asyncio.Semaphore(per_device) for device in devices}
+
+    async def poll(device):
+        async with device_limits[device["ip"]]:
+            async with in_flight:
+                return await run_check(device)
+
+    try:
+        for result in asyncio.as_completed([poll(device) for device in devices]):
+            yield await result
+    finally:
+        snmp_client.close_engine()
+
+
+async def main(inventory, max_in_flight, per_device):
+    worst = 0
+    async for record in poll_fleet(load_inventory(inventory), max_in_flight, per_device):
+        print(json.dumps(record), flush=True)
+        worst = max(worst, record["severity"])
+    return worst
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or len(sys.argv) > 4:
+        print("Usage: python3 GetFleetStatus.py <INVENTORY_FILE> [MAX_IN_FLIGHT] [PER_DEVICE_IN_FLIGHT]")
+        print("Inventory lines: <printer|switch|wifi|nas> <IP> [COMMUNITY]")
+        sys.exit(1)
+
+    inventory_file = sys.argv[1]
+    max_in_flight = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    per_device = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_PER_DEVICE
+
+    try:
+        worst = asyncio.run(main(inventory_file, max_in_flight, per_device))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    # Each record carries its own severity; the run itself only signals "something is not OK"
+    sys.exit(1 if worst else 0)
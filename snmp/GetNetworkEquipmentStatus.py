@@ -2,149 +2,86 @@
 
 import sys
 
-from pysnmp.hlapi import (
-    CommunityData,
-    ContextData,
-    ObjectIdentity,
-    ObjectType,
-    SnmpEngine,
-    UdpTransportTarget,
-    getCmd,
-    nextCmd,
-)
-
-
-def get_snmp_data(ip, community, oid):
-    """
-    Retrieves an SNMP value for a given OID.
-    """
-    iterator = getCmd(
-        SnmpEngine(),
-        CommunityData(community, mpModel=0),  # SNMP v1
-        UdpTransportTarget((ip, 161), timeout=2, retries=2),
-        ContextData(),
-        ObjectType(ObjectIdentity(oid)),
-    )
+from counter_rates import format_rate, update_rates, utilisation
+from device_profiles import collect, load_plan, report_scalars, scalar_value
+from discovery_cache import get_cached_table
+from snmp_client import SnmpClient, run
 
-    errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
 
-    if errorIndication:
-        # print(f"SNMP Error: {errorIndication}")
-        return None
-    elif errorStatus:
-        # print(f"SNMP Error: {errorStatus.prettyPrint()}")
-        return None
-    else:
-        for varBind in varBinds:
-            return varBind[1]
-    return None
+async def poll_device_status(ip, community, out=print):
+    severity_level = 0  # 0: OK, 1: Warning, 2: Critical
 
+    # Scalars are described in profiles/switch.json (TP-Link OIDs in tplink-switch.json)
+    plan = load_plan("switch")
 
-def check_device_status(ip, community):
-    severity_level = 0  # 0: OK, 1: Warning, 2: Critical
+    out(f"Device Status ({ip}):")
+    out("---------------------------------")
 
-    # OIDs for device information
-    oids = {
-        "Device Name": ("1.3.6.1.2.1.1.5.0", str),  # sysName
-        "Description": ("1.3.6.1.2.1.1.1.0", str),  # sysDescr
-        "Uptime": ("1.3.6.1.2.1.1.3.0", int),  # sysUpTime
-        "Contact": ("1.3.6.1.2.1.1.4.0", str),  # sysContact
-        "Location": ("1.3.6.1.2.1.1.6.0", str),  # sysLocation
-        "Services": ("1.3.6.1.2.1.1.7.0", int),  # sysServices
-        "MAC Address": ("1.3.6.1.4.1.11863.6.1.1.7.0", str),  # tpSysInfoMacAddr
-        "Serial Number": ("1.3.6.1.4.1.11863.6.1.1.8.0", str),  # tpSysInfoSerialNum
-        "Hardware Version": (
-            "1.3.6.1.4.1.11863.6.1.1.5.0",
-            str,
-        ),  # tpSysInfoHardwareVersion
-        "Firmware Version": (
-            "1.3.6.1.4.1.11863.6.1.1.6.0",
-            str,
-        ),  # tpSysInfoFirmwareVersion
-    }
-    print(f"Device Status ({ip}):")
-    print("---------------------------------")
-
-    # Retrieve and display basic information
-    for name, (oid, data_type) in oids.items():
-        value = get_snmp_data(ip, community, oid)
-        if value is None:
-            severity_level = max(severity_level, 1)
-            print(f"{name}: Data not available")
-            continue
+    # Retrieve and display basic information in one batched GET
+    client = SnmpClient(ip, community, timeout=2, retries=2)
+    values, errors, _ = await collect(plan, client)
+    severity_level = max(severity_level, report_scalars(plan, values, errors, out=out))
 
-        if data_type == int:
-            try:
-                value = int(value)
-                if name == "Uptime":
-                    days = value // (100 * 60 * 60 * 24)
-                    hours = (value // (100 * 60 * 60)) % 24
-                    minutes = (value // (100 * 60)) % 60
-                    seconds = (value // 100) % 60
-                    value = f"{days}d {hours}h {minutes}m {seconds}s"
-            except (ValueError, TypeError):
-                print(
-                    f"Warning: Unable to convert {name} to integer. Received: {value.prettyPrint()}"
-                )
-                severity_level = max(severity_level, 1)
-                continue
-        else:
-            value = str(value).strip()
-
-        print(f"{name}: {value}")
+    uptime = scalar_value(plan, values, "Uptime")
+    uptime_ticks = int(uptime) if uptime is not None else None
 
     # Retrieve interface statuses
     interfaces = {}
 
     # OIDs for interfaces
-    if_index_oid = "1.3.6.1.2.1.2.2.1.1"  # ifIndex
     if_descr_oid = "1.3.6.1.2.1.2.2.1.2"  # ifDescr
+    if_speed_oid = "1.3.6.1.2.1.2.2.1.5"  # ifSpeed
     if_admin_status_oid = "1.3.6.1.2.1.2.2.1.7"  # ifAdminStatus
     if_oper_status_oid = "1.3.6.1.2.1.2.2.1.8"  # ifOperStatus
-
-    # Retrieve the list of interface indices
-    indices = []
-    iterator = nextCmd(
-        SnmpEngine(),
-        CommunityData(community, mpModel=0),
-        UdpTransportTarget((ip, 161), timeout=2, retries=2),
-        ContextData(),
-        ObjectType(ObjectIdentity(if_index_oid)),
-        lexicographicMode=False,
+    if_in_octets_oid = "1.3.6.1.2.1.2.2.1.10"  # ifInOctets
+    if_out_octets_oid = "1.3.6.1.2.1.2.2.1.16"  # ifOutOctets
+    if_hc_in_octets_oid = "1.3.6.1.2.1.31.1.1.1.6"  # ifHCInOctets
+    if_hc_out_octets_oid = "1.3.6.1.2.1.31.1.1.1.10"  # ifHCOutOctets
+    if_high_speed_oid = "1.3.6.1.2.1.31.1.1.1.15"  # ifHighSpeed
+
+    # Collect every interface column in one GETBULK pass (GETNEXT on v1-only devices),
+    # or only the known ports with batched GETs once the interfaces have been discovered
+    client = SnmpClient(ip, community, mp_model=1, timeout=2, retries=2)
+    if_table = await get_cached_table(
+        client,
+        "switch-interfaces",
+        [
+            if_descr_oid,
+            if_speed_oid,
+            if_admin_status_oid,
+            if_oper_status_oid,
+            if_in_octets_oid,
+            if_out_octets_oid,
+            if_hc_in_octets_oid,
+            if_hc_out_octets_oid,
+            if_high_speed_oid,
+        ],
+        uptime_ticks,
+        static=[if_descr_oid],
     )
 
-    for errorIndication, errorStatus, errorIndex, varBinds in iterator:
-        if errorIndication or errorStatus:
-            break
-        else:
-            for varBind in varBinds:
-                oid, value = varBind
-                index = int(value)
-                indices.append(index)
-
-    # For each interface, retrieve information
-    for index in indices:
-        descr = get_snmp_data(ip, community, f"{if_descr_oid}.{index}")
-        admin_status = get_snmp_data(ip, community, f"{if_admin_status_oid}.{index}")
-        oper_status = get_snmp_data(ip, community, f"{if_oper_status_oid}.{index}")
-
-        # Add OIDs for traffic and IP addresses
-        if_in_octets_oid = "1.3.6.1.2.1.2.2.1.10"  # ifInOctets
-        if_out_octets_oid = "1.3.6.1.2.1.2.2.1.16"  # ifOutOctets
-        if_ip_addr_oid = "1.3.6.1.2.1.4.20.1.1"  # ipAdEntAddr
-
-        in_octets = get_snmp_data(ip, community, f"{if_in_octets_oid}.{index}")
-        out_octets = get_snmp_data(ip, community, f"{if_out_octets_oid}.{index}")
-        ip_addr = get_snmp_data(ip, community, f"{if_ip_addr_oid}.{index}")
+    counters = {}
+    for idx, row in if_table.items():
+        index = int(idx)
+        descr = row.get(if_descr_oid)
+        admin_status = row.get(if_admin_status_oid)
+        oper_status = row.get(if_oper_status_oid)
 
         if descr is None or admin_status is None or oper_status is None:
             continue
 
+        # Prefer the 64-bit counters (ifXTable, SNMPv2c only) that do not wrap
+        if if_hc_in_octets_oid in row and if_hc_out_octets_oid in row:
+            counters[index] = [int(row[if_hc_in_octets_oid]), int(row[if_hc_out_octets_oid]), 64]
+        elif if_in_octets_oid in row and if_out_octets_oid in row:
+            counters[index] = [int(row[if_in_octets_oid]), int(row[if_out_octets_oid]), 32]
+
+        # ifHighSpeed is in Mbit/s; ifSpeed (bit/s) saturates at 4.2 Gbit/s
+        speed_mbps = int(row.get(if_high_speed_oid, 0)) or int(row.get(if_speed_oid, 0)) / 1_000_000
+
         descr = str(descr)
         admin_status = int(admin_status)
         oper_status = int(oper_status)
-        in_octets = int(in_octets) if in_octets is not None else 0
-        out_octets = int(out_octets) if out_octets is not None else 0
 
         # Keep only ports that are Up
         if oper_status == 1:
@@ -152,12 +89,14 @@ def check_device_status(ip, community):
                 "description": descr,
                 "admin_status": admin_status,
                 "oper_status": oper_status,
-                "in_octets": in_octets,
-                "out_octets": out_octets,
+                "speed_mbps": speed_mbps,
             }
 
+    # Rates since the previous run of this check against the same device
+    rates = update_rates(ip, uptime_ticks, counters)
+
     # ASCII representation of ports (front view)
-    print("\nASCII representation of ports (X = Up):")
+    out("\nASCII representation of ports (X = Up):")
 
     # Determine the total number of switch ports
     max_port = max(
@@ -177,7 +116,7 @@ def check_device_status(ip, community):
     if max_port > 10:
         # Display on two lines
         for row in range(2):
-            print(generate_separator(max_port // 2 + max_port % 2))
+            out(generate_separator(max_port // 2 + max_port % 2))
             port_labels = "|"
             port_status = "|"
             for i in range(max_port // 2 + max_port % 2):
@@ -194,13 +133,13 @@ def check_device_status(ip, community):
                 else:
                     port_labels += "   |"
                     port_status += "   |"
-            print(port_labels)
-            print(generate_separator(max_port // 2 + max_port % 2))
-            print(port_status)
-        print(generate_separator(max_port // 2 + max_port % 2))
+            out(port_labels)
+            out(generate_separator(max_port // 2 + max_port % 2))
+            out(port_status)
+        out(generate_separator(max_port // 2 + max_port % 2))
     else:
         # Display on one line
-        print(generate_separator(max_port))
+        out(generate_separator(max_port))
         port_labels = "|"
         port_status = "|"
         for i in range(max_port):
@@ -213,43 +152,48 @@ def check_device_status(ip, community):
                 port_status += " X |"
             else:
                 port_status += "   |"
-        print(port_labels)
-        print(generate_separator(max_port))
-        print(port_status)
-        print(generate_separator(max_port))
+        out(port_labels)
+        out(generate_separator(max_port))
+        out(port_status)
+        out(generate_separator(max_port))
 
-    # Display Up interfaces with their information
+    # Display Up interfaces with their traffic rates
     if interfaces:
-        print("\nUp interfaces with their traffic information:")
-        print("+---------+----------------------+----------------------+")
-        print("| Port    | Incoming Traffic     | Outgoing Traffic     |")
-        print("+---------+----------------------+----------------------+")
+        out("\nUp interfaces with their traffic rates:")
+        out("+---------+----------------------+----------------------+-------------+")
+        out("| Port    | Incoming Traffic     | Outgoing Traffic     | Utilisation |")
+        out("+---------+----------------------+----------------------+-------------+")
         for idx in sorted(interfaces):
             data = interfaces[idx]
             descr = data["description"]
             port_num = int(descr.split("/")[-1]) if "gigabitEthernet" in descr else idx
-            in_octets = data["in_octets"]
-            out_octets = data["out_octets"]
-
-            def format_octets(octets):
-                for unit in ["", "K", "M", "G", "T"]:
-                    if octets < 1024.0:
-                        return f"{octets:.2f} {unit}B"
-                    octets /= 1024.0
-                return f"{octets:.2f} PB"
 
-            in_octets_readable = format_octets(in_octets)
-            out_octets_readable = format_octets(out_octets)
+            if str(idx) in rates:
+                in_bps, out_bps = rates[str(idx)]
+                in_rate = format_rate(in_bps)
+                out_rate = format_rate(out_bps)
+                usage = utilisation(max(in_bps, out_bps), data["speed_mbps"])
+                usage_readable = f"{usage:.1f}%" if usage is not None else "n/a"
+                if usage is not None and usage >= 90:
+                    severity_level = max(severity_level, 1)
+            else:
+                in_rate = out_rate = usage_readable = "n/a"
 
-            print(
-                f"| {port_num:<7} | {in_octets_readable:<20} | {out_octets_readable:<20} |"
+            out(
+                f"| {port_num:<7} | {in_rate:<20} | {out_rate:<20} | {usage_readable:<11} |"
             )
-        print("+---------+----------------------+----------------------+")
+        out("+---------+----------------------+----------------------+-------------+")
+        if not rates:
+            out("Traffic rates will be available from the next run.")
     else:
-        print("No ports detected in 'Up' state.")
+        out("No ports detected in 'Up' state.")
         severity_level = max(severity_level, 1)
 
-    sys.exit(severity_level)
+    return severity_level
+
+
+def check_device_status(ip, community):
+    sys.exit(run(poll_device_status(ip, community)))
 
 
 if __name__ == "__main__":
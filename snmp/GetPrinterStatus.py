@@ -1,177 +1,51 @@
 #!/usr/bin/python3
 
 import sys
-from pysnmp.hlapi import *
-from pyasn1.type.univ import Integer, OctetString
-
-def get_snmp_data(ip, community, oid):
-    """
-    Retrieves an SNMP value for a given OID.
-    """
-    iterator = getCmd(
-        SnmpEngine(),
-        CommunityData(community, mpModel=0),
-        UdpTransportTarget((ip, 161), timeout=2, retries=1),
-        ContextData(),
-        ObjectType(ObjectIdentity(oid))
-    )
-
-    errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
-
-    if errorIndication:
-        print(f"SNMP Error: {errorIndication}")
-        return None
-    elif errorStatus:
-        print(f"SNMP Error: {errorStatus.prettyPrint()}")
-        return None
-    else:
-        for varBind in varBinds:
-            return varBind[1]
-    return None
 
-def check_printer_status(ip, community):
+from device_profiles import collect, load_plan, report_scalars
+from discovery_cache import load_discovery, save_discovery
+from snmp_client import SnmpClient, run
+
+async def poll_printer_status(ip, community, out=print):
     severity_level = 0  # 0: OK, 1: Critical, 2: Information, 3: Warning
 
-    # OIDs for printer information
-    oids = {
-        'Manufacturer': ('1.3.6.1.2.1.1.1.0', str),
-        'Model': ('1.3.6.1.2.1.25.3.2.1.3.1', str),
-        'Serial Number': ('1.3.6.1.2.1.43.5.1.1.17.1', str),
-        'Printer Status': ('1.3.6.1.2.1.25.3.5.1.1.1', int),
-        'Pages Printed': ('1.3.6.1.2.1.43.10.2.1.4.1.1', int),
-        'Printer Name': ('1.3.6.1.2.1.1.5.0', str),
-        'Location': ('1.3.6.1.2.1.1.6.0', str),
-        'Contact': ('1.3.6.1.2.1.1.4.0', str),
-        'MAC Address': ('1.3.6.1.2.1.2.2.1.6.1', str),
-    }
+    # Scalars, supply, alert and device tables are described in profiles/printer.json
+    plan = load_plan('printer')
 
-    # Possible printer statuses
-    printer_statuses = {
-        1: 'Other',
-        2: 'Unknown',
-        3: 'Idle',
-        4: 'Printing',
-        5: 'Warmup'
-    }
+    out(f"Printer Status ({ip}):")
+    out("---------------------------------")
 
-    print(f"Printer Status ({ip}):")
-    print("---------------------------------")
-
-    # Retrieving and displaying basic information
-    for name, (oid, data_type) in oids.items():
-        value = get_snmp_data(ip, community, oid)
-        if value is None or value == '':
-            severity_level = max(severity_level, 1)  # Critical if no data
-            print(f"{name}: Data not available")
-            continue
-
-        if data_type == int:
-            try:
-                value = int(value)
-            except (ValueError, TypeError):
-                print(f"Warning: Unable to convert {name} to integer. Received: {value.prettyPrint()}")
-                severity_level = max(severity_level, 1)
-                continue
-        else:
-            value = str(value).strip()
-
-        if name == 'Printer Status':
-            status = printer_statuses.get(value, 'Unknown')
-            print(f"{name}: {status}")
-            if status in ['Other', 'Unknown']:
-                severity_level = max(severity_level, 3)  # Warning
-            elif status == 'Printing':
-                pass  # All good
-            elif status == 'Idle':
-                pass  # All good
-            else:
-                severity_level = max(severity_level, 2)  # Information
-        elif name == 'MAC Address':
-            try:
-                mac = ':'.join([f'{ord(x):02x}' for x in value])
-                print(f"{name}: {mac}")
-            except TypeError:
-                print(f"{name}: Invalid format")
-                severity_level = max(severity_level, 1)
-        else:
-            print(f"{name}: {value}")
-
-    # Retrieving supply statuses
-    # OIDs for supplies
-    supplies_description_oid = '1.3.6.1.2.1.43.11.1.1.6'  # prtMarkerSuppliesDescription
-    supplies_level_oid = '1.3.6.1.2.1.43.11.1.1.9'       # prtMarkerSuppliesLevel
-    supplies_max_capacity_oid = '1.3.6.1.2.1.43.11.1.1.8' # prtMarkerSuppliesMaxCapacity
+    # Scalars in one batched GET; tables walked together in a single GETBULK
+    # stream, or with GETNEXT on printers known to ignore SNMPv2c
+    table_version = load_discovery(ip, 'printer-snmp-version', None)
+    client = SnmpClient(ip, community, timeout=2, retries=1)
+    table_client = SnmpClient(ip, community, mp_model=1 if table_version is None else table_version, timeout=2, retries=1)
+    values, errors, results = await collect(plan, client, table_client)
 
-    supplies = {}
+    # A walk that timed out returned no rows at all: that is not "no supplies"
+    tables_failed = table_client.error is not None and not any(results.values())
+    if table_client.mp_model == 0 and table_version is None and not tables_failed:
+        # The walk fell back to SNMPv1: skip the GETBULK timeout on the next runs
+        save_discovery(ip, 'printer-snmp-version', None, 0)
 
-    # Retrieving supply descriptions
-    iterator = nextCmd(
-        SnmpEngine(),
-        CommunityData(community, mpModel=0),
-        UdpTransportTarget((ip, 161), timeout=2, retries=1),
-        ContextData(),
-        ObjectType(ObjectIdentity(supplies_description_oid)),
-        lexicographicMode=False
-    )
-
-    for errorIndication, errorStatus, errorIndex, varBinds in iterator:
-        if errorIndication or errorStatus:
-            break
-        else:
-            for varBind in varBinds:
-                oid, value = varBind
-                index = oid.prettyPrint().split('.')[-1]
-                supplies.setdefault(index, {})['description'] = str(value).strip()
-
-    # Retrieving supply levels
-    iterator = nextCmd(
-        SnmpEngine(),
-        CommunityData(community, mpModel=0),
-        UdpTransportTarget((ip, 161), timeout=2, retries=1),
-        ContextData(),
-        ObjectType(ObjectIdentity(supplies_level_oid)),
-        lexicographicMode=False
-    )
-
-    for errorIndication, errorStatus, errorIndex, varBinds in iterator:
-        if errorIndication or errorStatus:
-            break
-        else:
-            for varBind in varBinds:
-                oid, value = varBind
-                index = oid.prettyPrint().split('.')[-1]
-                try:
-                    level = int(value)
-                except (ValueError, TypeError):
-                    level = None
-                supplies.setdefault(index, {})['level'] = level
-
-    # Retrieving supply maximum capacities
-    iterator = nextCmd(
-        SnmpEngine(),
-        CommunityData(community, mpModel=0),
-        UdpTransportTarget((ip, 161), timeout=2, retries=1),
-        ContextData(),
-        ObjectType(ObjectIdentity(supplies_max_capacity_oid)),
-        lexicographicMode=False
-    )
-
-    for errorIndication, errorStatus, errorIndex, varBinds in iterator:
-        if errorIndication or errorStatus:
-            break
-        else:
-            for varBind in varBinds:
-                oid, value = varBind
-                index = oid.prettyPrint().split('.')[-1]
+    # Displaying basic information
+    severity_level = max(severity_level, report_scalars(plan, values, errors, out=out))
+
+    supplies = {}
+    for index, row in results['supplies'].items():
+        data = supplies.setdefault(index, {})
+        if 'description' in row:
+            data['description'] = str(row['description']).strip()
+        for name in ('level', 'max_capacity'):
+            if name in row:
                 try:
-                    max_capacity = int(value)
+                    data[name] = int(row[name])
                 except (ValueError, TypeError):
-                    max_capacity = None
-                supplies.setdefault(index, {})['max_capacity'] = max_capacity
+                    data[name] = None
 
     # Displaying supply statuses
     if supplies:
-        print("\nSupply Statuses:")
+        out("\nSupply Statuses:")
         for index in supplies:
             data = supplies[index]
             description = data.get('description', 'Unknown')
@@ -191,14 +65,59 @@ def check_printer_status(ip, community):
             else:
                 percentage = (level / max_capacity) * 100
                 status = f"{percentage:.1f}%"
-            print(f"{description}: {status}")
+            out(f"{description}: {status}")
+    elif tables_failed:
+        out(f"Supplies not available: {table_client.error}")
+        severity_level = max(severity_level, 3)  # Warning
     else:
-        print("No supplies detected.")
+        out("No supplies detected.")
 
-    print("---------------------------------")
+    # Displaying active alerts
+    alert_severities = {
+        1: 'Other',
+        3: 'Critical',
+        4: 'Warning',
+        5: 'Warning'  # warningBinaryChangeEvent
+    }
+
+    if results['alerts']:
+        out("\nActive Alerts:")
+        for index, row in results['alerts'].items():
+            severity = alert_severities.get(int(row.get('severity', 1)), 'Other')
+            description = str(row.get('description', '')).strip() or f"Alert code {row.get('code', 'unknown')}"
+            out(f"{description}: {severity}")
+            if severity == 'Critical':
+                severity_level = max(severity_level, 1)  # Critical
+            elif severity == 'Warning':
+                severity_level = max(severity_level, 3)  # Warning
+
+    # Displaying device statuses
+    device_statuses = {
+        1: 'Unknown',
+        2: 'Running',
+        3: 'Warning',
+        4: 'Testing',
+        5: 'Down'
+    }
 
+    if results['devices']:
+        out("\nDevices:")
+        for index, row in results['devices'].items():
+            description = str(row.get('description', 'Unknown')).strip()
+            status = device_statuses.get(int(row.get('status', 1)), 'Unknown')
+            out(f"{description}: {status}")
+            if status == 'Down':
+                severity_level = max(severity_level, 1)  # Critical
+            elif status == 'Warning':
+                severity_level = max(severity_level, 3)  # Warning
+
+    out("---------------------------------")
+
+    return severity_level
+
+def check_printer_status(ip, community):
     # Return the appropriate exit code
-    sys.exit(severity_level)
+    sys.exit(run(poll_printer_status(ip, community)))
 
 if __name__ == "__main__":
     if len(sys.argv) < 2 or len(sys.argv) > 3:
@@ -1,152 +1,65 @@
 #!/usr/bin/python3
 
 import sys
-from pysnmp.hlapi import *
 
-def get_human_readable_status(value):
-    statuses = {1: "Normal", 2: "Failed"}
-    return statuses.get(int(value), "Unknown")
+from device_profiles import collect, load_plan, report_scalars, scalar_value
+from discovery_cache import forget_discovery, load_discovery, save_discovery
+from snmp_client import SnmpClient, run
 
-def get_human_readable_temperature(value):
-    return f"{value} °C"
+async def get_storage_indexes(nas_ip, community_string, uptime=None, out=print):
+    """
+    Returns ([(index, hrStorageDescr)], from_cache), walking hrStorageDescr
+    only when the discovery cache is not valid.
+    """
+    cached = load_discovery(nas_ip, 'storage', uptime)
+    if cached is not None:
+        return [tuple(entry) for entry in cached], True
 
-def get_human_readable_power_status(value):
-    statuses = {1: "Normal", 2: "Failed"}
-    return statuses.get(int(value), "Unknown")
-
-def get_human_readable_fan_status(value):
-    statuses = {1: "Normal", 2: "Failed"}
-    return statuses.get(int(value), "Unknown")
-
-def get_human_readable_disk_status(value):
-    statuses = {
-        1: "Normal",
-        2: "Initialized",
-        3: "Not Initialized",
-        4: "System Partition Failed",
-        5: "Crashed"
-    }
-    return statuses.get(int(value), "Unknown")
-
-def get_human_readable_raid_status(value):
-    statuses = {
-        1: "Normal",
-        2: "Repairing",
-        3: "Migrating",
-        4: "Expanding",
-        5: "Deleting",
-        6: "Creating",
-        7: "Raid Syncing",
-        8: "Raid Parity Checking",
-        9: "Raid Assembling",
-        10: "Canceling",
-        11: "Degrade",
-        12: "Crashed",
-        13: "Data Scrubbing",
-        14: "Raid Deploying",
-        15: "Raid UnDeploying",
-        16: "Raid Mount Cache",
-        17: "Raid Unmount Cache",
-        18: "Raid Expanding Unfinished SHR",
-        19: "Raid Convert SHR To Pool",
-        20: "Raid Migrate SHR1 To SHR2",
-        21: "Raid Unknown Status"
-    }
-    return statuses.get(int(value), "Unknown")
-
-def get_human_readable_memory(value):
-    try:
-        return f"{float(value) / (1024):.2f} MB"
-    except (ValueError, TypeError):
-        return "Invalid value"
-
-def get_storage_indexes(nas_ip, community_string):
     storage_indexes = []
-    iterator = nextCmd(
-        SnmpEngine(),
-        CommunityData(community_string, mpModel=0),
-        UdpTransportTarget((nas_ip, 161)),
-        ContextData(),
-        ObjectType(ObjectIdentity('1.3.6.1.2.1.25.2.3.1.3')),  # hrStorageDescr
-        lexicographicMode=False
-    )
-
-    for errorIndication, errorStatus, errorIndex, varBinds in iterator:
-        if errorIndication:
-            print(f"SNMP Error: {errorIndication}")
-            break
-        elif errorStatus:
-            print(f"SNMP Error: {errorStatus}")
-            break
-        else:
-            for varBind in varBinds:
-                oid, value = varBind
-                oid_str = str(oid)
-                # Extract the index at the end of the OID
-                index = oid_str.split('.')[-1]
-                descr = str(value)
-                storage_indexes.append((index, descr))
-    return storage_indexes
-
-def get_volume_info(nas_ip, community_string, storage_index, volume_name):
+    client = SnmpClient(nas_ip, community_string)
+    async for oid, value in client.walk('1.3.6.1.2.1.25.2.3.1.3'):  # hrStorageDescr
+        oid_str = str(oid)
+        # Extract the index at the end of the OID
+        index = oid_str.split('.')[-1]
+        descr = str(value)
+        storage_indexes.append((index, descr))
+    if client.error:
+        out(f"SNMP Error: {client.error}")
+    elif storage_indexes:
+        save_discovery(nas_ip, 'storage', uptime, storage_indexes)
+    return storage_indexes, False
+
+def get_volume_oids(storage_index):
     # OIDs for the volume
     base_oid = f'1.3.6.1.2.1.25.2.3.1'
-    descr_oid = f'{base_oid}.3.{storage_index}'
-    allocation_units_oid = f'{base_oid}.4.{storage_index}'
-    size_oid = f'{base_oid}.5.{storage_index}'
-    used_oid = f'{base_oid}.6.{storage_index}'
-
-    # Get volume description
-    errorIndication, errorStatus, errorIndex, varBinds = next(
-        getCmd(SnmpEngine(), CommunityData(community_string, mpModel=0),
-               UdpTransportTarget((nas_ip, 161)), ContextData(),
-               ObjectType(ObjectIdentity(descr_oid)))
-    )
-
-    if errorIndication or errorStatus:
-        print(f"Error retrieving hrStorageDescr: {errorIndication or errorStatus}")
-        return
-
-    hrStorageDescr = str(varBinds[0][1])
-
-    # Get allocation unit
-    errorIndication, errorStatus, errorIndex, varBinds = next(
-        getCmd(SnmpEngine(), CommunityData(community_string, mpModel=0),
-               UdpTransportTarget((nas_ip, 161)), ContextData(),
-               ObjectType(ObjectIdentity(allocation_units_oid)))
-    )
-
-    if errorIndication or errorStatus:
-        print(f"Error retrieving hrStorageAllocationUnits: {errorIndication or errorStatus}")
-        return
-
-    hrStorageAllocationUnits = int(varBinds[0][1])
-
-    # Get total size
-    errorIndication, errorStatus, errorIndex, varBinds = next(
-        getCmd(SnmpEngine(), CommunityData(community_string, mpModel=0),
-               UdpTransportTarget((nas_ip, 161)), ContextData(),
-               ObjectType(ObjectIdentity(size_oid)))
-    )
-
-    if errorIndication or errorStatus:
-        print(f"Error retrieving hrStorageSize: {errorIndication or errorStatus}")
-        return
-
-    hrStorageSize = int(varBinds[0][1])
-
-    # Get used space
-    errorIndication, errorStatus, errorIndex, varBinds = next(
-        getCmd(SnmpEngine(), CommunityData(community_string, mpModel=0),
-               UdpTransportTarget((nas_ip, 161)), ContextData(),
-               ObjectType(ObjectIdentity(used_oid)))
-    )
-
-    if errorIndication or errorStatus:
-        print(f"Error retrieving hrStorageUsed: {errorIndication or errorStatus}")
-        return
+    return {
+        'hrStorageDescr': f'{base_oid}.3.{storage_index}',
+        'hrStorageAllocationUnits': f'{base_oid}.4.{storage_index}',
+        'hrStorageSize': f'{base_oid}.5.{storage_index}',
+        'hrStorageUsed': f'{base_oid}.6.{storage_index}',
+    }
 
-    hrStorageUsed = int(varBinds[0][1])
+async def get_volumes_values(nas_ip, community_string, storage_indexes):
+    """
+    Fetches the hrStorage columns of every volume with one batched GET.
+    """
+    client = SnmpClient(nas_ip, community_string)
+    oids = [oid for index in storage_indexes for oid in get_volume_oids(index).values()]
+    values = await client.get_many(oids)
+    return values, client.errors
+
+def get_volume_info(storage_index, volume_name, values, errors, out=print):
+    fields = {}
+    for field, oid in get_volume_oids(storage_index).items():
+        if values.get(oid) is None:
+            out(f"Error retrieving {field}: {errors.get(oid)}")
+            return
+        fields[field] = values[oid]
+
+    hrStorageDescr = str(fields['hrStorageDescr'])
+    hrStorageAllocationUnits = int(fields['hrStorageAllocationUnits'])
+    hrStorageSize = int(fields['hrStorageSize'])
+    hrStorageUsed = int(fields['hrStorageUsed'])
 
     # Calculate actual sizes
     total_bytes = hrStorageSize * hrStorageAllocationUnits
@@ -159,119 +72,76 @@ def get_volume_info(nas_ip, community_string, storage_index, volume_name):
     used_gb = used_bytes / (1024 ** 3)
     free_gb = free_bytes / (1024 ** 3)
 
-    print(f"\nInformation for volume '{volume_name}' (Index {storage_index}):")
-    print(f"-----------------------------------------------")
-    print(f"Volume description : {hrStorageDescr}")
-    print(f"Total size         : {total_gb:.2f} GB")
-    print(f"Used space         : {used_gb:.2f} GB")
-    print(f"Free space         : {free_gb:.2f} GB")
-    print(f"Used percentage    : {used_percentage:.2f}%")
+    out(f"\nInformation for volume '{volume_name}' (Index {storage_index}):")
+    out(f"-----------------------------------------------")
+    out(f"Volume description : {hrStorageDescr}")
+    out(f"Total size         : {total_gb:.2f} GB")
+    out(f"Used space         : {used_gb:.2f} GB")
+    out(f"Free space         : {free_gb:.2f} GB")
+    out(f"Used percentage    : {used_percentage:.2f}%")
 
     return used_percentage  # Return the used percentage for severity assessment
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2 or len(sys.argv) > 3:
-        print("Usage: python3 script.py <NAS_IP> [COMMUNITY_STRING]")
-        sys.exit(1)
-
-    nas_ip = sys.argv[1]
-    community_string = sys.argv[2] if len(sys.argv) == 3 else 'public'
-
+async def poll_nas_status(nas_ip, community_string, out=print):
     # Initialize severity level
     severity_level = 0  # 0: OK, 1: Urgent, 2: Information, 3: Warning
 
-    oids = {
-        'Model': ('1.3.6.1.4.1.6574.1.5.3.0', str),
-        'Serial Number': ('1.3.6.1.4.1.6574.1.5.2.0', str),
-        'DSM Version': ('1.3.6.1.4.1.6574.1.5.1.0', str),
-        'System Status': ('1.3.6.1.4.1.6574.1.1.0', get_human_readable_status),
-        'System Temperature': ('1.3.6.1.4.1.6574.1.2.0', get_human_readable_temperature),
-        'Power Status': ('1.3.6.1.4.1.6574.1.3.0', get_human_readable_power_status),
-        'System Fan Status': ('1.3.6.1.4.1.6574.1.4.1.0', get_human_readable_fan_status),
-        'CPU Fan Status': ('1.3.6.1.4.1.6574.1.4.2.0', get_human_readable_fan_status),
-        'Disk 1 Status': ('1.3.6.1.4.1.6574.2.1.1.5.0', get_human_readable_disk_status),
-        'Disk 2 Status': ('1.3.6.1.4.1.6574.2.1.1.5.1', get_human_readable_disk_status),
-        'Disk 1 Temperature': ('1.3.6.1.4.1.6574.2.1.1.6.0', get_human_readable_temperature),
-        'Disk 2 Temperature': ('1.3.6.1.4.1.6574.2.1.1.6.1', get_human_readable_temperature),
-        'CPU Usage': ('1.3.6.1.4.1.2021.11.9.0', lambda x: f"{x}%"),
-        'Total Memory': ('1.3.6.1.4.1.2021.4.5.0', get_human_readable_memory),
-        'Available Memory': ('1.3.6.1.4.1.2021.4.6.0', get_human_readable_memory),
-        'Update Available': ('1.3.6.1.4.1.6574.1.5.4.0', lambda x: "Yes" if int(x) == 1 else "No"),
-        'RAID Index': ('1.3.6.1.4.1.6574.3.1.1.1.0', lambda x: f"RAID {x}"),
-        'RAID Name': ('1.3.6.1.4.1.6574.3.1.1.2.0', str),
-        'RAID Status': ('1.3.6.1.4.1.6574.3.1.1.3.0', get_human_readable_raid_status),
-        'RAID Hotspare Count': ('1.3.6.1.4.1.6574.3.1.1.6.0', lambda x: f"{x} disks" if int(x) >= 0 else "Error"),
-    }
-
-    print(f"Synology NAS Status ({nas_ip}):")
-    print("---------------------------------")
-
-    for name, (oid, formatter) in oids.items():
-        iterator = getCmd(
-            SnmpEngine(),
-            CommunityData(community_string, mpModel=0),
-            UdpTransportTarget((nas_ip, 161)),
-            ContextData(),
-            ObjectType(ObjectIdentity(oid))
-        )
-
-        errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
+    # Scalars, formatters and severity rules are described in profiles/synology.json
+    plan = load_plan('synology')
 
-        if errorIndication:
-            print(f"{name}: Error - {errorIndication}")
-            severity_level = max(severity_level, 1)  # Set to urgent
-        elif errorStatus:
-            print(f"{name}: Error - {errorStatus}")
-            severity_level = max(severity_level, 1)  # Set to urgent
-        else:
-            for varBind in varBinds:
-                value = varBind[1]
-                try:
-                    formatted_value = formatter(value) if callable(formatter) else value
-                    print(f"{name}: {formatted_value}")
+    out(f"Synology NAS Status ({nas_ip}):")
+    out("---------------------------------")
 
-                    # Assess severity based on specific conditions
-                    if name == 'System Status' and formatted_value != 'Normal':
-                        severity_level = max(severity_level, 1)  # Urgent
-                    elif 'Disk' in name and 'Status' in name:
-                        if formatted_value == 'Crashed':
-                            severity_level = max(severity_level, 1)  # Urgent
-                        elif formatted_value != 'Normal':
-                            severity_level = max(severity_level, 3)  # Warning
-                    elif name == 'RAID Status':
-                        if formatted_value == 'Crashed':
-                            severity_level = max(severity_level, 1)  # Urgent
-                        elif formatted_value != 'Normal':
-                            severity_level = max(severity_level, 3)  # Warning
-                    elif name == 'Update Available' and formatted_value == 'Yes':
-                        severity_level = max(severity_level, 2)  # Information
-                    elif 'Volume' in name and 'Usage' in name:
-                        usage = float(formatted_value.strip('%'))
-                        if usage > 90:
-                            severity_level = max(severity_level, 1)  # Urgent
-                        elif usage > 80:
-                            severity_level = max(severity_level, 3)  # Warning
+    # Fetch the whole OID map in as few round trips as the NAS accepts
+    client = SnmpClient(nas_ip, community_string)
+    values, errors, _ = await collect(plan, client)
+    severity_level = max(severity_level, report_scalars(plan, values, errors, out=out))
 
-                except Exception as e:
-                    print(f"{name}: Error during formatting - {str(e)}")
-                    severity_level = max(severity_level, 1)  # Set to urgent
+    uptime = scalar_value(plan, values, 'sysUpTime')
+    uptime = int(uptime) if uptime is not None else None
 
     # Discover available volumes
-    print("\nDiscovering available volumes:")
-    storage_indexes = get_storage_indexes(nas_ip, community_string)
+    out("\nDiscovering available volumes:")
+    storage_indexes, from_cache = await get_storage_indexes(nas_ip, community_string, uptime, out)
 
     # Filter relevant volumes (e.g., those with description containing '/volume')
     volume_indexes = [(index, descr) for index, descr in storage_indexes if '/volume' in descr]
 
     if volume_indexes:
+        volume_values, volume_errors = await get_volumes_values(
+            nas_ip, community_string, [index for index, descr in volume_indexes]
+        )
+        # A cached index that no longer holds the same volume means the table changed
+        if from_cache and any(
+            str(volume_values.get(get_volume_oids(index)['hrStorageDescr'])) != descr
+            for index, descr in volume_indexes
+        ):
+            forget_discovery(nas_ip, 'storage')
+            storage_indexes, from_cache = await get_storage_indexes(nas_ip, community_string, uptime, out)
+            volume_indexes = [(index, descr) for index, descr in storage_indexes if '/volume' in descr]
+            volume_values, volume_errors = await get_volumes_values(
+                nas_ip, community_string, [index for index, descr in volume_indexes]
+            ) if volume_indexes else ({}, {})
         for index, descr in volume_indexes:
-            used_percentage = get_volume_info(nas_ip, community_string, index, descr)
+            used_percentage = get_volume_info(index, descr, volume_values, volume_errors, out)
             if used_percentage is not None and used_percentage >= 90:
                 severity_level = max(severity_level, 3)  # Warning if disk usage >= 90%
     else:
-        print("No relevant volumes found.")
+        out("No relevant volumes found.")
 
-    print("---------------------------------")
+    out("---------------------------------")
+    return severity_level
 
+def check_nas_status(nas_ip, community_string):
     # Exit with appropriate code
-    sys.exit(severity_level)
+    sys.exit(run(poll_nas_status(nas_ip, community_string)))
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or len(sys.argv) > 3:
+        print("Usage: python3 script.py <NAS_IP> [COMMUNITY_STRING]")
+        sys.exit(1)
+
+    nas_ip = sys.argv[1]
+    community_string = sys.argv[2] if len(sys.argv) == 3 else 'public'
+
+    check_nas_status(nas_ip, community_string)
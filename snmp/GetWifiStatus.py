@@ -1,126 +1,56 @@
 #!/usr/bin/env python3
 
 import sys
-from pysnmp.hlapi import *
-
-def get_snmp_data(ip, community, oid):
-    """
-    Retrieves an SNMP value for a given OID.
-    """
-    iterator = getCmd(
-        SnmpEngine(),
-        CommunityData(community, mpModel=0),  # SNMP v1
-        UdpTransportTarget((ip, 161), timeout=2, retries=2),
-        ContextData(),
-        ObjectType(ObjectIdentity(oid))
-    )
-
-    errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
 
-    if errorIndication:
-        # print(f"SNMP Error: {errorIndication}")
-        return None
-    elif errorStatus:
-        # print(f"SNMP Error: {errorStatus.prettyPrint()}")
-        return None
-    else:
-        for varBind in varBinds:
-            return varBind[1]
-    return None
-
-def get_snmp_table(ip, community, oid):
-    """
-    Retrieves an SNMP table for a given OID.
-    """
-    result = {}
-    for (errorIndication, errorStatus, errorIndex, varBinds) in nextCmd(
-        SnmpEngine(),
-        CommunityData(community, mpModel=0),
-        UdpTransportTarget((ip, 161), timeout=2, retries=2),
-        ContextData(),
-        ObjectType(ObjectIdentity(oid)),
-        lexicographicMode=False
-    ):
-        if errorIndication:
-            # print(f"SNMP Error: {errorIndication}")
-            break
-        elif errorStatus:
-            # print(f"SNMP Error: {errorStatus.prettyPrint()}")
-            break
-        else:
-            for varBind in varBinds:
-                oid, value = varBind
-                oid_str = oid.prettyPrint()
-                oid_index = oid_str.split('.')[-1]
-                result[oid_index] = value
-    return result
+from device_profiles import collect, load_plan, report_scalars, scalar_value
+from discovery_cache import get_cached_table
+from snmp_client import SnmpClient, run
 
-def check_wifi_ap_status(ip, community):
+async def poll_wifi_ap_status(ip, community, out=print):
     severity_level = 0  # 0: OK, 1: Warning, 2: Critical
 
-    # OIDs for device information
-    oids = {
-        'Device Name': ('1.3.6.1.2.1.1.5.0', str),        # sysName
-        'Description': ('1.3.6.1.2.1.1.1.0', str),        # sysDescr
-        'Uptime': ('1.3.6.1.2.1.1.3.0', int),             # sysUpTime
-        'Contact': ('1.3.6.1.2.1.1.4.0', str),            # sysContact
-        'Location': ('1.3.6.1.2.1.1.6.0', str),           # sysLocation
-    }
-
-    print(f"Wi-Fi Access Point Status ({ip}):")
-    print("---------------------------------")
-
-    # Retrieve and display basic information
-    for name, (oid, data_type) in oids.items():
-        value = get_snmp_data(ip, community, oid)
-        if value is None:
-            severity_level = max(severity_level, 1)
-            print(f"{name}: Data not available")
-            continue
+    # Scalars are described in profiles/wifi.json (TP-Link OIDs in tplink-ap.json)
+    plan = load_plan('wifi')
+
+    out(f"Wi-Fi Access Point Status ({ip}):")
+    out("---------------------------------")
 
-        if data_type == int:
-            try:
-                value = int(value)
-                if name == 'Uptime':
-                    days = value // (100 * 60 * 60 * 24)
-                    hours = (value // (100 * 60 * 60)) % 24
-                    minutes = (value // (100 * 60)) % 60
-                    seconds = (value // 100) % 60
-                    value = f"{days}d {hours}h {minutes}m {seconds}s"
-            except (ValueError, TypeError):
-                print(f"Warning: Unable to convert {name} to integer. Received: {value.prettyPrint()}")
-                severity_level = max(severity_level, 1)
-                continue
-        else:
-            value = str(value).strip()
-
-        print(f"{name}: {value}")
+    # Retrieve and display basic information, and the client count, in one batched GET
+    client = SnmpClient(ip, community, timeout=2, retries=2)
+    values, errors, _ = await collect(plan, client)
+    severity_level = max(severity_level, report_scalars(plan, values, errors, out=out))
+
+    uptime = scalar_value(plan, values, 'Uptime')
+    uptime_ticks = int(uptime) if uptime is not None else None
 
     # Retrieve interface information
-    print("\nNetwork Interfaces:")
+    out("\nNetwork Interfaces:")
     interfaces = {}
 
     # OIDs for interfaces
-    if_index_oid = '1.3.6.1.2.1.2.2.1.1'        # ifIndex
     if_descr_oid = '1.3.6.1.2.1.2.2.1.2'        # ifDescr
-    if_type_oid = '1.3.6.1.2.1.2.2.1.3'         # ifType
-    if_mtu_oid = '1.3.6.1.2.1.2.2.1.4'          # ifMtu
-    if_speed_oid = '1.3.6.1.2.1.2.2.1.5'        # ifSpeed
-    if_phys_addr_oid = '1.3.6.1.2.1.2.2.1.6'    # ifPhysAddress
     if_admin_status_oid = '1.3.6.1.2.1.2.2.1.7' # ifAdminStatus
     if_oper_status_oid = '1.3.6.1.2.1.2.2.1.8'  # ifOperStatus
 
-    # Retrieve the interface table
-    descr_table = get_snmp_table(ip, community, if_descr_oid)
-    admin_status_table = get_snmp_table(ip, community, if_admin_status_oid)
-    oper_status_table = get_snmp_table(ip, community, if_oper_status_oid)
+    # Retrieve the interface table in one GETBULK pass (GETNEXT on v1-only devices),
+    # or only the statuses of the known interfaces once they have been discovered
+    client = SnmpClient(ip, community, mp_model=1, timeout=2, retries=2)
+    if_table = await get_cached_table(
+        client,
+        'ap-interfaces',
+        [if_descr_oid, if_admin_status_oid, if_oper_status_oid],
+        uptime_ticks,
+        static=[if_descr_oid],
+    )
 
     # Build the interface dictionary
-    for idx in descr_table:
+    for idx, row in if_table.items():
+        if if_descr_oid not in row:
+            continue
         index = int(idx)
-        descr = str(descr_table[idx])
-        admin_status = int(admin_status_table.get(idx, 2))  # 2 = Down if not available
-        oper_status = int(oper_status_table.get(idx, 2))    # 2 = Down if not available
+        descr = str(row[if_descr_oid])
+        admin_status = int(row.get(if_admin_status_oid, 2))  # 2 = Down if not available
+        oper_status = int(row.get(if_oper_status_oid, 2))    # 2 = Down if not available
 
         interfaces[index] = {
             'description': descr,
@@ -138,25 +68,20 @@ def check_wifi_ap_status(ip, community):
 
             # Display only operational interfaces
             if data['oper_status'] == 1:
-                print(f"Interface {idx} - {descr}: Admin = {admin_status}, Operational = {oper_status}")
+                out(f"Interface {idx} - {descr}: Admin = {admin_status}, Operational = {oper_status}")
     else:
-        print("No interfaces detected.")
+        out("No interfaces detected.")
         severity_level = max(severity_level, 1)
 
-    # Retrieve the number of connected clients (if available)
-    print("\nConnected Clients:")
-    # Specific OID for the number of clients (must be adjusted according to the manufacturer)
-    num_clients_oid = '1.3.6.1.4.1.11863.10.1.2.1.0'  # Example OID for the number of clients
+    # Display the number of connected clients (if available)
+    out("\nConnected Clients:")
+    severity_level = max(severity_level, report_scalars(plan, values, errors, group='clients', out=out))
 
-    num_clients = get_snmp_data(ip, community, num_clients_oid)
-    if num_clients is not None:
-        print(f"Number of connected clients: {num_clients}")
-    else:
-        print("Number of connected clients: Data not available")
-        severity_level = max(severity_level, 1)
+    out("---------------------------------")
+    return severity_level
 
-    print("---------------------------------")
-    sys.exit(severity_level)
+def check_wifi_ap_status(ip, community):
+    sys.exit(run(poll_wifi_ap_status(ip, community)))
 
 if __name__ == "__main__":
     if len(sys.argv) < 2 or len(sys.argv) > 3:
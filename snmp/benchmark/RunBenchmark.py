@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the snmp/ checks against a local simulated agent.
+
+Each check runs as its own process, twice: a cold run with an empty state
+directory, then a warm run that reuses the discovery caches, compiled plans
+and counter samples of the first one. For each run the agent counts the
+requests it received (round trips) and the bytes exchanged, and the wall
+and CPU time of the check process are measured.
+
+Results are compared with baseline.json for the same latency and loss
+settings; the run fails if a check needs more round trips or noticeably
+more bytes, wall time or CPU time than recorded there. Round trips and
+bytes are deterministic; times depend on the machine, so record a baseline
+with `update` on the machine that runs the comparison.
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from snmp_simulator import SnmpSimulator
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SNMP_DIR = os.path.dirname(BENCHMARK_DIR)
+DATA_DIR = os.path.join(BENCHMARK_DIR, "data")
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+# Check name -> (script, dataset served to it through the community string)
+CHECKS = {
+    "printer": ("GetPrinterStatus.py", "printer"),
+    "switch": ("GetNetworkEquipmentStatus.py", "switch"),
+    "wifi": ("GetWifiStatus.py", "ap"),
+    "nas": ("GetSynoStatus.py", "synology"),
+}
+
+# Allowed growth over the baseline before a result counts as a regression
+TOLERANCES = {
+    "round_trips": (1.0, 0),  # (factor, absolute slack)
+    "bytes": (1.05, 0),
+    "wall": (1.5, 0.1),
+    "cpu": (1.5, 0.1),
+}
+
+# Runs the check script with the client pointed at the simulator's port
+RUNNER = (
+    "import runpy, sys, snmp_client\n"
+    "snmp_client.DEFAULT_PORT = int(sys.argv[1])\n"
+    "sys.argv = sys.argv[2:]\n"
+    "runpy.run_path(sys.argv[0], run_name='__main__')\n"
+)
+
+
+def children_cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_check(simulator, script, community, state_dir):
+    """
+    Runs one check against the simulator and returns its measurements.
+    """
+    # The check imports its siblings from SNMP_DIR; pysnmp may itself come from PYTHONPATH
+    python_path = os.pathsep.join(filter(None, [SNMP_DIR, os.environ.get("PYTHONPATH")]))
+    env = dict(os.environ, RMM_STATE_DIR=state_dir, PYTHONPATH=python_path)
+    command = [sys.executable, "-c", RUNNER, str(simulator.address[1]), os.path.join(SNMP_DIR, script), "127.0.0.1", community]
+
+    simulator.reset_stats()
+    cpu_start = children_cpu_time()
+    start_time = time.perf_counter()
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    wall = time.perf_counter() - start_time
+    cpu = children_cpu_time() - cpu_start
+
+    if result.returncode not in (0, 1, 2, 3) or result.stderr:
+        raise RuntimeError(f"{script} failed:\n{result.stderr.decode(errors='replace')}")
+    return {
+        "round_trips": simulator.stats["requests"],
+        "bytes": simulator.stats["bytes_in"] + simulator.stats["bytes_out"],
+        "wall": round(wall, 3),
+        "cpu": round(cpu, 3),
+    }
+
+
+def run_benchmark(latency=0.0, loss=0.0):
+    """
+    Returns {check: {"cold": measurements, "warm": measurements}}.
+    """
+    simulator = SnmpSimulator(DATA_DIR, latency=latency, loss=loss, seed=1).start()
+    results = {}
+    try:
+        for name, (script, community) in CHECKS.items():
+            with tempfile.TemporaryDirectory() as state_dir:
+                results[name] = {
+                    "cold": run_check(simulator, script, community, state_dir),
+                    "warm": run_check(simulator, script, community, state_dir),
+                }
+    finally:
+        simulator.stop()
+    return results
+
+
+def find_regressions(results, baseline):
+    regressions = []
+    for name, runs in results.items():
+        for run, measurements in runs.items():
+            expected = baseline.get(name, {}).get(run)
+            if not expected:
+                continue
+            for metric, (factor, slack) in TOLERANCES.items():
+                limit = expected[metric] * factor + slack
+                if measurements[metric] > limit:
+                    regressions.append(
+                        f"{name} ({run}): {metric} {measurements[metric]} > {limit:.3f} (baseline {expected[metric]})"
+                    )
+    return regressions
+
+
+def print_results(results):
+    print("+----------+------+-------------+---------+----------+----------+")
+    print("| Check    | Run  | Round trips | Bytes   | Wall (s) | CPU (s)  |")
+    print("+----------+------+-------------+---------+----------+----------+")
+    for name, runs in results.items():
+        for run, m in runs.items():
+            print(
+                f"| {name:<8} | {run:<4} | {m['round_trips']:<11} | {m['bytes']:<7} "
+                f"| {m['wall']:<8.3f} | {m['cpu']:<8.3f} |"
+            )
+    print("+----------+------+-------------+---------+----------+----------+")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 4 or (len(sys.argv) > 1 and sys.argv[1] not in ("check", "update")):
+        print("Usage: python3 RunBenchmark.py [check|update] [LATENCY_SECONDS] [LOSS_RATIO]")
+        print("  check   compare with baseline.json and exit 1 on a regression (default)")
+        print("  update  store this run as the new baseline")
+        sys.exit(1)
+
+    mode = sys.argv[1] if len(sys.argv) > 1 else "check"
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    loss = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+    conditions = f"latency={latency},loss={loss}"
+
+    print(f"SNMP benchmark ({conditions}):")
+    results = run_benchmark(latency, loss)
+    print_results(results)
+
+    try:
+        with open(BASELINE_FILE) as handle:
+            baselines = json.load(handle)
+    except (OSError, ValueError):
+        baselines = {}
+
+    if mode == "update":
+        baselines[conditions] = results
+        with open(BASELINE_FILE, "w") as handle:
+            json.dump(baselines, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+        print(f"Baseline for {conditions} saved to {BASELINE_FILE}")
+        sys.exit(0)
+
+    if conditions not in baselines:
+        print(f"No baseline for {conditions}; run with 'update' to record one.")
+        sys.exit(0)
+
+    regressions = find_regressions(results, baselines[conditions])
+    if regressions:
+        print("\nRegressions against the baseline:")
+        for regression in regressions:
+            print(f"- {regression}")
+        sys.exit(1)
+    print("\nNo regression against the baseline.")
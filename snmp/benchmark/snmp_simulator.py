@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Minimal SNMPv1/v2c agent serving recorded device datasets over UDP.
+
+Datasets use the snmprec format (`oid|type|value`, one varbind per line);
+the community string selects the dataset. GET, GETNEXT and GETBULK are
+supported, responses larger than the configured maximum size come back as
+tooBig, and latency and packet loss can be injected to mimic slow links.
+With v1_only, SNMPv2c messages are dropped without an answer, like the
+old printers and switches that only speak SNMPv1.
+"""
+
+import bisect
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+# BER tags
+INTEGER = 0x02
+OCTET_STRING = 0x04
+NULL = 0x05
+OBJECT_IDENTIFIER = 0x06
+SEQUENCE = 0x30
+IP_ADDRESS = 0x40
+COUNTER32 = 0x41
+GAUGE32 = 0x42
+TIMETICKS = 0x43
+COUNTER64 = 0x46
+NO_SUCH_OBJECT = 0x80
+NO_SUCH_INSTANCE = 0x81
+END_OF_MIB_VIEW = 0x82
+
+GET_REQUEST = 0xA0
+GET_NEXT_REQUEST = 0xA1
+GET_RESPONSE = 0xA2
+GET_BULK_REQUEST = 0xA5
+
+TOO_BIG = 1
+NO_SUCH_NAME = 2
+
+
+def encode_length(length):
+    if length < 0x80:
+        return bytes([length])
+    raw = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes([0x80 | len(raw)]) + raw
+
+
+def encode(tag, payload):
+    return bytes([tag]) + encode_length(len(payload)) + payload
+
+
+def encode_integer(value, tag=INTEGER):
+    size = max(1, (value.bit_length() + 8) // 8)
+    return encode(tag, value.to_bytes(size, "big", signed=True))
+
+
+def encode_unsigned(value, tag):
+    size = max(1, (value.bit_length() + 8) // 8)
+    return encode(tag, value.to_bytes(size, "big"))
+
+
+def encode_oid(oid):
+    arcs = list(oid)
+    body = bytearray([arcs[0] * 40 + arcs[1]])
+    for arc in arcs[2:]:
+        chunk = [arc & 0x7F]
+        arc >>= 7
+        while arc:
+            chunk.append(0x80 | (arc & 0x7F))
+            arc >>= 7
+        body.extend(reversed(chunk))
+    return encode(OBJECT_IDENTIFIER, bytes(body))
+
+
+def decode(data, offset=0):
+    """
+    Decodes one TLV and returns (tag, payload, next offset).
+    """
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        size = length & 0x7F
+        length = int.from_bytes(data[offset:offset + size], "big")
+        offset += size
+    return tag, data[offset:offset + length], offset + length
+
+
+def decode_sequence(payload):
+    items = []
+    offset = 0
+    while offset < len(payload):
+        tag, value, offset = decode(payload, offset)
+        items.append((tag, value))
+    return items
+
+
+def decode_oid(payload):
+    arcs = [payload[0] // 40, payload[0] % 40]
+    value = 0
+    for byte in payload[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            arcs.append(value)
+            value = 0
+    return tuple(arcs)
+
+
+def parse_oid(text):
+    return tuple(int(x) for x in text.strip(".").split("."))
+
+
+def encode_record_value(type_code, value):
+    """
+    Encodes a snmprec value; a trailing `x` on the type means hex payload.
+    """
+    hex_value = type_code.endswith("x")
+    tag = int(type_code.rstrip("x"))
+    if hex_value:
+        return encode(tag, bytes.fromhex(value))
+    if tag == INTEGER:
+        return encode_integer(int(value))
+    if tag in (COUNTER32, GAUGE32, TIMETICKS, COUNTER64):
+        return encode_unsigned(int(value), tag)
+    if tag == OBJECT_IDENTIFIER:
+        return encode_oid(parse_oid(value))
+    if tag == IP_ADDRESS:
+        return encode(tag, socket.inet_aton(value))
+    if tag == NULL:
+        return encode(NULL, b"")
+    return encode(tag, value.encode())
+
+
+def load_dataset(path):
+    """
+    Loads a snmprec file into sorted OID and encoded value lists.
+    """
+    records = {}
+    with open(path) as handle:
+        for line in handle:
+            line = line.rstrip("\n")
+            if not line or line.startswith("#"):
+                continue
+            oid, type_code, value = line.split("|", 2)
+            records[parse_oid(oid)] = encode_record_value(type_code, value)
+    oids = sorted(records)
+    return oids, [records[oid] for oid in oids]
+
+
+SYS_UPTIME = (1, 3, 6, 1, 2, 1, 1, 3, 0)
+
+
+class Dataset:
+    """
+    One recorded device; sysUpTime keeps counting from its recorded value.
+    """
+
+    def __init__(self, path):
+        self.oids, self.values = load_dataset(path)
+        self.index = {oid: i for i, oid in enumerate(self.oids)}
+        self.started = time.monotonic()
+        self.uptime = None
+        if SYS_UPTIME in self.index:
+            _, payload, _ = decode(self.values[self.index[SYS_UPTIME]])
+            self.uptime = int.from_bytes(payload, "big")
+
+    def _value(self, position):
+        if self.uptime is not None and self.oids[position] == SYS_UPTIME:
+            ticks = self.uptime + int((time.monotonic() - self.started) * 100)
+            return encode_unsigned(ticks % 2 ** 32, TIMETICKS)
+        return self.values[position]
+
+    def get(self, oid):
+        position = self.index.get(oid)
+        return None if position is None else self._value(position)
+
+    def next(self, oid):
+        position = bisect.bisect_right(self.oids, oid)
+        if position >= len(self.oids):
+            return None, None
+        return self.oids[position], self._value(position)
+
+
+class SnmpSimulator:
+    """
+    UDP SNMP agent serving every `<community>.snmprec` file in a directory.
+    """
+
+    def __init__(self, data_dir, host="127.0.0.1", port=0, latency=0.0, loss=0.0, max_size=1472, seed=None, v1_only=False):
+        self.datasets = {}
+        for name in os.listdir(data_dir):
+            if name.endswith(".snmprec"):
+                self.datasets[name[: -len(".snmprec")]] = Dataset(os.path.join(data_dir, name))
+        self.latency = latency
+        self.loss = loss
+        self.max_size = max_size
+        self.v1_only = v1_only
+        self.random = random.Random(seed)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.address = self.sock.getsockname()
+        self.stats = {"requests": 0, "responses": 0, "dropped": 0, "bytes_in": 0, "bytes_out": 0}
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self.sock.close()
+
+    def reset_stats(self):
+        for key in self.stats:
+            self.stats[key] = 0
+
+    def serve_forever(self):
+        self._running = True
+        while self._running:
+            try:
+                data, peer = self.sock.recvfrom(65535)
+            except OSError:
+                return
+            self.stats["requests"] += 1
+            self.stats["bytes_in"] += len(data)
+            if self.loss and self.random.random() < self.loss:
+                self.stats["dropped"] += 1
+                continue
+            try:
+                response = self.handle(data)
+            except (IndexError, ValueError):
+                continue
+            if response is None:
+                continue
+            if self.latency:
+                threading.Timer(self.latency, self._send, (response, peer)).start()
+            else:
+                self._send(response, peer)
+
+    def _send(self, response, peer):
+        try:
+            self.sock.sendto(response, peer)
+        except OSError:
+            return
+        self.stats["responses"] += 1
+        self.stats["bytes_out"] += len(response)
+
+    def handle(self, data):
+        tag, message, _ = decode(data)
+        (_, version), (_, community), (pdu_type, pdu) = decode_sequence(message)
+        version = int.from_bytes(version, "big")
+        if self.v1_only and version != 0:
+            return None
+        dataset = self.datasets.get(community.decode(errors="replace"))
+        if dataset is None:
+            return None
+        fields = decode_sequence(pdu)
+        request_id = int.from_bytes(fields[0][1], "big", signed=True)
+        param1 = int.from_bytes(fields[1][1], "big", signed=True)
+        param2 = int.from_bytes(fields[2][1], "big", signed=True)
+        names = [decode_oid(decode_sequence(vb)[0][1]) for _, vb in decode_sequence(fields[3][1])]
+
+        error_status = error_index = 0
+        varbinds = []
+        if pdu_type == GET_REQUEST:
+            for position, name in enumerate(names, 1):
+                value = dataset.get(name)
+                if version == 0 and value is not None and value[0] == COUNTER64:
+                    value = None  # SNMPv1 has no Counter64 (RFC 2576)
+                if value is None:
+                    if version == 0:
+                        error_status, error_index = NO_SUCH_NAME, position
+                        break
+                    value = encode(NO_SUCH_INSTANCE, b"")
+                varbinds.append((name, value))
+        elif pdu_type == GET_NEXT_REQUEST:
+            for position, name in enumerate(names, 1):
+                next_name, value = dataset.next(name)
+                while version == 0 and next_name is not None and value[0] == COUNTER64:
+                    next_name, value = dataset.next(next_name)  # skipped by SNMPv1 agents (RFC 2576)
+                if next_name is None:
+                    if version == 0:
+                        error_status, error_index = NO_SUCH_NAME, position
+                        break
+                    next_name, value = name, encode(END_OF_MIB_VIEW, b"")
+                varbinds.append((next_name, value))
+        elif pdu_type == GET_BULK_REQUEST and version == 1:
+            non_repeaters, max_repetitions = max(param1, 0), max(param2, 0)
+            for name in names[:non_repeaters]:
+                next_name, value = dataset.next(name)
+                varbinds.append((next_name or name, value or encode(END_OF_MIB_VIEW, b"")))
+            cursors = list(names[non_repeaters:])
+            for _ in range(max_repetitions):
+                if not cursors:
+                    break
+                exhausted = True
+                for column, name in enumerate(cursors):
+                    next_name, value = dataset.next(name)
+                    if next_name is None:
+                        next_name, value = name, encode(END_OF_MIB_VIEW, b"")
+                    else:
+                        exhausted = False
+                    cursors[column] = next_name
+                    varbinds.append((next_name, value))
+                if exhausted:
+                    break
+        else:
+            return None
+
+        if error_status:
+            varbinds = [(name, encode(NULL, b"")) for name in names]
+        response = self._encode_response(version, community, request_id, error_status, error_index, varbinds)
+        if len(response) > self.max_size:
+            if pdu_type == GET_BULK_REQUEST:
+                # GETBULK responses are truncated rather than failed (RFC 3416)
+                while varbinds and len(response) > self.max_size:
+                    varbinds = varbinds[: len(varbinds) * 3 // 4]
+                    response = self._encode_response(version, community, request_id, 0, 0, varbinds)
+            else:
+                varbinds = [(name, encode(NULL, b"")) for name in names]
+                response = self._encode_response(version, community, request_id, TOO_BIG, 0, varbinds)
+        return response
+
+    @staticmethod
+    def _encode_response(version, community, request_id, error_status, error_index, varbinds):
+        body = b"".join(encode(SEQUENCE, encode_oid(name) + value) for name, value in varbinds)
+        pdu = (
+            encode_integer(request_id)
+            + encode_integer(error_status)
+            + encode_integer(error_index)
+            + encode(SEQUENCE, body)
+        )
+        message = encode_integer(version) + encode(OCTET_STRING, community) + encode(GET_RESPONSE, pdu)
+        return encode(SEQUENCE, message)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 snmp_simulator.py <DATA_DIR> [PORT] [LATENCY_SECONDS] [LOSS_RATIO]")
+        sys.exit(1)
+
+    simulator = SnmpSimulator(
+        sys.argv[1],
+        port=int(sys.argv[2]) if len(sys.argv) > 2 else 16100,
+        latency=float(sys.argv[3]) if len(sys.argv) > 3 else 0.0,
+        loss=float(sys.argv[4]) if len(sys.argv) > 4 else 0.0,
+    )
+    print(f"Serving {', '.join(sorted(simulator.datasets))} on {simulator.address[0]}:{simulator.address[1]}")
+    try:
+        simulator.serve_forever()
+    except KeyboardInterrupt:
+        pass
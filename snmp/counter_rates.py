@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Turns cumulative SNMP octet counters into rates across two consecutive runs.
+
+Each run stores its counter sample per device in the state store; the next
+run divides the counter deltas by the time elapsed in between, so a check
+gets traffic rates without sleeping and polling twice. 32-bit counter wraps
+are unwrapped, and an agent reboot (the agent up for less time than has
+passed since the previous poll) or a sample older than MAX_SAMPLE_AGE starts
+a new baseline instead of producing a bogus rate.
+"""
+
+import time
+
+from state_store import load_state, save_state
+
+COUNTER32_MODULO = 2 ** 32
+
+# Seconds; past this a 32-bit counter may have wrapped more than once, and
+# an average over the whole gap says little about the current traffic
+MAX_SAMPLE_AGE = 60 * 60
+
+
+def counter_delta(previous, current, bits):
+    """
+    Returns the increase of a counter, or None across a discontinuity.
+    """
+    if current >= previous:
+        return current - previous
+    if bits == 32:
+        return current + COUNTER32_MODULO - previous
+    # A 64-bit counter never wraps in practice: the counter was reset
+    return None
+
+
+def elapsed_seconds(previous, current):
+    """
+    Returns the seconds between two samples, or None if they cannot be compared.
+
+    That is the case when the previous sample is older than MAX_SAMPLE_AGE,
+    or when the agent has been up for less time than has passed between the
+    two polls: it rebooted in between and its counters restarted from zero,
+    even if its uptime has since gone past the previous sample's.
+    sysUpTime (hundredths of a second, agent clock) is preferred over the
+    local clock. It wraps after 497 days, which looks the same as a reboot:
+    that poll starts a new baseline too.
+    """
+    wall = current["time"] - previous["time"]
+    if wall <= 0 or wall > MAX_SAMPLE_AGE:
+        return None
+    if current.get("uptime") is None or previous.get("uptime") is None:
+        return wall
+    if current["uptime"] / 100.0 < wall:
+        return None  # rebooted since the previous poll
+    ticks = current["uptime"] - previous["uptime"]
+    return ticks / 100.0 if ticks > 0 else None
+
+
+def compute_rates(previous, current):
+    """
+    Returns {interface: (in_bps, out_bps)} for interfaces present in both samples.
+
+    A sample is {"time": epoch, "uptime": sysUpTime ticks,
+    "counters": {interface: [in_octets, out_octets, counter_bits]}}.
+    """
+    if not previous:
+        return {}
+    seconds = elapsed_seconds(previous, current)
+    if not seconds:
+        return {}
+
+    rates = {}
+    for key, (in_octets, out_octets, bits) in current["counters"].items():
+        old = previous.get("counters", {}).get(key)
+        if old is None or old[2] != bits:
+            continue
+        in_delta = counter_delta(old[0], in_octets, bits)
+        out_delta = counter_delta(old[1], out_octets, bits)
+        if in_delta is None or out_delta is None:
+            continue
+        rates[key] = (in_delta * 8 / seconds, out_delta * 8 / seconds)
+    return rates
+
+
+def update_rates(device, uptime, counters):
+    """
+    Stores this run's sample for a device and returns the rates since the previous run.
+
+    `counters` maps an interface key to [in_octets, out_octets, counter_bits].
+    """
+    name = f"if-rates-{device}"
+    current = {
+        "time": time.time(),
+        "uptime": uptime,
+        "counters": {str(key): list(value) for key, value in counters.items()},
+    }
+    previous = load_state(name)
+    save_state(name, current)
+    return compute_rates(previous, current)
+
+
+def utilisation(bits_per_second, speed_mbps):
+    """
+    Returns link utilisation in percent, or None when the speed is unknown.
+    """
+    if not speed_mbps:
+        return None
+    return bits_per_second / (speed_mbps * 1_000_000) * 100
+
+
+def format_rate(bits_per_second):
+    for unit in ["", "K", "M", "G"]:
+        if bits_per_second < 1000.0:
+            return f"{bits_per_second:.2f} {unit}bit/s"
+        bits_per_second /= 1000.0
+    return f"{bits_per_second:.2f} Tbit/s"
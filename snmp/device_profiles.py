@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Declarative device profiles for the SNMP checks.
+
+A profile is a JSON file in the `profiles` directory describing what to read
+from a kind of device and how to report it:
+
+- "scalars": ordered list of {"name", "oid", "format", ...} entries, or
+  {"include": "<profile>"} to insert the scalars of another profile, so that
+  vendor-specific OIDs live in their own file (e.g. tplink-switch.json);
+- "tables": {table: {column: column_oid}} walked in one shared stream;
+- "format": one of FORMATTERS, with "values" (inline or a named map from
+  the profile's "values") for enums and "template" for templates;
+- "severity": list of rules {"in" | "not_in": [formatted values], "level"},
+  or the name of a rule list in the profile's "severity_rules";
+- "missing", "format_error", "error_severity", "empty_is_missing": how a
+  check reports a value it could not read or format.
+
+compile_plan() turns a profile into a request plan: every OID is requested
+once, all scalars go into one batched GET (scalars that are rows of a walked
+table are served from the walk instead), and all tables into one
+get_tables() call. Compiled plans are kept in the state store and only
+recompiled when a profile file changes.
+"""
+
+import json
+import os
+
+from state_store import load_state, save_state
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+
+# Bump when the plan layout changes, so that cached plans are recompiled
+PLAN_VERSION = 1
+
+
+def _format_uptime(value):
+    value = int(value)
+    days = value // (100 * 60 * 60 * 24)
+    hours = (value // (100 * 60 * 60)) % 24
+    minutes = (value // (100 * 60)) % 60
+    seconds = (value // 100) % 60
+    return f"{days}d {hours}h {minutes}m {seconds}s"
+
+
+def _format_memory_kb(value):
+    try:
+        return f"{float(value) / (1024):.2f} MB"
+    except (ValueError, TypeError):
+        return "Invalid value"
+
+
+def _format_count(value, scalar):
+    return scalar["template"].format(value=value) if int(value) >= 0 else "Error"
+
+
+FORMATTERS = {
+    "raw": lambda value, scalar: value,
+    "text": lambda value, scalar: str(value),
+    "str": lambda value, scalar: str(value).strip(),
+    "int": lambda value, scalar: int(value),
+    "uptime": lambda value, scalar: _format_uptime(value),
+    "mac": lambda value, scalar: ":".join(f"{ord(x):02x}" for x in str(value).strip()),
+    "temperature": lambda value, scalar: f"{value} °C",
+    "memory_kb": lambda value, scalar: _format_memory_kb(value),
+    "template": lambda value, scalar: scalar["template"].format(value=value),
+    "count": _format_count,
+    "enum": lambda value, scalar: scalar["values"].get(str(int(value)), scalar.get("default", "Unknown")),
+}
+
+
+def profile_path(name):
+    return os.path.join(PROFILE_DIR, f"{name}.json")
+
+
+def _load_profile(name, sources):
+    path = profile_path(name)
+    sources[path] = os.stat(path).st_mtime_ns
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def _expand_scalars(name, sources, seen=()):
+    """
+    Returns the scalars of a profile with includes expanded, along with its named value maps and rules.
+    """
+    if name in seen:
+        raise ValueError(f"Profile include loop: {' -> '.join(seen + (name,))}")
+    profile = _load_profile(name, sources)
+    values = dict(profile.get("values", {}))
+    rules = dict(profile.get("severity_rules", {}))
+    scalars = []
+    for entry in profile.get("scalars", []):
+        if "include" in entry:
+            included, included_values, included_rules = _expand_scalars(entry["include"], sources, seen + (name,))
+            scalars.extend(included)
+            values = {**included_values, **values}
+            rules = {**included_rules, **rules}
+        else:
+            scalars.append(dict(entry))
+    return scalars, values, rules
+
+
+def compile_plan(name):
+    """
+    Compiles a profile into a request plan (a JSON-serialisable dict).
+    """
+    sources = {}
+    profile = _load_profile(name, sources)
+    scalars, values, rules = _expand_scalars(name, sources)
+
+    for scalar in scalars:
+        if scalar.get("format", "raw") not in FORMATTERS:
+            raise ValueError(f"{name}: unknown format {scalar['format']!r} for {scalar['name']}")
+        if isinstance(scalar.get("values"), str):
+            scalar["values"] = values[scalar["values"]]
+        if isinstance(scalar.get("severity"), str):
+            scalar["severity"] = rules[scalar["severity"]]
+
+    tables = profile.get("tables", {})
+
+    # A scalar that is a row of a walked column is read from the walk
+    from_tables = {}
+    for scalar in scalars:
+        for table, columns in tables.items():
+            for column, column_oid in columns.items():
+                if scalar["oid"].startswith(column_oid + "."):
+                    from_tables[scalar["oid"]] = [table, column, scalar["oid"][len(column_oid) + 1:]]
+
+    return {
+        "version": PLAN_VERSION,
+        "profile": name,
+        "sources": sources,
+        "missing": profile.get("missing", "{name}: Data not available"),
+        "format_error": profile.get("format_error", "{name}: Error during formatting - {error}"),
+        "error_severity": profile.get("error_severity", 1),
+        "empty_is_missing": profile.get("empty_is_missing", False),
+        "scalars": scalars,
+        "get": list(dict.fromkeys(scalar["oid"] for scalar in scalars if scalar["oid"] not in from_tables)),
+        "from_tables": from_tables,
+        "tables": tables,
+    }
+
+
+def _is_current(plan):
+    if not plan or plan.get("version") != PLAN_VERSION:
+        return False
+    try:
+        return all(os.stat(path).st_mtime_ns == mtime for path, mtime in plan["sources"].items())
+    except OSError:
+        return False
+
+
+def load_plan(name):
+    """
+    Returns the compiled plan of a profile, from the on-disk cache when it is up to date.
+    """
+    plan = load_state(f"plan-{name}")
+    if not _is_current(plan):
+        plan = compile_plan(name)
+        save_state(f"plan-{name}", plan)
+    return plan
+
+
+async def collect(plan, client, table_client=None):
+    """
+    Runs a plan: one batched GET and one get_tables() stream (on `table_client` if given).
+
+    Returns (values, errors, tables): values maps each scalar OID to its
+    value or None, errors maps unreadable OIDs to the reason, and tables
+    holds the rows of the plan's tables. The scalars are read first, so
+    that a device that answers them over SNMPv1 but ignores GETBULK is
+    walked with GETNEXT instead of timing out (see SnmpClient.get_tables).
+    """
+    values = {}
+    errors = {}
+    if plan["get"]:
+        values.update(await client.get_many(plan["get"]))
+        errors = dict(client.errors)
+
+    tables = await (table_client or client).get_tables(plan["tables"]) if plan["tables"] else {}
+    for oid, (table, column, index) in plan["from_tables"].items():
+        values[oid] = tables.get(table, {}).get(index, {}).get(column)
+
+    # Scalars the walk did not return are still asked for directly
+    missing = [oid for oid in plan["from_tables"] if values[oid] is None]
+    if missing:
+        values.update(await client.get_many(missing))
+        errors.update(client.errors)
+    return values, errors, tables
+
+
+def scalar_value(plan, values, name):
+    """
+    Returns the raw value of a scalar by name, or None.
+    """
+    for scalar in plan["scalars"]:
+        if scalar["name"] == name:
+            return values.get(scalar["oid"])
+    return None
+
+
+def evaluate_severity(scalar, formatted_value):
+    severity = 0
+    for rule in scalar.get("severity", []):
+        if "in" in rule and formatted_value in rule["in"]:
+            severity = max(severity, rule["level"])
+        elif "not_in" in rule and formatted_value not in rule["not_in"]:
+            severity = max(severity, rule["level"])
+    return severity
+
+
+def report_scalars(plan, values, errors, group=None, out=print):
+    """
+    Prints the scalars of a group as "<name>: <value>" lines and returns the worst severity.
+
+    `out` is called instead of print() for each line.
+    """
+    severity_level = 0
+    for scalar in plan["scalars"]:
+        if scalar.get("hidden") or scalar.get("group") != group:
+            continue
+        name = scalar["name"]
+        value = values.get(scalar["oid"])
+        if value is None or (plan["empty_is_missing"] and str(value).strip() == ""):
+            out(plan["missing"].format(name=name, error=errors.get(scalar["oid"])))
+            severity_level = max(severity_level, plan["error_severity"])
+            continue
+        try:
+            formatted_value = FORMATTERS[scalar.get("format", "raw")](value, scalar)
+        except Exception as e:
+            out(plan["format_error"].format(name=name, value=value.prettyPrint(), error=str(e)))
+            severity_level = max(severity_level, plan["error_severity"])
+            continue
+        out(f"{name}: {formatted_value}")
+        severity_level = max(severity_level, evaluate_severity(scalar, formatted_value))
+    return severity_level
+
+
+if __name__ == "__main__":
+    # Print the compiled plan of a profile, e.g. to review a new vendor file
+    import sys
+
+    if len(sys.argv) != 2:
+        print("Usage: python3 device_profiles.py <PROFILE_NAME>")
+        sys.exit(1)
+    print(json.dumps(compile_plan(sys.argv[1]), indent=2))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Per-device cache of table indexes found by walking, such as which
+hrStorage entries are volumes or which ifIndex is which port.
+
+These mappings almost never change, so a check walks the table once and
+then only GETs the values of the rows it already knows. An entry is
+rediscovered when it is older than its TTL, when the agent has been up for
+less time than the entry is old (it rebooted since the walk and may have
+renumbered its tables), or when the check finds that a known row is gone.
+"""
+
+import time
+
+from snmp_client import MAX_VARBINDS
+from state_store import load_state, save_state
+
+DEFAULT_TTL = 24 * 60 * 60  # seconds
+
+
+def _state_name(device, name):
+    return f"discovery-{name}-{device}"
+
+
+def load_discovery(device, name, uptime, ttl=DEFAULT_TTL):
+    """
+    Returns the cached discovery data, or None if it is missing or no longer valid.
+
+    `uptime` is the device's current sysUpTime in ticks (None if unknown).
+    As in counter_rates, an uptime shorter than the age of the entry means
+    the agent rebooted since it was discovered, even if its uptime has
+    since gone past the one stored with the entry. sysUpTime wraps after
+    497 days, which looks the same as a reboot and rediscovers too.
+    """
+    entry = load_state(_state_name(device, name))
+    if not entry:
+        return None
+    age = time.time() - entry["time"]
+    if age < 0 or age > ttl:
+        return None
+    if uptime is not None and uptime / 100.0 < age:
+        return None  # rebooted since the discovery
+    return entry["data"]
+
+
+def save_discovery(device, name, uptime, data):
+    save_state(_state_name(device, name), {"time": time.time(), "uptime": uptime, "data": data})
+
+
+def forget_discovery(device, name):
+    save_state(_state_name(device, name), None)
+
+
+async def get_cached_table(client, name, columns, uptime, static=(), ttl=DEFAULT_TTL):
+    """
+    Returns the rows of a table like client.get_table(columns), walking it only when needed.
+
+    With a valid cache entry, only the columns the device actually had are
+    read, and the `static` columns (names such as ifDescr) are taken from
+    the cache as strings instead of being read again. When the known rows
+    fit in one request they are read with GETs; a larger table is cheaper to
+    walk with GETBULK, which packs more varbinds into each response. If a
+    known row has disappeared or an unknown one shows up, the whole table is
+    walked again. If the device does not answer, the rows read so far (often
+    none) are returned as is, with the timeout in client.error: walking the
+    table again would only time out once more.
+    """
+    if not isinstance(columns, dict):
+        columns = {column: column for column in columns}
+
+    cached = load_discovery(client.ip, name, uptime, ttl)
+    if cached:
+        if cached["mp_model"] < client.mp_model:
+            client.downgrade()
+        wanted = {
+            column: oid for column, oid in columns.items()
+            if column in cached["columns"] and column not in static
+        }
+        if not wanted:
+            rows = {}
+        elif len(wanted) * len(cached["rows"]) <= MAX_VARBINDS:
+            rows = await client.get_rows(wanted, list(cached["rows"]))
+        else:
+            rows = await client.get_table(wanted)
+        if client.timed_out:
+            return rows
+        if not wanted or set(rows) == set(cached["rows"]):
+            for index, values in cached["rows"].items():
+                rows.setdefault(index, {}).update(values)
+            return rows
+
+    rows = await client.get_table(columns)
+    if rows and not client.error:
+        save_discovery(
+            client.ip,
+            name,
+            uptime,
+            {
+                "mp_model": client.mp_model,
+                "columns": sorted({column for row in rows.values() for column in row}),
+                "rows": {
+                    index: {column: str(row[column]) for column in static if column in row}
+                    for index, row in rows.items()
+                },
+            },
+        )
+    return rows
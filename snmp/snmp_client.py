@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+Shared SNMP client for the scripts in this directory.
+
+The scripts used to build a new SnmpEngine, CommunityData and
+UdpTransportTarget for every single OID they queried. This module keeps one
+engine per event loop and pools transport targets and credentials per
+device, so a run pays the engine and MIB set-up cost only once.
+
+Requests go through pysnmp's asyncio API: the SnmpClient methods are
+coroutines, and any number of checks can poll their devices concurrently
+from one event loop (GetFleetStatus.py). At most MAX_OUTSTANDING requests
+are in flight at a time; the others wait for a free slot. A standalone
+check runs its coroutine with run(). That API works with pysnmp 4.4 up to
+Python 3.9, and with pysnmp 6.x on later versions.
+
+Set SNMP_CLIENT_STATS=1 to print on stderr, when the script exits, how many
+engines and sockets the run created and how many requests it sent.
+"""
+
+import asyncio
+import atexit
+import os
+import sys
+
+from pysnmp.hlapi.asyncio import (
+    CommunityData,
+    ContextData,
+    ObjectIdentity,
+    ObjectType,
+    SnmpEngine,
+    UdpTransportTarget,
+    bulkCmd,
+    getCmd,
+    nextCmd,
+)
+from pysnmp.proto.errind import EmptyResponse, RequestTimedOut
+from pysnmp.proto.rfc1905 import EndOfMibView, NoSuchInstance, NoSuchObject
+
+DEFAULT_PORT = 161
+
+# Upper bound of varbinds per GET before the agent tells us otherwise
+MAX_VARBINDS = 64
+
+# Upper bound of repetitions per GETBULK request
+MAX_REPETITIONS = 50
+
+# Requests in flight at a time; decoding a response takes a few ms of CPU,
+# and more outstanding answers than the loop can decode within the request
+# timeout would time out while waiting in the socket
+MAX_OUTSTANDING = 32
+
+# SNMP error-status codes handled by the batching logic
+TOO_BIG = 1
+NO_SUCH_NAME = 2
+BAD_VALUE = 3
+GEN_ERR = 5
+
+# Error statuses with which agents that only speak SNMPv1 answer a GETBULK
+V1_ONLY_STATUSES = {NO_SUCH_NAME, BAD_VALUE, GEN_ERR}
+
+_engine = None
+_engine_loop = None
+_in_flight = None
+_transports = {}
+_context = ContextData()
+_credentials = {}
+_max_varbinds = {}
+_bulk_budget = {}
+_v1_only = set()
+_v1_answered = set()
+
+stats = {"engines": 0, "transports": 0, "sockets": 0, "requests": 0}
+
+
+def get_engine():
+    """
+    Returns the SNMP engine of the running event loop, creating it on first use.
+
+    The engine and the sockets of the pooled transports belong to the loop
+    they were created in, so a new loop gets a new engine and an empty pool.
+    """
+    global _engine, _engine_loop, _in_flight
+    loop = asyncio.get_running_loop()
+    if _engine_loop is not loop:
+        stats["sockets"] += count_sockets()
+        _engine = SnmpEngine()
+        _engine_loop = loop
+        _in_flight = asyncio.Semaphore(MAX_OUTSTANDING)
+        _transports.clear()
+        stats["engines"] += 1
+    return _engine
+
+
+def close_engine():
+    """
+    Closes the sockets of the current engine; the next request creates a new one.
+    """
+    global _engine, _engine_loop
+    if _engine is not None:
+        stats["sockets"] += count_sockets()
+        if _engine.transportDispatcher is not None:
+            _engine.transportDispatcher.closeDispatcher()
+        _engine = _engine_loop = None
+        _transports.clear()
+
+
+def run(coroutine):
+    """
+    Runs a check coroutine in a new event loop and returns its result.
+    """
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            close_engine()
+
+    return asyncio.run(main())
+
+
+def get_transport(ip, port=DEFAULT_PORT, timeout=1, retries=5):
+    """
+    Returns the pooled UDP transport target for a device, in the pool of the running loop's engine.
+    """
+    get_engine()
+    key = (ip, port, timeout, retries)
+    target = _transports.get(key)
+    if target is None:
+        target = _transports[key] = UdpTransportTarget((ip, port), timeout=timeout, retries=retries)
+        stats["transports"] += 1
+    return target
+
+
+def get_credentials(community, mp_model=0):
+    """
+    Returns the pooled community credentials (mpModel 0 = SNMPv1, 1 = v2c).
+    """
+    key = (community, mp_model)
+    auth = _credentials.get(key)
+    if auth is None:
+        auth = CommunityData(community, mpModel=mp_model)
+        _credentials[key] = auth
+    return auth
+
+
+def count_sockets():
+    """
+    Returns the number of UDP sockets opened by the pooled transports of the current engine.
+    """
+    return len({id(target.transport) for target in _transports.values() if getattr(target, "transport", None)})
+
+
+def report_stats(stream=sys.stderr):
+    print(
+        f"SNMP client: {stats['engines']} engine(s), {stats['sockets'] + count_sockets()} socket(s), "
+        f"{stats['transports']} transport target(s), {stats['requests']} request(s)",
+        file=stream,
+    )
+
+
+if os.environ.get("SNMP_CLIENT_STATS"):
+    atexit.register(report_stats)
+
+
+def parse_oid(oid):
+    return tuple(int(x) for x in str(oid).strip(".").split("."))
+
+
+def is_exception_value(value):
+    """
+    True for the SNMPv2 exception values (noSuchObject, noSuchInstance, endOfMibView).
+    """
+    return isinstance(value, (NoSuchObject, NoSuchInstance, EndOfMibView))
+
+
+class SnmpClient:
+    """
+    SNMP session to one device, backed by the shared engine and transport pool.
+
+    Creating a client is cheap, so scripts can build one wherever they need
+    it, from inside the event loop that runs their requests. The request
+    methods are coroutines, and walk() an async generator. After a failed
+    request, `error` holds the reason as a string and `timed_out` tells
+    whether the device did not answer at all, and after `get_many()`,
+    `errors` maps each unreadable OID to its reason.
+    """
+
+    def __init__(self, ip, community="public", mp_model=0, port=None, timeout=1, retries=5):
+        self.ip = ip
+        self.community = community
+        self.mp_model = mp_model
+        self.auth = get_credentials(community, mp_model)
+        self.target = get_transport(ip, port or DEFAULT_PORT, timeout, retries)
+        self.error = None
+        self.timed_out = False
+        self.errors = {}
+
+    async def _request(self, command, *args):
+        """
+        Sends one request PDU and waits for its response.
+        """
+        engine = get_engine()
+        async with _in_flight:
+            errorIndication, errorStatus, errorIndex, varBinds = await command(
+                engine, self.auth, self.target, _context, *args, lookupMib=False
+            )
+        stats["requests"] += 1
+
+        if self.mp_model == 0 and not errorIndication:
+            _v1_answered.add(self.target.transportAddr)
+        self.timed_out = isinstance(errorIndication, RequestTimedOut)
+        if errorIndication:
+            self.error = str(errorIndication)
+        elif errorStatus:
+            self.error = errorStatus.prettyPrint()
+        else:
+            self.error = None
+        return errorIndication, errorStatus, errorIndex, varBinds or []
+
+    async def get(self, oid):
+        """
+        Retrieves an SNMP value for a given OID, or None on error.
+        """
+        errorIndication, errorStatus, errorIndex, varBinds = await self._request(
+            getCmd, ObjectType(ObjectIdentity(oid))
+        )
+        if errorIndication or errorStatus:
+            return None
+        for varBind in varBinds:
+            if is_exception_value(varBind[1]):
+                self.error = varBind[1].prettyPrint()
+                return None
+            return varBind[1]
+        return None
+
+    async def get_many(self, oids):
+        """
+        Retrieves several OIDs with as few GET requests as the agent allows.
+
+        Returns a dict mapping each OID to its value, or None when it could
+        not be read. Batches are split in half when the agent answers tooBig
+        (the smaller size is remembered for the device), and with SNMPv1 an
+        OID answered with noSuchName is dropped so that the rest of its batch
+        can still be read.
+        """
+        self.errors = {}
+        results = {}
+        timed_out = False
+        pending = list(dict.fromkeys(oids))
+        address = self.target.transportAddr
+        size = _max_varbinds.get(address, MAX_VARBINDS)
+        batches = [pending[i:i + size] for i in range(0, len(pending), size)]
+
+        while batches:
+            batch = batches.pop(0)
+            errorIndication, errorStatus, errorIndex, varBinds = await self._request(
+                getCmd, *[ObjectType(ObjectIdentity(oid)) for oid in batch]
+            )
+
+            if errorIndication:
+                timed_out = timed_out or self.timed_out
+                for oid in batch:
+                    results[oid] = None
+                    self.errors[oid] = str(errorIndication)
+                continue
+
+            if errorStatus:
+                status = int(errorStatus)
+                index = int(errorIndex or 0)
+                if status == TOO_BIG and len(batch) > 1:
+                    half = len(batch) // 2
+                    _max_varbinds[address] = min(_max_varbinds.get(address, MAX_VARBINDS), half)
+                    batches[:0] = [batch[:half], batch[half:]]
+                elif status == NO_SUCH_NAME and 1 <= index <= len(batch):
+                    missing = batch[index - 1]
+                    results[missing] = None
+                    self.errors[missing] = errorStatus.prettyPrint()
+                    remaining = batch[:index - 1] + batch[index:]
+                    if remaining:
+                        batches.insert(0, remaining)
+                else:
+                    for oid in batch:
+                        results[oid] = None
+                        self.errors[oid] = errorStatus.prettyPrint()
+                continue
+
+            for oid, (name, value) in zip(batch, varBinds):
+                if is_exception_value(value):
+                    results[oid] = None
+                    self.errors[oid] = value.prettyPrint()
+                else:
+                    results[oid] = value
+
+        self.error = next(iter(self.errors.values()), None)
+        self.timed_out = timed_out
+        return {oid: results.get(oid) for oid in oids}
+
+    async def walk(self, oid):
+        """
+        Walks the subtree under an OID with GETNEXT and yields (oid, value) pairs.
+
+        The walk stops quietly at the end of the subtree or on the first error.
+        """
+        prefix = parse_oid(oid)
+        current = ObjectIdentity(oid)
+        while True:
+            errorIndication, errorStatus, errorIndex, varBindTable = await self._request(
+                nextCmd, ObjectType(current)
+            )
+            if errorIndication or errorStatus or not varBindTable:
+                return
+            name, value = varBindTable[0][0]
+            if is_exception_value(value) or tuple(name)[: len(prefix)] != prefix:
+                return
+            yield name, value
+            current = ObjectIdentity(name)
+
+    async def get_table(self, columns):
+        """
+        Collects several columns of a conceptual table in a single pass.
+
+        `columns` is a list of column OIDs, or a dict mapping names to column
+        OIDs. Returns {index: {column: value}}, where index is the dotted OID
+        suffix after the column OID and column is the OID or the name.
+        """
+        return (await self.get_tables({None: columns}))[None]
+
+    async def get_tables(self, tables):
+        """
+        Collects the columns of several tables in one shared request stream.
+
+        `tables` maps a table name to its columns (as for get_table()) and
+        the result maps each table name to its rows. SNMPv2c sessions use
+        GETBULK: the number of varbinds per response starts at MAX_VARBINDS
+        and is tuned to what the agent actually returns (shrunk on tooBig or
+        truncated responses, grown after full ones). SNMPv1 sessions, and v2c
+        sessions to devices that answer GETBULK with an SNMPv1 error, walk
+        all columns in lockstep with GETNEXT. A timeout only counts as a sign
+        of a v1-only agent (which drops v2c PDUs silently) when the same
+        device already answered an SNMPv1 request in this run; otherwise the
+        device is more likely just unreachable.
+        """
+        targets = {}
+        for table, columns in tables.items():
+            if not isinstance(columns, dict):
+                columns = {column: column for column in columns}
+            for name, column in columns.items():
+                targets.setdefault(str(column), []).append((table, name))
+
+        results = {table: {} for table in tables}
+        for column, cells in (await self._walk_columns(list(targets))).items():
+            for table, name in targets[column]:
+                rows = results[table]
+                for index, value in cells:
+                    rows.setdefault(index, {})[name] = value
+        return results
+
+    async def get_rows(self, columns, indexes):
+        """
+        Reads already known rows of a table with batched GETs instead of a walk.
+
+        `columns` is given as for get_table() and `indexes` lists the row
+        indexes to read. Returns {index: {column: value}} like get_table();
+        cells the agent does not have are left out, and rows without any
+        readable cell are missing from the result.
+        """
+        if not isinstance(columns, dict):
+            columns = {column: column for column in columns}
+        if self.mp_model >= 1 and self.target.transportAddr in _v1_only:
+            self.downgrade()
+
+        cells = {f"{column}.{index}": (index, name) for index in indexes for name, column in columns.items()}
+        values = await self.get_many(list(cells))
+
+        rows = {}
+        for oid, (index, name) in cells.items():
+            if values[oid] is not None:
+                rows.setdefault(index, {})[name] = values[oid]
+        return rows
+
+    async def _walk_columns(self, columns):
+        """
+        Walks the given columns side by side and returns {column: [(index, value)]}.
+        """
+        prefixes = {column: parse_oid(column) for column in columns}
+        cursors = {column: ObjectIdentity(column) for column in columns}
+        cells = {column: [] for column in columns}
+        last_seen = {}
+        address = self.target.transportAddr
+        # Columns per request; lowered when the agent cannot fit one row in a response
+        width = len(columns)
+
+        if self.mp_model >= 1 and address in _v1_only:
+            self.downgrade()
+
+        while cursors:
+            active = list(cursors)[:width]
+            varBinds = [ObjectType(cursors[column]) for column in active]
+
+            if self.mp_model >= 1:
+                budget = _bulk_budget.get(address, MAX_VARBINDS)
+                repetitions = max(1, min(MAX_REPETITIONS, budget // len(active)))
+                errorIndication, errorStatus, errorIndex, varBindTable = await self._request(
+                    bulkCmd, 0, repetitions, *varBinds
+                )
+                if not errorIndication and errorStatus and int(errorStatus) in V1_ONLY_STATUSES and not last_seen:
+                    # The agent answered the very first GETBULK with an SNMPv1 error
+                    _v1_only.add(address)
+                    self.downgrade()
+                    continue
+                if isinstance(errorIndication, RequestTimedOut) and not last_seen and address in _v1_answered:
+                    # The agent answers SNMPv1 but ignored the GETBULK: walk it with GETNEXT
+                    _v1_only.add(address)
+                    self.downgrade()
+                    continue
+                # tooBig, or a response truncated below one full row (which
+                # pysnmp reports as an empty response): retry with a smaller one
+                truncated = isinstance(errorIndication, EmptyResponse) or (
+                    not errorIndication and not errorStatus and not varBindTable
+                )
+                if truncated or (errorStatus and int(errorStatus) == TOO_BIG):
+                    self.error = None
+                    if repetitions > 1:
+                        # tooBig halves the budget; a truncated response drops to one row
+                        _bulk_budget[address] = max(len(active), budget // 2) if errorStatus else len(active)
+                    elif len(active) > 1:
+                        width = len(active) // 2
+                    else:
+                        self.error = "response truncated below one varbind"
+                        return cells
+                    continue
+            else:
+                errorIndication, errorStatus, errorIndex, varBindTable = await self._request(
+                    nextCmd, *varBinds
+                )
+                index = int(errorIndex or 0)
+                if errorStatus and int(errorStatus) == NO_SUCH_NAME and 1 <= index <= len(active):
+                    # SNMPv1 end of MIB for that column
+                    del cursors[active[index - 1]]
+                    continue
+
+            if errorIndication or errorStatus or not varBindTable:
+                return cells
+
+            for row in varBindTable:
+                for column, (name, value) in zip(active, row):
+                    if column not in cursors:
+                        continue
+                    oid = tuple(name)
+                    prefix = prefixes[column]
+                    if (
+                        is_exception_value(value)
+                        or oid[: len(prefix)] != prefix
+                        or oid <= last_seen.get(column, prefix)
+                    ):
+                        del cursors[column]
+                        continue
+                    index = ".".join(str(x) for x in oid[len(prefix):])
+                    cells[column].append((index, value))
+                    last_seen[column] = oid
+                    cursors[column] = ObjectIdentity(name)
+
+            if self.mp_model >= 1 and cursors:
+                received = sum(len(row) for row in varBindTable)
+                if received < repetitions * len(active):
+                    # The agent truncated the response to fit its message size
+                    _bulk_budget[address] = max(len(active), received)
+                else:
+                    _bulk_budget[address] = min(MAX_REPETITIONS * len(active), budget * 2)
+
+        return cells
+
+    def downgrade(self):
+        """
+        Switches this session to SNMPv1 for devices that ignore v2c requests.
+        """
+        self.mp_model = 0
+        self.auth = get_credentials(self.community, 0)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Small on-disk store for values that must survive between runs of a script,
+such as the previous counter sample of a device.
+
+Each entry is one compact JSON file in RMM_STATE_DIR (default: /run/rmm-scripts
+for root, else an `rmm-scripts-<uid>` folder in the system temp directory),
+replaced atomically so a run killed mid-write never leaves a corrupt entry.
+State is best-effort: unreadable entries are treated as missing and write
+errors are ignored. A state directory that another user owns or can write
+to is not used at all, since it could hold planted values.
+"""
+
+import json
+import os
+import re
+import stat
+import tempfile
+
+
+def default_state_dir():
+    if not hasattr(os, "getuid"):
+        return os.path.join(tempfile.gettempdir(), "rmm-scripts")  # Windows: the temp directory is per user
+    if os.getuid() == 0 and os.path.isdir("/run"):
+        return "/run/rmm-scripts"
+    # One directory per user: in a shared temp directory, another user could create ours first
+    return os.path.join(tempfile.gettempdir(), f"rmm-scripts-{os.getuid()}")
+
+
+STATE_DIR = os.environ.get("RMM_STATE_DIR") or default_state_dir()
+
+_trusted = None
+
+
+def ensure_state_dir():
+    """
+    Creates STATE_DIR (mode 0700) if needed and returns whether it can be trusted.
+
+    An existing directory is only used if it is a real directory, belongs to
+    the current user and nobody else can write to it.
+    """
+    global _trusted
+    if _trusted is None:
+        try:
+            os.makedirs(STATE_DIR, 0o700, exist_ok=True)
+            st = os.lstat(STATE_DIR)
+            _trusted = stat.S_ISDIR(st.st_mode)
+            if hasattr(os, "getuid"):
+                _trusted = _trusted and st.st_uid == os.getuid() and not st.st_mode & 0o022
+        except OSError:
+            _trusted = False
+    return _trusted
+
+
+def state_path(name):
+    """
+    Returns the file backing a state entry; the name is made filesystem-safe.
+    """
+    return os.path.join(STATE_DIR, re.sub(r"[^A-Za-z0-9_.-]", "_", name) + ".json")
+
+
+def load_state(name, default=None):
+    if not ensure_state_dir():
+        return default
+    try:
+        with open(state_path(name)) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return default
+
+
+def save_state(name, data):
+    """
+    Writes a state entry atomically. Returns False if it could not be written.
+    """
+    if not ensure_state_dir():
+        return False
+    path = state_path(name)
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=STATE_DIR, prefix=".tmp-")
+        with os.fdopen(fd, "w") as handle:
+            json.dump(data, handle, separators=(",", ":"))
+        os.replace(temp_path, path)
+        return True
+    except OSError:
+        return False
@@ -1,12 +1,37 @@
 #!/usr/bin/env python3
 
 from pysnmp.hlapi import *
+from pysnmp.hlapi.asyncore import cmdgen
+from pysnmp.proto.rfc1905 import EndOfMibView, NoSuchInstance, NoSuchObject
+from pyasn1.type import univ
+import json
+import os
 import sys
+import time
+
+ROOT = (1, 3, 6, 1)
+
+# Points de découpage de l'arbre, du plus profond au moins profond, avec le
+# nombre d'arcs ajoutés sous chacun pour former un sous-arbre indépendant
+# (un groupe de mib-2, un sous-arbre d'un constructeur sous enterprises, ...)
+SPLIT_POINTS = [
+    ((1, 3, 6, 1, 4, 1), 2),
+    ((1, 3, 6, 1, 2, 1), 1),
+    (ROOT, 1),
+]
+
+MAX_REPETITIONS = 25  # varbinds demandés par requête GETBULK
+DEFAULT_PARALLEL = 8  # sous-arbres parcourus en même temps
+MAX_FAILURES = 3  # timeouts consécutifs avant d'abandonner un sous-arbre
+CHECKPOINT_INTERVAL = 2  # secondes entre deux points de reprise
+PROGRESS_INTERVAL = 5  # secondes entre deux affichages du débit
+
+TOO_BIG = 1
 
 def snmp_walk(ip, community):
     """
     Effectue un SNMP WALK sur l'équipement spécifié et affiche tous les OIDs disponibles avec leurs valeurs.
-    
+
     :param ip: Adresse IP de l'équipement SNMP
     :param community: Chaîne de communauté SNMP
     """
@@ -31,13 +56,303 @@ def snmp_walk(ip, community):
                 oid, value = varBind
                 print(f"{oid.prettyPrint()} = {value.prettyPrint()}")
 
+def to_dotted(oid):
+    return ".".join(str(x) for x in oid)
+
+def parse_oid(oid):
+    return tuple(int(x) for x in oid.split("."))
+
+def split_root(oid):
+    """
+    Retourne la racine du sous-arbre auquel appartient un OID.
+    """
+    for point, depth in SPLIT_POINTS:
+        if oid[:len(point)] == point and len(oid) > len(point) + depth:
+            return oid[:len(point) + depth]
+    return oid
+
+def encode_value(value):
+    """
+    Convertit une valeur SNMP en valeur JSON : entier pour les types numériques
+    (Counter, Gauge, TimeTicks, ...), texte affichable sinon.
+    """
+    if isinstance(value, univ.Integer):
+        return int(value)
+    return value.prettyPrint()
+
+class StreamingWalk:
+    """
+    Parcours complet de l'arbre 1.3.6.1 enregistré au fil de l'eau dans un fichier NDJSON.
+
+    L'arbre est découpé en sous-arbres contigus, parcourus en parallèle en
+    GETBULK sur un seul moteur SNMP. Chaque ligne du fichier est un objet
+    {"oid", "type", "value"} ; les lignes de sous-arbres différents sont
+    entrelacées. Un fichier `<sortie>.checkpoint` mémorise régulièrement la
+    position de chaque sous-arbre et la taille du fichier : relancer la même
+    commande après une interruption reprend là où le parcours s'était arrêté.
+    """
+
+    def __init__(self, ip, community, output_path, parallel=DEFAULT_PARALLEL):
+        self.ip = ip
+        self.output_path = output_path
+        self.checkpoint_path = output_path + ".checkpoint"
+        self.parallel = parallel
+        self.engine = SnmpEngine()
+        self.auth = CommunityData(community, mpModel=1)  # SNMP v2c
+        self.target = UdpTransportTarget((ip, 161), timeout=1, retries=3)
+        self.context = ContextData()
+        self.subtrees = []
+        self.total = 0  # varbinds dans le fichier, reprises comprises
+        self.received = 0  # varbinds reçus pendant cette exécution
+        self.requests = 0
+        self.pending = []
+        self.running = 0
+        self.failures = {}
+        self.repetitions = {}
+        self.last_checkpoint = self.last_progress = self.start_time = time.monotonic()
+
+    def open(self):
+        """
+        Ouvre le fichier de sortie, en reprenant le parcours précédent s'il existe.
+        """
+        state = None
+        try:
+            with open(self.checkpoint_path) as handle:
+                state = json.load(handle)
+        except (OSError, ValueError):
+            pass
+
+        if state and state.get("ip") == self.ip and os.path.exists(self.output_path):
+            # Les lignes écrites après le dernier point de reprise seront relues
+            os.truncate(self.output_path, state["offset"])
+            self.subtrees = state["subtrees"]
+            self.total = state["varbinds"]
+            self.output = open(self.output_path, "ab")
+            done = sum(1 for subtree in self.subtrees if subtree["done"])
+            print(f"Reprise : {self.total} varbinds déjà enregistrés, {done}/{len(self.subtrees)} sous-arbres terminés")
+        else:
+            self.output = open(self.output_path, "wb")
+
+    def write(self, oid, value):
+        record = {"oid": to_dotted(oid), "type": value.__class__.__name__, "value": encode_value(value)}
+        self.output.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+        self.total += 1
+        self.received += 1
+
+    def checkpoint(self):
+        self.output.flush()
+        state = {
+            "ip": self.ip,
+            "offset": self.output.tell(),
+            "varbinds": self.total,
+            "subtrees": self.subtrees,
+        }
+        temp_path = self.checkpoint_path + ".tmp"
+        with open(temp_path, "w") as handle:
+            json.dump(state, handle)
+        os.replace(temp_path, self.checkpoint_path)
+        self.last_checkpoint = time.monotonic()
+
+    def report(self, final=False):
+        elapsed = time.monotonic() - self.start_time
+        rate = self.received / elapsed if elapsed > 0 else 0
+        done = sum(1 for subtree in self.subtrees if subtree["done"])
+        prefix = "Terminé" if final else "En cours"
+        print(
+            f"{prefix} : {self.total} varbinds, {rate:.0f} varbinds/s, "
+            f"{self.requests} requêtes, {done}/{len(self.subtrees)} sous-arbres, {elapsed:.1f} s",
+            flush=True,
+        )
+        self.last_progress = time.monotonic()
+
+    def request(self, command, *args, cbFun, cbCtx=None):
+        command(self.engine, self.auth, self.target, self.context, *args, cbFun=cbFun, cbCtx=cbCtx, lookupMib=False)
+        self.requests += 1
+
+    def get_next(self, oid):
+        """
+        Retourne le premier (OID, valeur) situé après un OID, ou None en fin d'arbre.
+        """
+        response = {}
+
+        def callback(snmpEngine, sendRequestHandle, errorIndication, errorStatus, errorIndex, varBindTable, cbCtx):
+            response.update(errorIndication=errorIndication, errorStatus=errorStatus, varBindTable=varBindTable)
+
+        self.request(cmdgen.nextCmd, ObjectType(ObjectIdentity(to_dotted(oid))), cbFun=callback)
+        self.engine.transportDispatcher.runDispatcher()
+
+        if response.get("errorIndication"):
+            raise RuntimeError(f"Erreur SNMP : {response['errorIndication']}")
+        if response.get("errorStatus") or not response.get("varBindTable"):
+            return None
+        name, value = response["varBindTable"][0][0]
+        if isinstance(value, (NoSuchObject, NoSuchInstance, EndOfMibView)):
+            return None
+        return tuple(name), value
+
+    def discover(self):
+        """
+        Repère le premier OID de chaque sous-arbre, en sautant d'un sous-arbre au suivant.
+
+        Chaque sous-arbre couvre ensuite l'intervalle allant de son premier
+        OID jusqu'au premier OID du sous-arbre suivant, si bien qu'aucun OID
+        n'est oublié ni lu deux fois.
+        """
+        starts = []
+        probe = ROOT
+        while True:
+            found = self.get_next(probe)
+            if found is None:
+                break
+            oid, value = found
+            if oid[:len(ROOT)] != ROOT or (starts and oid <= starts[-1]):
+                break
+            self.write(oid, value)
+            starts.append(oid)
+            root = split_root(oid)
+            probe = root[:-1] + (root[-1] + 1,)
+
+        self.subtrees = [
+            {
+                "start": to_dotted(start),
+                "stop": to_dotted(starts[i + 1]) if i + 1 < len(starts) else None,
+                "cursor": to_dotted(start),
+                "done": False,
+            }
+            for i, start in enumerate(starts)
+        ]
+        self.checkpoint()
+
+    def send(self, index):
+        self.request(
+            cmdgen.bulkCmd,
+            0,
+            self.repetitions[index],
+            ObjectType(ObjectIdentity(self.subtrees[index]["cursor"])),
+            cbFun=self.on_response,
+            cbCtx=index,
+        )
+
+    def start_next(self):
+        while self.pending and self.running < self.parallel:
+            index = self.pending.pop(0)
+            self.failures[index] = 0
+            self.repetitions[index] = MAX_REPETITIONS
+            self.running += 1
+            self.send(index)
+
+    def finish(self, index):
+        self.running -= 1
+        self.start_next()
+
+    def on_response(self, snmpEngine, sendRequestHandle, errorIndication, errorStatus, errorIndex, varBindTable, index):
+        subtree = self.subtrees[index]
+
+        if errorIndication:
+            self.failures[index] += 1
+            if self.failures[index] < MAX_FAILURES:
+                self.send(index)
+            else:
+                print(f"Erreur SNMP sur {subtree['cursor']} : {errorIndication}", flush=True)
+                self.finish(index)
+            return
+        if errorStatus:
+            if int(errorStatus) == TOO_BIG and self.repetitions[index] > 1:
+                self.repetitions[index] //= 2
+                self.send(index)
+            else:
+                print(f"Erreur SNMP sur {subtree['cursor']} : {errorStatus.prettyPrint()}", flush=True)
+                self.finish(index)
+            return
+        self.failures[index] = 0
+
+        stop = parse_oid(subtree["stop"]) if subtree["stop"] else None
+        last = parse_oid(subtree["cursor"])
+        done = not varBindTable
+        for row in varBindTable:
+            name, value = row[0]
+            oid = tuple(name)
+            if (
+                isinstance(value, (NoSuchObject, NoSuchInstance, EndOfMibView))
+                or oid[:len(ROOT)] != ROOT
+                or oid <= last
+                or (stop and oid >= stop)
+            ):
+                done = True
+                break
+            self.write(oid, value)
+            last = oid
+        subtree["cursor"] = to_dotted(last)
+        subtree["done"] = done
+
+        if done:
+            self.finish(index)
+        else:
+            self.send(index)
+
+        now = time.monotonic()
+        if now - self.last_checkpoint >= CHECKPOINT_INTERVAL:
+            self.checkpoint()
+        if now - self.last_progress >= PROGRESS_INTERVAL:
+            self.report()
+
+    def run(self):
+        """
+        Effectue le parcours et retourne True s'il est complet.
+        """
+        self.open()
+        try:
+            if not self.subtrees:
+                self.discover()
+            self.pending = [index for index, subtree in enumerate(self.subtrees) if not subtree["done"]]
+            self.start_next()
+            self.engine.transportDispatcher.runDispatcher()
+            self.checkpoint()
+        finally:
+            # Après une interruption, seul le dernier point de reprise est cohérent
+            self.output.close()
+
+        self.report(final=True)
+        complete = all(subtree["done"] for subtree in self.subtrees)
+        if complete:
+            os.remove(self.checkpoint_path)
+        return complete
+
+def snmp_walk_to_file(ip, community, output_path, parallel=DEFAULT_PARALLEL):
+    """
+    Enregistre un SNMP WALK complet dans un fichier NDJSON, en parallèle et avec reprise.
+
+    :param ip: Adresse IP de l'équipement SNMP
+    :param community: Chaîne de communauté SNMP
+    :param output_path: Fichier NDJSON de sortie
+    :param parallel: Nombre de sous-arbres parcourus en même temps
+    """
+    walk = StreamingWalk(ip, community, output_path, parallel)
+    try:
+        complete = walk.run()
+    except KeyboardInterrupt:
+        print("\nParcours interrompu.")
+        complete = False
+    except RuntimeError as e:
+        print(e)
+        complete = False
+
+    if not complete:
+        print("Parcours incomplet : relancez la même commande pour le reprendre.")
+        sys.exit(1)
+
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Utilisation : python3 snmp_scan_all.py <IP> <COMMUNAUTE>")
+    if len(sys.argv) < 3 or len(sys.argv) > 5:
+        print("Utilisation : python3 snmp_scan_all.py <IP> <COMMUNAUTE> [FICHIER_NDJSON] [PARALLELISME]")
         print("Exemple : python3 snmp_scan_all.py 192.168.0.201 public")
+        print("Exemple : python3 snmp_scan_all.py 192.168.0.201 public switch.ndjson 8")
         sys.exit(1)
 
     ip = sys.argv[1]
     community = sys.argv[2]
 
-    snmp_walk(ip, community)
+    if len(sys.argv) >= 4:
+        parallel = int(sys.argv[4]) if len(sys.argv) == 5 else DEFAULT_PARALLEL
+        snmp_walk_to_file(ip, community, sys.argv[3], parallel)
+    else:
+        snmp_walk(ip, community)
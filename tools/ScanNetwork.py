@@ -5,87 +5,108 @@ import re
 import socket
 import subprocess
 import sys
-import threading
 import time
-from queue import Queue
 
 import netifaces
-import requests
 
+from icmp_sweep import sweep
+from oui_db import OUI_DB, open_db
+from reverse_dns import resolve_names
 
-def get_mac_vendor(mac_address):
+
+def get_mac_vendor(mac_address, oui):
     """
-    Récupère le nom du fabricant à partir de l'adresse MAC en utilisant l'API MAC Vendors.
+    Récupère le nom du fabricant à partir de l'adresse MAC dans la base OUI locale (`oui`, voir open_db()).
     """
-    url = f"https://api.macvendors.com/{mac_address}"
-    try:
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            return response.text.strip()
-        else:
-            return "Inconnu"
-    except requests.RequestException:
+    if oui is None:
         return "Inconnu"
+    return oui.lookup(mac_address) or "Inconnu"
+
+
+ARP_TABLE = "/proc/net/arp"
+ATF_COM = 0x2  # entrée résolue
+
+# Une adresse IP puis une adresse MAC sur la même ligne de `arp -a`, quel que soit le système
+ARP_LINE = re.compile(r"(\d+\.\d+\.\d+\.\d+)\D.*?((?:[0-9a-f]{1,2}[:-]){5}[0-9a-f]{1,2})", re.IGNORECASE)
+
+REFRESH_TIMEOUT = 1.0  # secondes d'attente des réponses ARP après le rafraîchissement
 
 
-def ping_ip(ip):
+def normalize_mac(mac):
+    return ":".join(part.zfill(2) for part in re.split("[:-]", mac.lower()))
+
+
+def read_neighbours():
     """
-    Pinge une adresse IP pour vérifier si elle est active.
+    Retourne la table des voisins {adresse IP: adresse MAC}, lue en une fois.
+
+    Sous Linux, /proc/net/arp est lu directement ; ailleurs, `arp -a` n'est lancé qu'une fois.
     """
-    if sys.platform == "win32":
-        command = ["ping", "-n", "1", "-w", "1000", ip]
-    else:
-        command = ["ping", "-c", "1", "-W", "1", ip]
-    return (
-        subprocess.call(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        == 0
-    )
+    neighbours = {}
+    try:
+        with open(ARP_TABLE) as f:
+            next(f)  # en-tête
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 4 and int(fields[2], 16) & ATF_COM and fields[3] != "00:00:00:00:00:00":
+                    neighbours[fields[0]] = fields[3].lower()
+        return neighbours
+    except OSError:
+        pass
+    try:
+        result = subprocess.check_output(["arp", "-a"], stderr=subprocess.DEVNULL).decode(errors="replace")
+    except (OSError, subprocess.CalledProcessError):
+        return neighbours
+    for ip, mac in ARP_LINE.findall(result):
+        mac = normalize_mac(mac)
+        if mac not in ("00:00:00:00:00:00", "ff:ff:ff:ff:ff:ff"):
+            neighbours[ip] = mac
+    return neighbours
 
 
-def get_mac(ip):
+def local_addresses():
     """
-    Récupère l'adresse MAC associée à une adresse IP en utilisant la table ARP.
+    Retourne {adresse IPv4: adresse MAC ou None} des interfaces de la machine locale.
     """
-    if sys.platform == "win32":
-        command = ["arp", "-a", ip]
-        pattern = r"([0-9a-f]{2}-){5}[0-9a-f]{2}"
-    else:
-        command = ["arp", "-n", ip]
-        pattern = r"(([0-9a-f]{1,2}:){5}[0-9a-f]{1,2})"
-    try:
-        result = subprocess.check_output(command, stderr=subprocess.DEVNULL).decode()
-        mac = re.search(pattern, result.lower())
-        if mac:
-            return mac.group().replace("-", ":").lower()
-        else:
-            return None
-    except subprocess.CalledProcessError:
-        return None
-
-
-def worker():
-    while True:
-        ip = q.get()
-        start_time = time.time()
-        if ping_ip(ip):
-            hostname = ""
-            try:
-                hostname = socket.gethostbyaddr(ip)[0]
-            except socket.herror:
-                hostname = "Inconnu"
-            mac = get_mac(ip)
-            if mac:
-                vendor = get_mac_vendor(mac)
-            else:
-                mac = "Inconnu"
-                vendor = "Inconnu"
-            devices.append(
-                {"IP": ip, "Hostname": hostname, "MAC": mac, "Fabricant": vendor}
-            )
-        elapsed_time = time.time() - start_time
-        if elapsed_time < 10:
-            time.sleep(10 - elapsed_time)
-        q.task_done()
+    addresses = {}
+    for interface in netifaces.interfaces():
+        addrs = netifaces.ifaddresses(interface)
+        links = addrs.get(netifaces.AF_LINK, [])
+        mac = links[0].get("addr") if links else None
+        for info in addrs.get(netifaces.AF_INET, []):
+            addresses[info["addr"]] = mac.lower() if mac and mac != "00:00:00:00:00:00" else None
+    return addresses
+
+
+def resolve_macs(ips, timeout=REFRESH_TIMEOUT):
+    """
+    Retourne {adresse IP: adresse MAC} des adresses données présentes dans la table des voisins.
+
+    Après le balayage, le noyau connaît déjà la plupart des hôtes actifs ;
+    pour les autres, un datagramme UDP (port discard) provoque une requête
+    ARP et la table est relue jusqu'à ce qu'ils y figurent ou au délai.
+    Les hôtes situés derrière un routeur n'y figureront jamais, pas plus
+    que les adresses de la machine locale : celles-ci prennent l'adresse
+    MAC de leur interface, sans sonde.
+    """
+    local = local_addresses()
+    neighbours = read_neighbours()
+    neighbours.update((ip, mac) for ip, mac in local.items() if mac)
+    missing = [ip for ip in ips if ip not in neighbours and ip not in local]
+    if missing:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)
+            for ip in missing:
+                try:
+                    sock.sendto(b"", (ip, 9))
+                except OSError:
+                    pass
+        deadline = time.monotonic() + timeout
+        while missing and time.monotonic() < deadline:
+            time.sleep(0.1)
+            neighbours = read_neighbours()
+            missing = [ip for ip in missing if ip not in neighbours]
+    return {ip: neighbours[ip] for ip in ips if ip in neighbours}
 
 
 def get_local_cidr():
@@ -121,20 +142,34 @@ if __name__ == "__main__":
         print("CIDR invalide.")
         sys.exit(1)
 
-    q = Queue()
-    devices = []
+    # Balayage ICMP de toute la plage, puis détails des seuls hôtes actifs
+    start_time = time.time()
+    alive, method = sweep(network.hosts())
+    print(f"{len(alive)} hôtes actifs en {time.time() - start_time:.1f} s ({method})")
 
-    # Démarrer les threads
-    for _ in range(100):
-        t = threading.Thread(target=worker)
-        t.daemon = True
-        t.start()
+    # Adresses MAC des hôtes actifs, depuis la table des voisins
+    macs = resolve_macs(list(alive))
 
-    # Ajouter les IP à la file d'attente
-    for ip in network.hosts():
-        q.put(str(ip))
+    # Fabricants lus dans la base OUI locale, sans appel réseau
+    oui = open_db()
+    if oui is None:
+        print(f"Base OUI {OUI_DB} absente : lancer `python3 oui_db.py update` pour les fabricants")
 
-    q.join()
+    # Noms des hôtes actifs : PTR en parallèle, mis en cache, puis mDNS/NetBIOS
+    names = resolve_names(list(alive))
+
+    devices = []
+    for ip in alive:
+        mac = macs.get(ip)
+        if mac:
+            vendor = get_mac_vendor(mac, oui)
+        else:
+            mac = "Inconnu"
+            vendor = "Inconnu"
+        devices.append(
+            {"IP": ip, "Hostname": names.get(ip) or "Inconnu", "MAC": mac, "Fabricant": vendor}
+        )
+    devices.sort(key=lambda device: ipaddress.IPv4Address(device["IP"]))
 
     # Afficher le tableau des appareils détectés
     if devices:
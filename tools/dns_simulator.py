@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Faux serveurs DNS, mDNS et NetBIOS sur UDP, pour essayer reverse_dns.py sans réseau.
+
+Le fichier de données est un JSON avec :
+- "ptr" : {adresse: [nom, TTL]} des enregistrements PTR ; les autres
+  adresses reçoivent NXDOMAIN ;
+- "silent" (optionnel) : adresses dont les requêtes PTR restent sans réponse ;
+- "mdns" (optionnel) : {adresse: nom}, un répondeur mDNS unicast écoute
+  sur adresse:5353 ;
+- "netbios" (optionnel) : {adresse: [nom, groupe de travail]}, un répondeur
+  d'état NetBIOS écoute sur adresse:137 (root requis).
+
+Trois serveurs DNS écoutent sur 127.0.0.1 : PORT répond normalement,
+PORT+1 renvoie SERVFAIL à tout et PORT+2 ne répond jamais, pour essayer le
+passage d'un serveur à l'autre. Les adresses mDNS et NetBIOS sont en
+général d'autres adresses de boucle locale (127.0.0.5...), que Linux
+accepte sans configuration.
+
+Usage : python3 dns_simulator.py <FICHIER_JSON> [PORT]
+puis par exemple RMM_DNS_SERVERS=127.0.0.1:5302,127.0.0.1:5300 python3 reverse_dns.py 127.0.0.1 127.0.0.5
+"""
+
+import ipaddress
+import json
+import socket
+import struct
+import sys
+import threading
+
+from reverse_dns import MDNS_PORT, NETBIOS_PORT, NETBIOS_NBSTAT, TYPE_PTR, read_name
+
+DEFAULT_PORT = 5300
+
+FLAGS_ANSWER = 0x8180  # réponse, récursion demandée et disponible
+FLAGS_SERVFAIL = 0x8182
+FLAGS_NXDOMAIN = 0x8183
+FLAGS_AUTHORITATIVE = 0x8400
+CLASS_IN_FLUSH = 0x8001  # classe IN avec le bit « cache flush » de mDNS
+NETBIOS_GROUP = 0x8000
+
+
+def encode_name(name):
+    return b"".join(bytes([len(label)]) + label.encode() for label in name.strip(".").split(".")) + b"\0"
+
+
+def ptr_answer(query, flags, name, ttl, record_class=1):
+    """
+    Retourne la réponse à une requête PTR, avec un enregistrement pointant vers la question.
+    """
+    ident, = struct.unpack("!H", query[:2])
+    _, end = read_name(query, 12)
+    question = query[12:end + 4]
+    if name is None:
+        return struct.pack("!HHHHHH", ident, flags, 1, 0, 0, 0) + question
+    rdata = encode_name(name)
+    answer = b"\xc0\x0c" + struct.pack("!HHIH", TYPE_PTR, record_class, ttl, len(rdata)) + rdata
+    return struct.pack("!HHHHHH", ident, flags, 1, 1, 0, 0) + question + answer
+
+
+class DnsResponder:
+    def __init__(self, fixture, mode="normal"):
+        self.mode = mode
+        self.records = {ipaddress.ip_address(ip).reverse_pointer: entry for ip, entry in fixture.get("ptr", {}).items()}
+        self.silent = {ipaddress.ip_address(ip).reverse_pointer for ip in fixture.get("silent", [])}
+
+    def __call__(self, query):
+        if self.mode == "silent":
+            return None
+        if self.mode == "servfail":
+            return ptr_answer(query, FLAGS_SERVFAIL, None, 0)
+        qname, _ = read_name(query, 12)
+        qname = qname.rstrip(".").lower()
+        if qname in self.silent:
+            return None
+        if qname not in self.records:
+            return ptr_answer(query, FLAGS_NXDOMAIN, None, 0)
+        name, ttl = self.records[qname]
+        return ptr_answer(query, FLAGS_ANSWER, name, ttl)
+
+
+def mdns_responder(name):
+    return lambda query: ptr_answer(query, FLAGS_AUTHORITATIVE, name, 120, CLASS_IN_FLUSH)
+
+
+def netbios_responder(name, workgroup):
+    entries = [(workgroup, 0x00, NETBIOS_GROUP), (name, 0x00, 0), (name, 0x20, 0)]
+
+    def respond(query):
+        ident, = struct.unpack("!H", query[:2])
+        question_name = query[12:12 + 34]
+        body = bytes([len(entries)]) + b"".join(
+            entry.upper().encode()[:15].ljust(15) + bytes([suffix]) + struct.pack("!H", flags)
+            for entry, suffix, flags in entries
+        )
+        body += bytes(46)  # statistiques de l'adaptateur, ignorées
+        header = struct.pack("!HHHHHH", ident, FLAGS_AUTHORITATIVE, 0, 1, 0, 0)
+        return header + question_name + struct.pack("!HHIH", NETBIOS_NBSTAT, 1, 0, len(body)) + body
+
+    return respond
+
+
+def serve(address, port, respond):
+    """
+    Lance un répondeur UDP dans un thread et retourne son port (utile avec le port 0).
+
+    `respond` retourne la réponse à un paquet, ou None pour ne pas répondre.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((address, port))
+
+    def loop():
+        while True:
+            data, source = sock.recvfrom(2048)
+            try:
+                reply = respond(data)
+            except (ValueError, IndexError, struct.error):
+                continue  # requête mal formée
+            if reply:
+                sock.sendto(reply, source)
+
+    threading.Thread(target=loop, daemon=True).start()
+    return sock.getsockname()[1]
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python3 dns_simulator.py <FICHIER_JSON> [PORT]")
+        sys.exit(1)
+    with open(sys.argv[1]) as handle:
+        fixture = json.load(handle)
+    port = int(sys.argv[2]) if len(sys.argv) == 3 else DEFAULT_PORT
+
+    serve("127.0.0.1", port, DnsResponder(fixture))
+    serve("127.0.0.1", port + 1, DnsResponder(fixture, "servfail"))
+    serve("127.0.0.1", port + 2, DnsResponder(fixture, "silent"))
+    for address, name in fixture.get("mdns", {}).items():
+        serve(address, MDNS_PORT, mdns_responder(name))
+    for address, (name, workgroup) in fixture.get("netbios", {}).items():
+        serve(address, NETBIOS_PORT, netbios_responder(name, workgroup))
+    print(f"DNS simulé sur 127.0.0.1:{port} (normal), {port + 1} (SERVFAIL), {port + 2} (muet)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Balayage ICMP asynchrone d'une plage d'adresses, pour ScanNetwork.py.
+
+Toutes les requêtes echo partent d'un seul socket ICMP : brut (root ou
+CAP_NET_RAW) ou, à défaut, datagramme non privilégié (Linux, selon
+net.ipv4.ping_group_range). Les réponses sont associées aux requêtes par
+identifiant et numéro de séquence, et les envois sont cadencés par un seau
+à jetons. Si aucun socket ICMP n'est autorisé (ou sous Windows), les hôtes
+sont sondés par des connexions TCP sur quelques ports courants : une
+connexion acceptée ou refusée prouve que l'hôte répond.
+
+Usage : python3 icmp_sweep.py <CIDR> [PAQUETS_PAR_SECONDE]
+"""
+
+import asyncio
+import ipaddress
+import os
+import socket
+import struct
+import sys
+import time
+
+DEFAULT_RATE = 1000  # paquets par seconde
+DEFAULT_BURST = 64  # paquets envoyés d'affilée au plus
+DEFAULT_TIMEOUT = 1.0  # secondes d'attente après le dernier envoi
+DEFAULT_RETRIES = 1  # nouvel envoi aux hôtes restés muets
+
+TCP_PORTS = (80, 443, 22, 445, 139, 3389)
+TCP_CONCURRENCY = 256  # connexions ouvertes à la fois, tous ports confondus
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+PAYLOAD = b"rmm-scripts-sweep"
+
+
+class TokenBucket:
+    """
+    Limite le débit à `rate` opérations par seconde, avec des rafales de `burst`.
+    """
+
+    def __init__(self, rate, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def checksum(data):
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo(identifier, sequence):
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, identifier, sequence)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum(header + PAYLOAD), identifier, sequence) + PAYLOAD
+
+
+def open_icmp_socket():
+    """
+    Retourne (socket, brut) : un socket ICMP brut si possible, sinon datagramme ; None si aucun n'est permis.
+    """
+    if sys.platform == "win32":
+        return None, False
+    for kind, raw in ((socket.SOCK_RAW, True), (socket.SOCK_DGRAM, False)):
+        try:
+            sock = socket.socket(socket.AF_INET, kind, socket.IPPROTO_ICMP)
+        except (PermissionError, OSError):
+            continue
+        sock.setblocking(False)
+        # Un grand tampon évite de perdre des réponses pendant une rafale
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        return sock, raw
+    return None, False
+
+
+def parse_reply(packet):
+    """
+    Retourne (identifiant, séquence) d'une réponse echo, ou None pour tout autre paquet.
+    """
+    # Les sockets bruts (et datagramme hors Linux) livrent l'en-tête IP
+    if packet and packet[0] >> 4 == 4:
+        packet = packet[(packet[0] & 0x0F) * 4:]
+    if len(packet) < 8:
+        return None
+    kind, code, _, identifier, sequence = struct.unpack("!BBHHH", packet[:8])
+    if kind != ICMP_ECHO_REPLY or code != 0:
+        return None
+    return identifier, sequence
+
+
+async def send_echo(sock, packet, address):
+    """
+    Envoie une requête echo ; retourne False si l'adresse est injoignable (pas de route, diffusion...).
+    """
+    while True:
+        try:
+            sock.sendto(packet, (address, 0))
+            return True
+        except BlockingIOError:
+            # Tampon d'émission plein : on attend qu'il se vide, puis on renvoie à la même adresse
+            await asyncio.sleep(0.01)
+        except OSError:
+            return False
+
+
+async def icmp_sweep(sock, raw, addresses, rate, timeout, retries):
+    """
+    Envoie les requêtes echo et retourne {adresse: temps de réponse en secondes}.
+    """
+    loop = asyncio.get_running_loop()
+    # Un socket datagramme reçoit l'identifiant choisi par le noyau (son port local)
+    identifier = os.getpid() & 0xFFFF if raw else None
+    sequences = {address: index & 0xFFFF for index, address in enumerate(addresses)}
+    sent_at = {}
+    alive = {}
+    done = asyncio.Event()
+
+    def on_readable():
+        while True:
+            try:
+                packet, (source, _) = sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            reply = parse_reply(packet)
+            if reply is None or source not in sequences or source in alive:
+                continue
+            reply_identifier, sequence = reply
+            if (identifier is not None and reply_identifier != identifier) or sequence != sequences[source]:
+                continue
+            alive[source] = time.monotonic() - sent_at[source]
+            if len(alive) == len(addresses):
+                done.set()
+
+    bucket = TokenBucket(rate)
+    loop.add_reader(sock.fileno(), on_readable)
+    try:
+        for attempt in range(retries + 1):
+            for address in addresses:
+                if address in alive:
+                    continue
+                await bucket.acquire()
+                packet = build_echo(identifier or 0, sequences[address])
+                if await send_echo(sock, packet, address):
+                    sent_at[address] = time.monotonic()
+            try:
+                await asyncio.wait_for(done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            if done.is_set():
+                break
+    finally:
+        loop.remove_reader(sock.fileno())
+    return alive
+
+
+async def tcp_connect(address, port, timeout):
+    """
+    Retourne True si l'hôte répond sur ce port, que la connexion soit acceptée ou refusée.
+    """
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(address, port), timeout)
+        writer.close()
+        return True
+    except ConnectionRefusedError:
+        return True  # l'hôte a répondu par un RST
+    except (OSError, asyncio.TimeoutError):
+        return False
+
+
+async def tcp_probe(address, bucket, semaphore, timeout):
+    """
+    Sonde les ports d'une adresse en parallèle ; retourne le temps de la première réponse, ou None.
+    """
+    async with semaphore:
+        start = time.monotonic()
+        tasks = []
+        try:
+            for port in TCP_PORTS:
+                await bucket.acquire()
+                if any(task.done() and task.result() for task in tasks):
+                    break  # inutile d'ouvrir les autres ports
+                tasks.append(asyncio.ensure_future(tcp_connect(address, port, timeout)))
+            for finished in asyncio.as_completed(tasks):
+                if await finished:
+                    return time.monotonic() - start
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+async def tcp_sweep(addresses, rate, timeout):
+    """
+    Sonde chaque adresse par des connexions TCP et retourne {adresse: temps de réponse}.
+    """
+    bucket = TokenBucket(rate)
+    # Chaque hôte ouvre jusqu'à une connexion par port
+    semaphore = asyncio.Semaphore(max(1, TCP_CONCURRENCY // len(TCP_PORTS)))
+    results = await asyncio.gather(*(tcp_probe(address, bucket, semaphore, timeout) for address in addresses))
+    return {address: rtt for address, rtt in zip(addresses, results) if rtt is not None}
+
+
+def sweep(addresses, rate=DEFAULT_RATE, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES):
+    """
+    Retourne ({adresse: temps de réponse en secondes} des hôtes actifs, méthode utilisée).
+
+    La méthode est "icmp", "icmp-dgram" ou "tcp".
+    """
+    addresses = [str(address) for address in addresses]
+    sock, raw = open_icmp_socket()
+    if sock is None:
+        return asyncio.run(tcp_sweep(addresses, rate, timeout)), "tcp"
+    try:
+        return asyncio.run(icmp_sweep(sock, raw, addresses, rate, timeout, retries)), "icmp" if raw else "icmp-dgram"
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python3 icmp_sweep.py <CIDR> [PAQUETS_PAR_SECONDE]")
+        sys.exit(1)
+    network = ipaddress.IPv4Network(sys.argv[1], strict=False)
+    rate = float(sys.argv[2]) if len(sys.argv) == 3 else DEFAULT_RATE
+    start = time.monotonic()
+    alive, method = sweep(network.hosts(), rate)
+    for address in sorted(alive, key=ipaddress.IPv4Address):
+        print(f"{address:<16} {alive[address] * 1000:.1f} ms")
+    print(f"{len(alive)} hôtes actifs en {time.monotonic() - start:.2f} s ({method})")
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Base locale des fabricants de cartes réseau (registres OUI de l'IEEE), pour ScanNetwork.py.
+
+Les fichiers CSV de l'IEEE (MA-L, MA-M, MA-S, et l'ancien IAB) sont
+compilés en un fichier compact : un tableau trié de préfixes sur 64 bits,
+un tableau des positions des noms et les noms eux-mêmes. Ce fichier est
+projeté en mémoire (mmap) et chaque recherche est une bissection par
+longueur de préfixe, du plus long au plus court : aucun appel réseau,
+quelques microsecondes par adresse.
+
+Usage :
+  python3 oui_db.py import <CSV> [CSV...]   recompile la base depuis les CSV de l'IEEE
+  python3 oui_db.py update                  télécharge les CSV de l'IEEE puis recompile
+  python3 oui_db.py <ADRESSE_MAC>           affiche le fabricant d'une adresse
+"""
+
+import bisect
+import csv
+import io
+import mmap
+import os
+import struct
+import sys
+
+OUI_DB = os.environ.get("RMM_OUI_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "oui.db"))
+
+IEEE_CSV_URLS = (
+    "https://standards-oui.ieee.org/oui/oui.csv",  # MA-L, préfixes de 24 bits
+    "https://standards-oui.ieee.org/oui28/mam.csv",  # MA-M, 28 bits
+    "https://standards-oui.ieee.org/oui36/oui36.csv",  # MA-S, 36 bits
+    "https://standards-oui.ieee.org/iab/iab.csv",  # IAB, 36 bits (ancien registre)
+)
+REGISTRIES = {"MA-L", "MA-M", "MA-S", "IAB"}
+PREFIX_BITS = (36, 28, 24)  # du plus spécifique au plus général
+
+MAGIC = b"RMMOUI1\0"
+HEADER = struct.Struct("<8sI")  # magic, nombre de préfixes
+KEY = struct.Struct("<Q")  # préfixe sur 48 bits << 8 | longueur en bits
+NAME_OFFSET = struct.Struct("<I")
+
+
+def prefix_key(prefix, bits):
+    return prefix << 8 | bits
+
+
+def read_csv(text):
+    """
+    Retourne les entrées {clé: fabricant} d'un fichier CSV de l'IEEE.
+    """
+    entries = {}
+    for row in csv.DictReader(io.StringIO(text)):
+        if row.get("Registry") not in REGISTRIES:
+            continue
+        assignment = row["Assignment"].strip()
+        bits = len(assignment) * 4
+        if bits not in PREFIX_BITS:
+            continue
+        prefix = int(assignment, 16) << (48 - bits)
+        entries[prefix_key(prefix, bits)] = " ".join(row["Organization Name"].split())
+    return entries
+
+
+def compile_db(entries, path=OUI_DB):
+    """
+    Écrit la base compilée de {clé: fabricant}, en remplaçant l'ancienne d'un bloc.
+    """
+    keys = sorted(entries)
+    names = {}
+    blob = bytearray()
+    offsets = []
+    for key in keys:
+        name = entries[key]
+        # Un même fabricant a souvent des dizaines de préfixes : son nom n'est stocké qu'une fois
+        if name not in names:
+            names[name] = len(blob)
+            blob += name.encode() + b"\0"
+        offsets.append(names[name])
+
+    data = HEADER.pack(MAGIC, len(keys))
+    data += struct.pack(f"<{len(keys)}Q", *keys)
+    data += struct.pack(f"<{len(keys)}I", *offsets)
+    data += blob
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    return len(keys)
+
+
+class _Keys:
+    """
+    Tableau des clés lu directement dans le fichier, pour bisect (machines gros-boutistes).
+    """
+
+    def __init__(self, buffer, offset, count):
+        self.buffer = buffer
+        self.offset = offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return KEY.unpack_from(self.buffer, self.offset + index * KEY.size)[0]
+
+
+class OuiDatabase:
+    """
+    Base compilée projetée en mémoire ; lookup() donne le fabricant d'une adresse MAC.
+    """
+
+    def __init__(self, path=OUI_DB):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            self.map.close()
+            raise ValueError(f"{path} n'est pas une base OUI compilée")
+        keys_offset = HEADER.size
+        self.names_offset = keys_offset + self.count * (KEY.size + NAME_OFFSET.size)
+        self.offsets_offset = keys_offset + self.count * KEY.size
+        if sys.byteorder == "little":
+            self.keys = memoryview(self.map)[keys_offset:self.offsets_offset].cast("Q")
+        else:
+            self.keys = _Keys(self.map, keys_offset, self.count)
+
+    def close(self):
+        if isinstance(self.keys, memoryview):
+            self.keys.release()
+        self.map.close()
+
+    def _name(self, index):
+        start = self.names_offset + NAME_OFFSET.unpack_from(self.map, self.offsets_offset + index * NAME_OFFSET.size)[0]
+        return self.map[start:self.map.find(b"\0", start)].decode()
+
+    def lookup(self, mac):
+        """
+        Retourne le fabricant d'une adresse MAC ("aa:bb:cc:dd:ee:ff", "aa-bb-..." ou "aabb.ccdd.eeff"), ou None.
+        """
+        digits = "".join(c for c in mac if c not in ":-.")
+        if len(digits) != 12:
+            return None
+        value = int(digits, 16)
+        for bits in PREFIX_BITS:
+            key = prefix_key(value >> (48 - bits) << (48 - bits), bits)
+            index = bisect.bisect_left(self.keys, key)
+            if index < self.count and self.keys[index] == key:
+                return self._name(index)
+        return None
+
+
+def open_db(path=OUI_DB):
+    """
+    Retourne la base compilée, ou None si elle n'existe pas encore (voir `oui_db.py update`).
+    """
+    try:
+        return OuiDatabase(path)
+    except (OSError, ValueError):
+        return None
+
+
+def import_files(paths, path=OUI_DB):
+    entries = {}
+    for csv_path in paths:
+        with open(csv_path, encoding="utf-8-sig") as f:
+            entries.update(read_csv(f.read()))
+    return compile_db(entries, path)
+
+
+def update(path=OUI_DB):
+    """
+    Télécharge les registres de l'IEEE et recompile la base.
+    """
+    import urllib.request
+
+    entries = {}
+    for url in IEEE_CSV_URLS:
+        # L'IEEE refuse les requêtes sans User-Agent de navigateur
+        request = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
+        with urllib.request.urlopen(request, timeout=60) as response:
+            entries.update(read_csv(response.read().decode("utf-8-sig")))
+    return compile_db(entries, path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "import":
+        print(f"{import_files(sys.argv[2:])} préfixes écrits dans {OUI_DB}")
+    elif len(sys.argv) == 2 and sys.argv[1] == "update":
+        print(f"{update()} préfixes écrits dans {OUI_DB}")
+    elif len(sys.argv) == 2:
+        db = open_db()
+        if db is None:
+            print(f"Base {OUI_DB} absente : lancer `python3 oui_db.py update`")
+            sys.exit(1)
+        print(db.lookup(sys.argv[1]) or "Inconnu")
+    else:
+        print("Usage: python3 oui_db.py import <CSV> [CSV...] | update | <ADRESSE_MAC>")
+        sys.exit(1)
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Résolution inverse (PTR) concurrente et mise en cache, pour ScanNetwork.py.
+
+Les requêtes PTR sont envoyées directement aux serveurs de
+/etc/resolv.conf (ou de RMM_DNS_SERVERS, par exemple "127.0.0.1:5300"),
+toutes en parallèle sur asyncio : chacune a son propre délai, essaie les
+serveurs l'un après l'autre, et l'étape entière s'arrête à une échéance
+globale, si bien qu'un résolveur muet ne coûte jamais plus que cette
+échéance. Les réponses, y compris les absences de nom, sont gardées avec
+leur TTL dans un cache persistant, réutilisé d'un scan à l'autre.
+
+Pour les hôtes sans enregistrement PTR, le nom peut être demandé à l'hôte
+lui-même : requête mDNS unicast (port 5353, Bonjour/Avahi) et requête
+d'état NetBIOS (port 137, Windows et Samba).
+
+Sans resolv.conf (Windows), gethostbyaddr() est appelé dans des threads,
+sous la même échéance globale et sans repli mDNS/NetBIOS.
+
+Usage : python3 reverse_dns.py <IP> [IP...]
+"""
+
+import asyncio
+import ipaddress
+import os
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+
+from state_store import load_state, save_state
+
+RESOLV_CONF = "/etc/resolv.conf"
+
+QUERY_TIMEOUT = 1.0  # secondes par requête et par serveur
+DEADLINE = 5.0  # secondes pour toute l'étape
+CONCURRENCY = 64  # requêtes en vol au plus
+
+NEGATIVE_TTL = 300  # secondes de cache pour un hôte sans nom
+MIN_TTL = 60
+MAX_TTL = 24 * 60 * 60
+NETBIOS_TTL = 600  # les réponses NetBIOS n'ont pas de TTL
+
+CACHE_NAME = "ptr-cache"  # entrée de state_store : {adresse: [nom ou null, expiration]}
+
+TYPE_PTR = 12
+CLASS_IN = 1
+RCODE_NXDOMAIN = 3
+MDNS_PORT = 5353
+NETBIOS_PORT = 137
+NETBIOS_NBSTAT = 0x21
+
+
+def dns_servers():
+    """
+    Retourne les serveurs DNS [(adresse, port)], de RMM_DNS_SERVERS ou de /etc/resolv.conf.
+    """
+    configured = os.environ.get("RMM_DNS_SERVERS")
+    if configured:
+        servers = []
+        for item in configured.split(","):
+            host, port = item.strip(), 53
+            if host.startswith("["):  # [IPv6]:port
+                host, _, port = host[1:].partition("]:")
+            elif host.count(":") == 1:
+                host, port = host.split(":")
+            servers.append((host, int(port or 53)))
+        return servers
+    servers = []
+    try:
+        with open(RESOLV_CONF) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == "nameserver":
+                    servers.append((fields[1].split("%")[0], 53))
+    except OSError:
+        pass
+    return servers
+
+
+def encode_name(name):
+    return b"".join(bytes([len(label)]) + label for label in (part.encode() for part in name.split(".") if part)) + b"\0"
+
+
+def build_query(identifier, name, qtype, flags=0x0100, qclass=CLASS_IN):
+    """
+    Construit une requête DNS (par défaut avec récursion demandée).
+    """
+    return struct.pack("!HHHHHH", identifier, flags, 1, 0, 0, 0) + encode_name(name) + struct.pack("!HH", qtype, qclass)
+
+
+def read_name(packet, offset):
+    """
+    Retourne (nom, position après le nom), en suivant les pointeurs de compression.
+    """
+    labels = []
+    end = None
+    for _ in range(128):  # borne les boucles de pointeurs d'un paquet malformé
+        length = packet[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = (length & 0x3F) << 8 | packet[offset + 1]
+        elif length == 0:
+            return ".".join(labels), end if end is not None else offset + 1
+        else:
+            labels.append(packet[offset + 1:offset + 1 + length].decode(errors="replace"))
+            offset += 1 + length
+    raise ValueError("nom DNS malformé")
+
+
+def parse_ptr_response(packet):
+    """
+    Retourne (identifiant, rcode, nom PTR ou None, TTL ou None) d'une réponse DNS.
+    """
+    identifier, flags, qdcount, ancount = struct.unpack("!HHHH", packet[:8])
+    offset = 12
+    for _ in range(qdcount):
+        offset = read_name(packet, offset)[1] + 4
+    name = ttl = None
+    for _ in range(ancount):
+        offset = read_name(packet, offset)[1]
+        rtype, _, record_ttl, length = struct.unpack("!HHIH", packet[offset:offset + 10])
+        offset += 10
+        if rtype == TYPE_PTR and name is None:
+            name = read_name(packet, offset)[0]
+            ttl = record_ttl
+        offset += length
+    return identifier, flags & 0x0F, name, ttl
+
+
+def reverse_name(ip):
+    return ipaddress.ip_address(ip).reverse_pointer
+
+
+class _Client(asyncio.DatagramProtocol):
+    """
+    Un socket UDP connecté à un serveur ; les réponses sont associées aux requêtes par identifiant.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            response = parse_ptr_response(data)
+        except (ValueError, IndexError, struct.error):
+            return
+        future = self.pending.pop(response[0], None)
+        if future is not None and not future.done():
+            future.set_result(response)
+
+    def error_received(self, exc):
+        pass  # ICMP port injoignable : la requête expirera
+
+    async def query(self, name, timeout, flags=0x0100):
+        identifier = random.randrange(0x10000)
+        while identifier in self.pending:
+            identifier = random.randrange(0x10000)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[identifier] = future
+        try:
+            self.transport.sendto(build_query(identifier, name, TYPE_PTR, flags))
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.pending.pop(identifier, None)
+
+
+async def open_client(address, port):
+    loop = asyncio.get_running_loop()
+    _, client = await loop.create_datagram_endpoint(_Client, remote_addr=(address, port))
+    return client
+
+
+def clamp_ttl(ttl):
+    return min(max(ttl, MIN_TTL), MAX_TTL)
+
+
+async def query_ptr(clients, ip, timeout):
+    """
+    Retourne (nom ou None, TTL) pour une adresse, ou None si aucun serveur n'a répondu.
+    """
+    for client in clients:
+        try:
+            _, rcode, name, ttl = await client.query(reverse_name(ip), timeout)
+        except asyncio.TimeoutError:
+            continue
+        if rcode == 0 and name:
+            return name.rstrip("."), clamp_ttl(ttl)
+        if rcode in (0, RCODE_NXDOMAIN):
+            return None, NEGATIVE_TTL
+        # SERVFAIL, REFUSED... : le serveur suivant saura peut-être
+    return None
+
+
+async def query_mdns(ip, timeout):
+    """
+    Demande son nom à l'hôte par une requête mDNS unicast (réponse directe au port source).
+    """
+    client = await open_client(ip, MDNS_PORT)
+    try:
+        _, rcode, name, ttl = await client.query(reverse_name(ip), timeout, flags=0)
+    finally:
+        client.transport.close()
+    if rcode == 0 and name:
+        return name.rstrip("."), clamp_ttl(ttl)
+    return None
+
+
+class _NetbiosClient(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.future = asyncio.get_running_loop().create_future()
+
+    def datagram_received(self, data, addr):
+        if not self.future.done():
+            self.future.set_result(data)
+
+    def error_received(self, exc):
+        pass
+
+
+def parse_node_status(packet):
+    """
+    Retourne le nom de machine d'une réponse d'état NetBIOS (nom unique de suffixe 0x00), ou None.
+    """
+    offset = 12
+    offset = read_name(packet, offset)[1] + 10  # nom, type, classe, TTL, longueur
+    count = packet[offset]
+    offset += 1
+    for _ in range(count):
+        raw_name, suffix, flags = packet[offset:offset + 15], packet[offset + 15], packet[offset + 16] << 8 | packet[offset + 17]
+        offset += 18
+        if suffix == 0x00 and not flags & 0x8000:  # pas un nom de groupe
+            return raw_name.decode(errors="replace").strip()
+    return None
+
+
+async def query_netbios(ip, timeout):
+    """
+    Demande son nom NetBIOS à l'hôte par une requête d'état (nbtstat -A).
+    """
+    loop = asyncio.get_running_loop()
+    transport, client = await loop.create_datagram_endpoint(_NetbiosClient, remote_addr=(ip, NETBIOS_PORT))
+    try:
+        # Nom "*" encodé en demi-octets, complété à 16 caractères
+        encoded = bytes([32]) + b"CK" + b"AA" * 15 + b"\0"
+        request = struct.pack("!HHHHHH", random.randrange(0x10000), 0, 1, 0, 0, 0) + encoded + struct.pack("!HH", NETBIOS_NBSTAT, CLASS_IN)
+        transport.sendto(request)
+        packet = await asyncio.wait_for(client.future, timeout)
+    finally:
+        transport.close()
+    name = parse_node_status(packet)
+    return (name, NETBIOS_TTL) if name else None
+
+
+async def query_host(ip, timeout):
+    """
+    Essaie mDNS et NetBIOS en même temps et retourne la première réponse avec un nom.
+    """
+    results = await asyncio.gather(query_mdns(ip, timeout), query_netbios(ip, timeout), return_exceptions=True)
+    for result in results:
+        if isinstance(result, tuple):
+            return result
+    return None
+
+
+async def resolve_all(ips, servers, fallback, timeout, deadline):
+    """
+    Retourne {adresse: (nom ou None, TTL)} des adresses résolues avant l'échéance.
+    """
+    results = {}
+    clients = []
+    for address, port in servers:
+        try:
+            clients.append(await open_client(address, port))
+        except OSError:
+            continue
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def resolve(ip):
+        async with semaphore:
+            result = await query_ptr(clients, ip, timeout) if clients else None
+            if fallback and (result is None or result[0] is None):
+                try:
+                    result = await query_host(ip, timeout) or result
+                except OSError:
+                    pass
+            if result is not None:
+                results[ip] = result
+
+    tasks = [asyncio.ensure_future(resolve(ip)) for ip in ips]
+    try:
+        if tasks:
+            await asyncio.wait(tasks, timeout=deadline)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for client in clients:
+            client.transport.close()
+    return results
+
+
+def resolve_with_threads(ips, deadline):
+    """
+    Résolution par gethostbyaddr() dans des threads, sans TTL ; ceux qui dépassent l'échéance sont abandonnés.
+    """
+    results = {}
+
+    def worker(ip):
+        try:
+            results[ip] = (socket.gethostbyaddr(ip)[0], NEGATIVE_TTL)
+        except (socket.herror, socket.gaierror):
+            results[ip] = (None, NEGATIVE_TTL)
+        except OSError:
+            pass
+
+    threads = [threading.Thread(target=worker, args=(ip,), daemon=True) for ip in ips]
+    for thread in threads:
+        thread.start()
+    end = time.monotonic() + deadline
+    for thread in threads:
+        thread.join(max(0, end - time.monotonic()))
+    return dict(results)
+
+
+def is_cache_entry(entry):
+    return (
+        isinstance(entry, list)
+        and len(entry) == 2
+        and (entry[0] is None or isinstance(entry[0], str))
+        and isinstance(entry[1], (int, float))
+    )
+
+
+def load_cache(name=CACHE_NAME, now=None):
+    """
+    Retourne les entrées encore valides du cache ; celles d'une autre forme sont ignorées.
+    """
+    now = time.time() if now is None else now
+    cache = load_state(name)
+    if not isinstance(cache, dict):
+        return {}
+    return {ip: entry for ip, entry in cache.items() if is_cache_entry(entry) and entry[1] > now}
+
+
+def resolve_names(ips, fallback=True, timeout=QUERY_TIMEOUT, deadline=DEADLINE, cache_name=CACHE_NAME):
+    """
+    Retourne {adresse: nom ou None} ; une adresse absente n'a pas pu être résolue avant l'échéance.
+
+    Les entrées encore valides du cache ne sont pas redemandées ; les autres
+    résultats y sont ajoutés avec leur TTL.
+    """
+    now = time.time()
+    cache = load_cache(cache_name, now)
+    names = {ip: cache[ip][0] for ip in ips if ip in cache}
+    missing = [ip for ip in ips if ip not in cache]
+    if missing:
+        servers = dns_servers()
+        if servers:
+            results = asyncio.run(resolve_all(missing, servers, fallback, timeout, deadline))
+        else:
+            results = resolve_with_threads(missing, deadline)
+        for ip, (name, ttl) in results.items():
+            names[ip] = name
+            cache[ip] = [name, now + ttl]
+    save_state(cache_name, cache)
+    return names
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 reverse_dns.py <IP> [IP...]")
+        sys.exit(1)
+    start = time.monotonic()
+    names = resolve_names(sys.argv[1:])
+    for ip in sys.argv[1:]:
+        print(f"{ip:<16} {names.get(ip, '(pas de réponse)') or '(pas de nom)'}")
+    print(f"{len(names)}/{len(sys.argv) - 1} adresses résolues en {time.monotonic() - start:.2f} s")
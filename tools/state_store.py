@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Petit stockage sur disque des valeurs à garder d'une exécution à l'autre,
+comme le cache des noms de reverse_dns.py.
+
+Chaque entrée est un fichier JSON compact dans RMM_STATE_DIR (par défaut
+/run/rmm-scripts pour root, sinon un dossier `rmm-scripts-<uid>` du
+répertoire temporaire), remplacé d'un bloc : une exécution interrompue ne
+laisse jamais d'entrée corrompue. Une entrée illisible vaut une entrée
+absente et une écriture ratée est ignorée. Un dossier qui appartient à un
+autre utilisateur, ou où d'autres peuvent écrire, n'est pas utilisé : il
+pourrait contenir des valeurs falsifiées.
+
+C'est la copie de snmp/state_store.py pour tools/ : chaque dossier est
+déployé seul sur les machines, et ses scripts n'importent que leurs
+voisins.
+"""
+
+import json
+import os
+import re
+import stat
+import tempfile
+
+
+def default_state_dir():
+    if not hasattr(os, "getuid"):
+        return os.path.join(tempfile.gettempdir(), "rmm-scripts")  # Windows : le répertoire temporaire est propre à l'utilisateur
+    if os.getuid() == 0 and os.path.isdir("/run"):
+        return "/run/rmm-scripts"
+    # Un dossier par utilisateur : dans un répertoire temporaire partagé, un autre pourrait créer le nôtre avant nous
+    return os.path.join(tempfile.gettempdir(), f"rmm-scripts-{os.getuid()}")
+
+
+STATE_DIR = os.environ.get("RMM_STATE_DIR") or default_state_dir()
+
+_trusted = None
+
+
+def ensure_state_dir():
+    """
+    Crée STATE_DIR (mode 0700) si besoin et indique s'il est digne de confiance.
+
+    Un dossier existant n'est utilisé que s'il s'agit d'un vrai dossier,
+    appartenant à l'utilisateur courant et où personne d'autre ne peut écrire.
+    """
+    global _trusted
+    if _trusted is None:
+        try:
+            os.makedirs(STATE_DIR, 0o700, exist_ok=True)
+            st = os.lstat(STATE_DIR)
+            _trusted = stat.S_ISDIR(st.st_mode)
+            if hasattr(os, "getuid"):
+                _trusted = _trusted and st.st_uid == os.getuid() and not st.st_mode & 0o022
+        except OSError:
+            _trusted = False
+    return _trusted
+
+
+def state_path(name):
+    """
+    Retourne le fichier d'une entrée ; le nom est rendu sûr pour le système de fichiers.
+    """
+    return os.path.join(STATE_DIR, re.sub(r"[^A-Za-z0-9_.-]", "_", name) + ".json")
+
+
+def load_state(name, default=None):
+    if not ensure_state_dir():
+        return default
+    try:
+        with open(state_path(name)) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return default
+
+
+def save_state(name, data):
+    """
+    Écrit une entrée d'un bloc. Retourne False si elle n'a pas pu être écrite.
+    """
+    if not ensure_state_dir():
+        return False
+    path = state_path(name)
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=STATE_DIR, prefix=".tmp-")
+        with os.fdopen(fd, "w") as handle:
+            json.dump(data, handle, separators=(",", ":"))
+        os.replace(temp_path, path)
+        return True
+    except OSError:
+        return False
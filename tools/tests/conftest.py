@@ -0,0 +1,27 @@
+"""
+Fixtures communes aux tests des scripts de tools/.
+
+Les scripts importent leurs voisins comme modules de premier niveau,
+comme lorsqu'ils sont lancés depuis tools/ : ce dossier passe en tête de
+sys.path.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import state_store  # noqa: E402
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    """
+    Fait pointer le stockage d'état vers un dossier vide, le temps d'un test.
+    """
+    path = tmp_path / "state"
+    monkeypatch.setattr(state_store, "STATE_DIR", str(path))
+    monkeypatch.setattr(state_store, "_trusted", None)
+    return path
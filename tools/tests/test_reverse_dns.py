@@ -0,0 +1,152 @@
+import time
+
+import pytest
+
+import reverse_dns
+from dns_simulator import DnsResponder, serve
+from state_store import load_state, save_state
+
+FIXTURE = {
+    "ptr": {"192.0.2.10": ["host10.example.", 3600], "192.0.2.11": ["host11.example.", 5]},
+    "silent": ["192.0.2.30"],
+}
+
+
+class Counting:
+    """
+    Répondeur du simulateur qui compte les requêtes reçues.
+    """
+
+    def __init__(self, mode="normal"):
+        self.responder = DnsResponder(FIXTURE, mode)
+        self.queries = 0
+
+    def __call__(self, query):
+        self.queries += 1
+        return self.responder(query)
+
+
+@pytest.fixture
+def dns(monkeypatch, state_dir):
+    """
+    Lance des serveurs simulés sur des ports libres et fait pointer RMM_DNS_SERVERS vers eux, dans l'ordre.
+    """
+
+    def start(*modes):
+        responders = [Counting(mode) for mode in modes]
+        ports = [serve("127.0.0.1", 0, responder) for responder in responders]
+        monkeypatch.setenv("RMM_DNS_SERVERS", ",".join(f"127.0.0.1:{port}" for port in ports))
+        return responders
+
+    return start
+
+
+def resolve(ips, **kwargs):
+    kwargs.setdefault("timeout", 0.5)
+    return reverse_dns.resolve_names(ips, fallback=False, **kwargs)
+
+
+def test_positive_answer_cached_with_its_ttl(dns):
+    server, = dns("normal")
+    before = time.time()
+
+    assert resolve(["192.0.2.10"]) == {"192.0.2.10": "host10.example"}
+    name, expiry = load_state(reverse_dns.CACHE_NAME)["192.0.2.10"]
+    assert name == "host10.example"
+    assert before + 3600 <= expiry <= time.time() + 3600
+
+    # Réutilisé sans nouvelle requête
+    assert resolve(["192.0.2.10"]) == {"192.0.2.10": "host10.example"}
+    assert server.queries == 1
+
+
+def test_short_ttl_is_raised_to_minimum(dns):
+    dns("normal")
+    before = time.time()
+
+    resolve(["192.0.2.11"])
+    assert load_state(reverse_dns.CACHE_NAME)["192.0.2.11"][1] >= before + reverse_dns.MIN_TTL
+
+
+def test_nxdomain_is_cached(dns):
+    server, = dns("normal")
+    before = time.time()
+
+    assert resolve(["192.0.2.20"]) == {"192.0.2.20": None}
+    name, expiry = load_state(reverse_dns.CACHE_NAME)["192.0.2.20"]
+    assert name is None
+    assert before + reverse_dns.NEGATIVE_TTL <= expiry <= time.time() + reverse_dns.NEGATIVE_TTL
+
+    assert resolve(["192.0.2.20"]) == {"192.0.2.20": None}
+    assert server.queries == 1
+
+
+def test_silent_server_bounded_by_deadline(dns):
+    dns("silent")
+    start = time.monotonic()
+
+    assert resolve(["192.0.2.10", "192.0.2.30"], timeout=5.0, deadline=0.3) == {}
+    assert time.monotonic() - start < 1.0
+    # Rien n'est gardé pour des adresses sans réponse : elles seront redemandées
+    assert load_state(reverse_dns.CACHE_NAME) == {}
+
+
+def test_silent_address_does_not_delay_others(dns):
+    dns("normal")
+
+    assert resolve(["192.0.2.10", "192.0.2.30"], deadline=0.3) == {"192.0.2.10": "host10.example"}
+
+
+def test_servfail_falls_through_to_next_server(dns):
+    failing, working = dns("servfail", "normal")
+
+    assert resolve(["192.0.2.10", "192.0.2.20"]) == {"192.0.2.10": "host10.example", "192.0.2.20": None}
+    assert failing.queries == 2
+    assert working.queries == 2
+
+
+def test_timeout_falls_through_to_next_server(dns):
+    dns("silent", "normal")
+
+    assert resolve(["192.0.2.10"], timeout=0.2) == {"192.0.2.10": "host10.example"}
+
+
+@pytest.mark.parametrize("entry, valid", [
+    (["host.example", 1e12], True),
+    ([None, 1e12], True),
+    (["host.example"], False),
+    (["host.example", "demain"], False),
+    ([42, 1e12], False),
+    ("host.example", False),
+    (None, False),
+])
+def test_is_cache_entry(entry, valid):
+    assert reverse_dns.is_cache_entry(entry) == valid
+
+
+def test_corrupt_cache_entries_are_dropped(dns):
+    server, = dns("normal")
+    save_state(reverse_dns.CACHE_NAME, {
+        "192.0.2.10": ["host10.example", "demain"],
+        "192.0.2.20": "host20.example",
+        "192.0.2.40": ["cached.example", time.time() + 60],
+        "192.0.2.50": ["expired.example", time.time() - 60],
+    })
+
+    assert reverse_dns.load_cache() == {"192.0.2.40": ["cached.example", pytest.approx(time.time() + 60, abs=5)]}
+    names = resolve(["192.0.2.10", "192.0.2.20", "192.0.2.40", "192.0.2.50"])
+    assert names == {
+        "192.0.2.10": "host10.example",
+        "192.0.2.20": None,
+        "192.0.2.40": "cached.example",
+        "192.0.2.50": None,
+    }
+    assert server.queries == 3
+    assert reverse_dns.is_cache_entry(load_state(reverse_dns.CACHE_NAME)["192.0.2.10"])
+
+
+def test_corrupt_cache_file_is_ignored(dns):
+    dns("normal")
+    save_state(reverse_dns.CACHE_NAME, ["pas", "un", "dict"])
+
+    assert resolve(["192.0.2.10"]) == {"192.0.2.10": "host10.example"}